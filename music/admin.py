@@ -5,6 +5,10 @@ from django.contrib import admin, messages
 from django.shortcuts import get_object_or_404, reverse, redirect
 
 from .models import Artist, Creator, Genre, Album, Song, Playlist, CreatorSection, LibraryAlbum, Disc
+from .objects import invalidate_objects
+from .pages import mark_pages_stale
+from .precompute import album_artist_pks, refresh_top_songs
+from .stamps import ALBUMS, touch_stamps
 
 
 @admin.register(Artist)
@@ -66,7 +70,7 @@ class CreatorSectionModelAdmin(admin.ModelAdmin):
     fieldsets = [
         (
             None, {
-                'fields': ['name', 'creator']
+                'fields': ['name', 'creator', 'auto_fill']
             }
         ),
         (
@@ -167,12 +171,25 @@ class AlbumModelAdmin(admin.ModelAdmin):
         al = 'album' if upd == 1 else 'albums'
         return f'{upd} {al}'
 
+    @staticmethod
+    def published_changed(album_pks):
+        # update() sends no signals
+        refresh_top_songs(album_artist_pks(album_pks))
+        invalidate_objects(Album, album_pks)
+        mark_pages_stale(Album, album_pks)
+        touch_stamps(ALBUMS)
+
     def publish_albums(self, request, queryset):
+        # read before the update, the changelist may be filtered on 'published'
+        album_pks = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(published=True)
+        self.published_changed(album_pks)
         self.message_user(request, f"{self.pluralize(updated)} published")
 
     def un_publish_albums(self, request, queryset):
+        album_pks = list(queryset.values_list('pk', flat=True))
         updated = queryset.update(published=False)
+        self.published_changed(album_pks)
         self.message_user(request, f"{self.pluralize(updated)} un published", level=messages.WARNING)
 
 
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .counters import song_counters, top_k
+from .models import Chart, Genre, Song
+from .rollups import streams_between
+
+CHART_SIZE = 100
+WINDOW_DAYS = {
+    Chart.DAY: 1,
+    Chart.WEEK: 7
+}
+
+
+class ChartBuilder:
+    """
+    Materialize charts, the most streamed songs and albums overall and in each genre for every window
+        builder = ChartBuilder(size=100)
+        builder.build() -> number of charts saved
+
+    Published songs are loaded once as arrays (pk, album, song genre, album genre); streams come from the shared
+    counters when they're on or Song.streams for all time and from the daily rollups for the other windows.
+    Each chart is a mask over those arrays and a top-k selection, nothing is sorted in full.
+    """
+
+    def __init__(self, size: int = CHART_SIZE):
+        self.size = size
+        rows = np.array(
+            list(Song.objects.filter(disc__album__published=True).annotate(
+                count=Coalesce('streams', 0)
+            ).values_list('pk', 'disc__album', 'genre', 'disc__album__genre', 'count').iterator()),
+            dtype=np.int64
+        ).reshape(-1, 5)
+        order = np.argsort(rows[:, 0])
+        self.songs, self.albums, self.song_genres, self.album_genres, streams = rows[order].T
+        self.streams = {
+            Chart.ALL_TIME: song_counters.get_many(self.songs) if song_counters else streams
+        }
+        today = timezone.localdate()
+
+        for window, days in WINDOW_DAYS.items():
+            pks, counts = streams_between(today - timedelta(days=days - 1), today)
+            self.streams[window] = self.__align(pks, counts)
+
+    def __align(self, pks: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Counts for self.songs in the same order, songs without counts (or not published) are 0"""
+        aligned = np.zeros(len(self.songs), dtype=np.int64)
+
+        if not len(self.songs):
+            return aligned
+
+        at = np.searchsorted(self.songs, pks)
+        known = (at < len(self.songs)) & (self.songs[np.minimum(at, len(self.songs) - 1)] == pks)
+        aligned[at[known]] = counts[known]
+        return aligned
+
+    def song_chart(self, window: str, genre_pk: Optional[int] = None) -> List[Tuple[int, int]]:
+        streams = self.streams[window]
+        mask = streams > 0
+
+        if genre_pk:
+            mask &= self.song_genres == genre_pk
+
+        return top_k(self.songs[mask], streams[mask], self.size)
+
+    def album_chart(self, window: str, genre_pk: Optional[int] = None) -> List[Tuple[int, int]]:
+        streams = self.streams[window]
+        mask = streams > 0
+
+        if genre_pk:
+            mask &= self.album_genres == genre_pk
+
+        albums, song_album = np.unique(self.albums[mask], return_inverse=True)
+        totals = np.bincount(song_album, weights=streams[mask], minlength=len(albums)).astype(np.int64)
+        return top_k(albums, totals, self.size)
+
+    def build(self) -> int:
+        charts = 0
+
+        for genre_pk in [None] + list(Genre.objects.values_list('pk', flat=True)):
+            for window, _ in Chart.WINDOWS:
+                for kind, ranked in [
+                    (Chart.SONGS, self.song_chart(window, genre_pk)),
+                    (Chart.ALBUMS, self.album_chart(window, genre_pk))
+                ]:
+                    Chart.objects.update_or_create(
+                        kind=kind,
+                        window=window,
+                        genre_id=genre_pk,
+                        defaults={'ranking': ','.join(f'{pk}:{streams}' for pk, streams in ranked)}
+                    )
+                    charts += 1
+
+        return charts
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+# caches kept in the memory of each process
+LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+# settings naming the cache from CACHES that workers share state through
+SHARED_CACHE_SETTINGS = ('OBJECT_CACHE', 'ARTIST_DIRECTORY_CACHE')
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    """The caches workers share state through are in CACHES and aren't kept in each worker's memory"""
+    errors = []
+
+    for setting in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, setting)
+
+        if alias not in settings.CACHES:
+            errors.append(Error(f'{setting} = {alias!r} isn\'t in CACHES', id='music.E001'))
+
+        elif settings.CACHES[alias]['BACKEND'] in LOCAL_BACKENDS:
+            errors.append(Warning(
+                f'{setting} = {alias!r} is kept in each process\'s memory',
+                hint='Workers see each other\'s changes only with one worker, use a cache shared by every worker',
+                id='music.W001'
+            ))
+
+    return errors
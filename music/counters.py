@@ -0,0 +1,167 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.functions import Coalesce
+
+from .models import Song
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SharedSongCounters:
+    """
+    Streams of every song in a memory mapped file shared by all the workers on a host, counter i is Song pk i
+        counters = SharedSongCounters(path='spool/song_streams.bin')
+
+    Usage:
+        counters.add({song_pk: plays})
+        counters.get_many([song_pk, song_pk]) -> array of streams
+        counters.top([song_pk, song_pk, ...], k=10) -> [(song_pk, streams), ...] most streamed first
+
+    The file is created and filled from Song.streams the first time it's used. Writes take a lock on
+    '<path>.lock' so increments from different workers don't get lost, reads don't lock.
+    Song.streams stays the source of truth, `counters.reconcile()` copies it into the file again to correct any drift.
+    """
+    GROW_BY = 4096
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError('Shared song counters need fcntl file locks')
+
+        self.path = Path(path)
+        self.__counts = None
+        self.__lock = RLock()
+        self.__lock_file = None
+        self.__lock_pid = None
+        self.__lock_depth = 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the lock on the file, nested use within a process is fine"""
+        with self.__lock:
+            if self.__lock_file is None or self.__lock_pid != os.getpid():
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.__lock_file = open(f'{self.path}.lock', 'a')
+                self.__lock_pid = os.getpid()
+
+            if self.__lock_depth == 0:
+                fcntl.flock(self.__lock_file.fileno(), fcntl.LOCK_EX)
+            self.__lock_depth += 1
+
+            try:
+                yield
+            finally:
+                self.__lock_depth -= 1
+                if self.__lock_depth == 0:
+                    fcntl.flock(self.__lock_file.fileno(), fcntl.LOCK_UN)
+
+    def __map(self, rows: int = 0) -> np.memmap:
+        """Map the file, growing it to fit `rows` counters first (growing needs the lock)"""
+        size = self.path.stat().st_size // 8
+
+        if rows > size:
+            size = (rows // self.GROW_BY + 1) * self.GROW_BY
+            with open(self.path, 'r+b') as counters_file:
+                counters_file.truncate(size * 8)
+
+        if self.__counts is None or len(self.__counts) != size:
+            self.__counts = np.memmap(self.path, dtype=np.int64, mode='r+', shape=(size,))
+
+        return self.__counts
+
+    def open(self) -> np.memmap:
+        """Map the file, creating and filling it from Song.streams the first time"""
+        if self.__counts is None:
+            with self.locked():
+                if not self.path.exists() or self.path.stat().st_size == 0:
+                    with open(self.path, 'wb') as counters_file:
+                        counters_file.truncate(self.GROW_BY * 8)
+                    self.__map()
+                    self.reconcile()
+
+                self.__map()
+
+        return self.__counts
+
+    def reconcile(self) -> int:
+        """Copy Song.streams into the file, returns the number of songs"""
+        with self.locked():
+            self.open()
+            rows = np.array(
+                list(Song.objects.annotate(count=Coalesce('streams', 0)).values_list('pk', 'count').iterator()),
+                dtype=np.int64
+            ).reshape(-1, 2)
+            counts = self.__map(int(rows[:, 0].max()) + 1 if len(rows) else 0)
+            counts[:] = 0
+            counts[rows[:, 0]] = rows[:, 1]
+            return len(rows)
+
+    def add(self, counts: Dict[int, int]):
+        with self.locked():
+            self.open()
+            pks = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            plays = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            self.__map(int(pks.max()) + 1 if len(pks) else 0)[pks] += plays
+
+    def get_many(self, song_pks: List[int]) -> np.ndarray:
+        counts = self.open()
+        pks = np.asarray(song_pks, dtype=np.int64)
+
+        if len(pks) and pks.max() >= len(counts):
+            # another worker may have grown the file
+            counts = self.__map()
+
+        streams = np.zeros(len(pks), dtype=np.int64)
+        known = pks < len(counts)
+        streams[known] = counts[pks[known]]
+        return streams
+
+    def get(self, song_pk: int) -> int:
+        return int(self.get_many([song_pk])[0])
+
+    def top(self, song_pks: List[int], k: int) -> List[Tuple[int, int]]:
+        """The k most streamed of song_pks, see `top_k`"""
+        pks = np.asarray(song_pks, dtype=np.int64)
+        return top_k(pks, self.get_many(pks), k)
+
+
+def top_k(pks: np.ndarray, counts: np.ndarray, k: int) -> List[Tuple[int, Union[int, float]]]:
+    """The k pks with the highest counts (or scores), highest first, ties go to the lower pk"""
+    if k < 1:
+        return []
+
+    if k < len(pks):
+        # everything tied with the k-th highest is kept so the tie break below decides
+        kth = np.partition(counts, len(counts) - k)[len(counts) - k]
+        chosen = counts >= kth
+        pks, counts = pks[chosen], counts[chosen]
+
+    order = np.lexsort((pks, -counts))[:k]
+    return [(int(pk), count.item()) for pk, count in zip(pks[order], counts[order])]
+
+
+song_counters = SharedSongCounters(settings.STREAMS_COUNTERS_FILE) if settings.STREAMS_COUNTERS_FILE else None
+
+
+def top_song_pks(songs: QuerySet, k: int) -> List[int]:
+    """Pks of the k most streamed songs, read from the shared counters when they're on otherwise from the database"""
+    if song_counters:
+        return [pk for pk, _ in song_counters.top(list(songs.values_list('pk', flat=True)), k)]
+
+    return list(songs.order_by('-streams', 'pk').values_list('pk', flat=True)[:k])
+
+
+def top_songs(songs: QuerySet, k: int) -> List[Song]:
+    """The k most streamed songs, see `top_song_pks`"""
+    pks = top_song_pks(songs, k)
+    found = Song.objects.in_bulk(pks)
+    return [found[pk] for pk in pks if pk in found]
@@ -0,0 +1,100 @@
+from hashlib import md5
+from json import dumps
+from time import time_ns
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from tyne_utils.cursors import decode_cursor, encode_cursor
+from .models import Artist
+from .serializers import ArtistSerializer
+from .fast_serializers import ArtistValuesSerializer
+
+DIRECTORY_PAGE_SIZE = 50
+MAX_DIRECTORY_PAGE_SIZE = 200
+VERSION_KEY = 'music:artists:version'
+
+
+def directory_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """(name, pk) of the last artist on the previous page, None when the cursor isn't one of ours"""
+    return decode_cursor(cursor, str, int)
+
+
+def directory_cache():
+    """The cache from CACHES the pages are kept in, shared by the workers so a change drops the pages of each"""
+    return caches[settings.ARTIST_DIRECTORY_CACHE]
+
+
+def directory_version() -> int:
+    cache = directory_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time_ns()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def invalidate_artist_directory():
+    """Every cached page is dropped, pages are cached under the current version"""
+    directory_cache().set(VERSION_KEY, time_ns(), None)
+
+
+def directory_artists(letter: str = '', sparse: dict = None):
+    """
+    Artists by name, only those whose name starts with `letter` when there's one; `sparse` = the fields and/or
+    exclude given to ArtistSerializer, group members aren't read when they're left out
+    """
+    artists = ArtistSerializer.load_related(
+        Artist.objects.order_by('name', 'pk'), prefetch_related=('group_members',), **(sparse or {})
+    )
+    return artists.filter(name__istartswith=letter) if letter else artists
+
+
+def artist_directory_page(
+    letter: str = '',
+    cursor: Tuple[str, int] = None,
+    size: int = DIRECTORY_PAGE_SIZE,
+    sparse: dict = None,
+    fast: bool = False
+) -> dict:
+    """
+    A page of artists ordered by name, {'results': [artists], 'next': cursor or None}
+    letter = only artists whose name starts with it
+    cursor = decoded 'next' from the previous page
+    sparse = {'fields': [...], 'exclude': [...]} for ArtistSerializer, see SparseFieldsMixin
+    fast = serialize values() rows with ArtistValuesSerializer, the page is the same
+
+    Pages are cached in ARTIST_DIRECTORY_CACHE for ARTIST_DIRECTORY_CACHE_SECONDS, saving or deleting an artist or
+    changing group members drops them all (see music.signals)
+    """
+    sparse = sparse or {}
+    key = md5(dumps([letter, cursor, size, sparse], sort_keys=True).encode()).hexdigest()
+    key = f'music:artists:{directory_version()}:{key}'
+    cache = directory_cache()
+    page = cache.get(key)
+
+    if page is None:
+        artists = directory_artists(letter, sparse)
+
+        if cursor:
+            name, pk = cursor
+            artists = artists.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk))
+
+        if fast:
+            artists = list(ArtistValuesSerializer.values(artists)[:size + 1])
+            results = ArtistValuesSerializer(artists[:size], **sparse).data
+            last = artists[size - 1] if len(artists) > size else None
+            last = (last['name'], last['id']) if last else None
+        else:
+            artists = list(artists[:size + 1])
+            results = ArtistSerializer(artists[:size], many=True, read_only=True, **sparse).data
+            last = artists[size - 1] if len(artists) > size else None
+            last = (last.name, last.pk) if last else None
+
+        page = {'results': results, 'next': encode_cursor(*last) if last else None}
+        cache.set(key, page, settings.ARTIST_DIRECTORY_CACHE_SECONDS)
+
+    return page
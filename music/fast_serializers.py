@@ -0,0 +1,159 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from .models import Album, Artist, Genre
+from .serializers import AlbumSerializer, ArtistSerializer, GenreSerializer
+
+
+def file_url(model, field: str, name: str) -> Optional[str]:
+    """What DRF's ImageField gives for a file's name without a request, its url or None"""
+    return model._meta.get_field(field).storage.url(name) if name else None
+
+
+class ValuesSerializer:
+    """
+    Read only list serializer of rows from QuerySet.values(), giving the same data as `serializer` would for the
+    model instances, without making the instances or the serializer's fields
+        rows = AlbumValuesSerializer.values(albums)
+        AlbumValuesSerializer(rows, fields=('id', 'title')).data -> [{'id': 1, 'title': 'WAX'}, ...]
+
+    Related rows are read for the whole list at once, one or two queries a relation, and only for the fields kept;
+    fields= and exclude= work like SparseFieldsMixin's. Views pick these or the model serializers with
+    settings.FAST_SERIALIZER_VIEWS
+    """
+    serializer = None
+    model = None
+    columns = ()
+    files = ()
+
+    def __init__(self, rows: Iterable[dict], many: bool = True, read_only: bool = True, fields=None, exclude=None):
+        self.rows = list(rows)
+        dropped = self.serializer.dropped_fields(fields, exclude)
+        self.fields = tuple(name for name in self.field_names() if name not in dropped)
+
+    @classmethod
+    def field_names(cls) -> tuple:
+        return cls.serializer.field_names()
+
+    @classmethod
+    def values(cls, queryset):
+        """The rows of `queryset` these serialize, its prefetches are left out"""
+        return queryset.prefetch_related(None).values(*cls.columns)
+
+    @property
+    def data(self) -> List[dict]:
+        related = self.related(self.rows)
+        return [self.row_data(row, related) for row in self.rows]
+
+    def related(self, rows: List[dict]) -> dict:
+        """{field: {pk: data}} of the related rows the kept fields show"""
+        return {}
+
+    def row_data(self, row: dict, related: dict) -> dict:
+        data = {}
+        for name in self.fields:
+            if name in related:
+                data[name] = related[name].get(row['id'])
+            elif name in self.files:
+                data[name] = file_url(self.model, name, row[name])
+            else:
+                data[name] = row[name]
+        return data
+
+
+class GenreValuesSerializer(ValuesSerializer):
+    serializer = GenreSerializer
+    model = Genre
+    columns = ('title', 'description', 'avi', 'cover', 'id')
+    files = ('avi', 'cover')
+
+
+class ArtistValuesSerializer(ValuesSerializer):
+    serializer = ArtistSerializer
+    model = Artist
+    columns = ('name', 'is_group', 'avi', 'cover', 'bio', 'id')
+    files = ('avi', 'cover')
+
+    def related(self, rows: List[dict]) -> dict:
+        if 'group_members' not in self.fields:
+            return {}
+
+        groups = [row['id'] for row in rows if row['is_group']]
+        group_members = defaultdict(list)
+        if groups:
+            linked_rows(
+                Artist.group_members.through.objects.filter(from_artist_id__in=groups),
+                'from_artist_id',
+                'to_artist',
+                ArtistValuesSerializer,
+                group_members
+            )
+
+        # like ArtistSerializer, artists who aren't groups have None
+        return {'group_members': {group: group_members[group] for group in groups}}
+
+
+class AlbumValuesSerializer(ValuesSerializer):
+    """Albums without their discs, like AlbumSerializer(no_discs=True)"""
+    serializer = AlbumSerializer
+    model = Album
+    columns = (
+        'id', 'title', 'notes', 'genre_id', 'date_of_release', 'is_single', 'is_ep', 'cover', 'likes', 'copyright',
+        'published'
+    )
+    files = ('cover',)
+
+    @classmethod
+    def field_names(cls) -> tuple:
+        return tuple(name for name in cls.serializer.field_names() if name != 'discs')
+
+    def related(self, rows: List[dict]) -> dict:
+        pks = [row['id'] for row in rows]
+        related = {}
+
+        if 'genre' in self.fields and rows:
+            genres = {
+                genre['id']: genre for genre in GenreValuesSerializer(
+                    GenreValuesSerializer.values(Genre.objects.filter(pk__in={row['genre_id'] for row in rows}))
+                ).data
+            }
+            related['genre'] = {row['id']: genres.get(row['genre_id']) for row in rows}
+
+        if 'artists' in self.fields and rows:
+            related['artists'] = {pk: [] for pk in pks}
+            linked_rows(
+                Album.artists.through.objects.filter(album_id__in=pks),
+                'album_id',
+                'artist',
+                ArtistValuesSerializer,
+                related['artists']
+            )
+
+        if 'other_versions' in self.fields and rows:
+            related['other_versions'] = {pk: [] for pk in pks}
+            for album, title, version in Album.other_versions.through.objects.filter(
+                from_album_id__in=pks
+            ).order_by('pk').values_list('from_album_id', 'to_album__title', 'to_album_id'):
+                related['other_versions'][album].append({'title': title, 'id': version})
+
+        return related
+
+    def row_data(self, row: dict, related: dict) -> dict:
+        row = dict(row)
+        row['date_of_release'] = row['date_of_release'].isoformat() if row['date_of_release'] else None
+        # Album.al_code
+        row['album_type'] = 'EP' if row['is_ep'] else 'S' if row['is_single'] else 'LP'
+        return super(AlbumValuesSerializer, self).row_data(row, related)
+
+
+def linked_rows(links, source: str, target: str, values_serializer, found: dict):
+    """
+    Add the data of the rows that many-to-many `links` (a through model's queryset) lead to under their `source`
+    pk in `found`, in the order they were linked; the rows are read with their links in one query
+    """
+    columns = values_serializer.columns
+    links = list(links.order_by('pk').values_list(source, *(f'{target}__{column}' for column in columns)))
+    data = values_serializer([dict(zip(columns, link[1:])) for link in links]).data
+
+    for link, row in zip(links, data):
+        found[link[0]].append(row)
@@ -52,7 +52,7 @@ class CleanArtist:
 
     class Meta:
         model = Artist
-        exclude = ('group_members',)
+        exclude = ('group_members', 'top_songs')
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'artist\'s name'}),
             'bio': forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Something about the artist'}),
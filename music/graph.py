@@ -0,0 +1,200 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, deque
+from itertools import chain
+from threading import RLock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Album, Artist, Song
+
+# paths longer than this aren't looked for
+MAX_HOPS = 6
+
+Adjacency = Dict[int, array]
+
+
+def credits(artist_pks: Set[int] = None) -> Iterable[tuple]:
+    """
+    (artist pk, ('song' or 'album', pk)) for every artist credited on a song or album,
+    with artist_pks only for the songs and albums those artists are on
+    """
+    album_credits = Album.artists.through.objects.all()
+    additional_credits = Song.additional_artists.through.objects.all()
+    featured_credits = Song.featured_artists.through.objects.all()
+    songs = Song.objects.filter(disc__album__artists__isnull=False)
+
+    if artist_pks is not None:
+        artist_pks = list(artist_pks)
+        album_pks = Album.objects.filter(artists__in=artist_pks).values('pk')
+        song_pks = Song.objects.filter(
+            Q(disc__album__artists__in=artist_pks) | Q(additional_artists__in=artist_pks) |
+            Q(featured_artists__in=artist_pks)
+        ).values('pk')
+        album_credits = album_credits.filter(album__in=album_pks)
+        additional_credits = additional_credits.filter(song__in=song_pks)
+        featured_credits = featured_credits.filter(song__in=song_pks)
+        songs = songs.filter(pk__in=song_pks)
+
+    return chain(
+        ((artist, ('album', album)) for album, artist in album_credits.values_list('album', 'artist').iterator()),
+        ((artist, ('song', song)) for song, artist in additional_credits.values_list('song', 'artist').iterator()),
+        ((artist, ('song', song)) for song, artist in featured_credits.values_list('song', 'artist').iterator()),
+        # album artists are on every song of the album
+        ((artist, ('song', song)) for song, artist in songs.values_list('pk', 'disc__album__artists').iterator())
+    )
+
+
+def adjacency(pairs: Iterable[tuple], only: Set[int] = None) -> Dict[int, Set[int]]:
+    """Artists sharing a container, from (artist pk, container) pairs; `only` limits it to those artists' neighbours"""
+    by_container = defaultdict(set)
+    for artist_pk, container in pairs:
+        by_container[container].add(artist_pk)
+
+    linked = defaultdict(set)
+    for artist_pks in by_container.values():
+        for artist_pk in artist_pks if only is None else artist_pks & only:
+            linked[artist_pk].update(artist_pks)
+            linked[artist_pk].discard(artist_pk)
+
+    return linked
+
+
+class ArtistGraph:
+    """
+    Who worked with whom, kept in memory by every worker
+        artist_graph.collaborators(artist_pk) -> pks of artists on the same songs or albums
+        artist_graph.linked(artist_pk) -> pks of the artist's groups or group members
+        artist_graph.path(artist_pk, other_pk) -> [artist_pk, ..., other_pk] fewest hops first, or None
+
+    Each artist's neighbours are a sorted array('q') of pks. The graph is loaded in full on first use and then kept up
+    to date by the m2m signals of the credits and group members (see music.signals), only the artists involved are
+    read again. Changes made by other workers are picked up when the graph is older than ARTIST_GRAPH_MAX_AGE
+    seconds and loaded again.
+    """
+
+    def __init__(self):
+        self.__lock = RLock()
+        self.__collaborators: Optional[Adjacency] = None
+        self.__members: Optional[Adjacency] = None
+        self.__loaded = 0.0
+
+    @staticmethod
+    def __pack(linked: Set[int]) -> array:
+        return array('q', sorted(linked))
+
+    def invalidate(self):
+        with self.__lock:
+            self.__collaborators = None
+            self.__members = None
+
+    def __load(self) -> Tuple[Adjacency, Adjacency]:
+        """The collaborators and members maps, read while the lock is held, invalidate() may drop them any time after"""
+        with self.__lock:
+            if self.__collaborators is None or monotonic() - self.__loaded > settings.ARTIST_GRAPH_MAX_AGE:
+                self.__collaborators = {pk: self.__pack(linked) for pk, linked in adjacency(credits()).items()}
+                self.__members = {pk: self.__pack(linked) for pk, linked in self.__query_members().items()}
+                self.__loaded = monotonic()
+            return self.__collaborators, self.__members
+
+    @staticmethod
+    def __query_members(artist_pks: Iterable[int] = None) -> Dict[int, Set[int]]:
+        # group_members is symmetrical, both directions are stored
+        rows = Artist.group_members.through.objects.all()
+        if artist_pks is not None:
+            rows = rows.filter(from_artist__in=list(artist_pks))
+
+        linked = defaultdict(set)
+        for from_pk, to_pk in rows.values_list('from_artist', 'to_artist').iterator():
+            linked[from_pk].add(to_pk)
+        return linked
+
+    def __update(self, graph: Adjacency, artist_pks: Set[int], linked: Dict[int, Set[int]]):
+        """
+        Replace the neighbours of artist_pks and fix the other side of every link that was added or removed.
+        Arrays are copied before they change, readers outside the lock keep iterating the ones they got
+        """
+        for artist_pk in artist_pks:
+            old = set(graph.get(artist_pk, ()))
+            new = linked.get(artist_pk, set())
+
+            for other_pk in new - old:
+                neighbours = array('q', graph.get(other_pk, ()))
+                at = bisect_left(neighbours, artist_pk)
+                if at == len(neighbours) or neighbours[at] != artist_pk:
+                    neighbours.insert(at, artist_pk)
+                    graph[other_pk] = neighbours
+
+            for other_pk in old - new:
+                neighbours = array('q', graph.get(other_pk, ()))
+                at = bisect_left(neighbours, artist_pk)
+                if at < len(neighbours) and neighbours[at] == artist_pk:
+                    neighbours.pop(at)
+                    graph[other_pk] = neighbours
+
+            if new:
+                graph[artist_pk] = self.__pack(new)
+            else:
+                graph.pop(artist_pk, None)
+
+    def refresh_collaborators(self, artist_pks: Iterable[int]):
+        """Read the credits of these artists again after a change"""
+        artist_pks = set(artist_pks)
+        with self.__lock:
+            if self.__collaborators is None or not artist_pks:
+                # loaded in full on next use
+                return
+
+            self.__update(self.__collaborators, artist_pks, adjacency(credits(artist_pks), only=artist_pks))
+
+    def refresh_members(self, artist_pks: Iterable[int]):
+        """Read the group members of these artists again after a change"""
+        artist_pks = set(artist_pks)
+        with self.__lock:
+            if self.__members is None or not artist_pks:
+                return
+
+            self.__update(self.__members, artist_pks, self.__query_members(artist_pks))
+
+    def collaborators(self, artist_pk: int) -> List[int]:
+        collaborators, _ = self.__load()
+        return list(collaborators.get(artist_pk, ()))
+
+    def linked(self, artist_pk: int) -> List[int]:
+        _, members = self.__load()
+        return list(members.get(artist_pk, ()))
+
+    def path(self, artist_pk: int, other_pk: int, max_hops: int = MAX_HOPS) -> Optional[List[int]]:
+        """Shortest chain of collaborations or group memberships from one artist to another, breadth first"""
+        collaborators, members = self.__load()
+        if artist_pk == other_pk:
+            return [artist_pk]
+
+        previous = {artist_pk: None}
+        frontier = deque([(artist_pk, 0)])
+
+        while frontier:
+            current, hops = frontier.popleft()
+            if hops == max_hops:
+                continue
+
+            for neighbour in chain(collaborators.get(current, ()), members.get(current, ())):
+                if neighbour in previous:
+                    continue
+
+                previous[neighbour] = current
+                if neighbour == other_pk:
+                    path = [neighbour]
+                    while previous[path[-1]] is not None:
+                        path.append(previous[path[-1]])
+                    return path[::-1]
+
+                frontier.append((neighbour, hops + 1))
+
+        return None
+
+
+artist_graph = ArtistGraph()
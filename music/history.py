@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.models import Profile
+from .models import PlayHistory, Song
+from .streams import Play
+
+# rows per INSERT
+INSERT_BATCH = 500
+
+
+def add_history(plays: List[Play]) -> int:
+    """
+    Append plays to the profiles' histories, returns the number of rows added\n
+    Plays are only ever inserted in batches, nothing is updated or deleted here. A profile's history is a ring of its
+    last PLAY_HISTORY_SIZE plays; reads never look past that many rows and `compact_history` drops the older ones.
+    """
+    plays = [play for play in plays if play[1]]
+    known_songs = set(Song.objects.filter(pk__in={song_pk for song_pk, _, _ in plays}).values_list('pk', flat=True))
+    known_profiles = set(Profile.objects.filter(
+        pk__in={profile_pk for _, profile_pk, _ in plays}
+    ).values_list('pk', flat=True))
+
+    rows = [
+        PlayHistory(
+            profile_id=profile_pk,
+            song_id=song_pk,
+            played=datetime.fromtimestamp(played_at, tz=timezone.utc)
+        ) for song_pk, profile_pk, played_at in plays if song_pk in known_songs and profile_pk in known_profiles
+    ]
+    PlayHistory.objects.bulk_create(rows, batch_size=INSERT_BATCH)
+    return len(rows)
+
+
+def recently_played(profile: Profile, size: int) -> List[Tuple[int, datetime]]:
+    """
+    The last `size` distinct songs a profile played, [(song_pk, last played), ...] newest first\n
+    One range scan of the (profile, played) index, at most PLAY_HISTORY_SIZE rows
+    """
+    songs = {}
+    for song_pk, played in PlayHistory.objects.filter(profile=profile).order_by('-played', '-pk').values_list(
+        'song', 'played'
+    )[:settings.PLAY_HISTORY_SIZE].iterator():
+        if song_pk not in songs:
+            songs[song_pk] = played
+            if len(songs) == size:
+                break
+
+    return list(songs.items())
+
+
+def compact_history(keep: int = None) -> int:
+    """Drop all but the last `keep` (PLAY_HISTORY_SIZE) plays of every profile, returns the number of plays dropped"""
+    keep = keep if keep else settings.PLAY_HISTORY_SIZE
+    dropped = 0
+    over = PlayHistory.objects.values('profile').annotate(plays=Count('pk')).filter(plays__gt=keep)
+
+    for profile_pk in over.values_list('profile', flat=True):
+        played, pk = PlayHistory.objects.filter(profile_id=profile_pk).order_by('-played', '-pk').values_list(
+            'played', 'pk'
+        )[keep - 1]
+        dropped += PlayHistory.objects.filter(profile_id=profile_pk).filter(
+            Q(played__lt=played) | Q(played=played, pk__lt=pk)
+        ).delete()[0]
+
+    return dropped
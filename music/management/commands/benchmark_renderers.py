@@ -0,0 +1,54 @@
+from json import loads
+from timeit import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+
+from music.models import Album, Genre
+from music.pages import genre_page
+from music.searches import MusicSearch
+from music.serializers import AlbumSerializer
+from tyne_utils.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Time rendering real payloads (the biggest album, a search and a genre page) with JSONRenderer and ' \
+           'FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100, help='Renders of each payload with each renderer')
+        parser.add_argument('--term', default='the', help='Search term of the search payload')
+
+    def payloads(self, term: str) -> dict:
+        payloads = {}
+        album = Album.objects.annotate(songs=Count('disc__song')).order_by('-songs').first()
+        genre = Genre.objects.exclude(main_curator=None).first()
+
+        if album:
+            payloads[f'album \'{album.title}\''] = AlbumSerializer(album, read_only=True).data
+        payloads[f'search \'{term}\''] = MusicSearch(term, staff_view=True).get_results(serialize=True)
+        if genre:
+            payloads[f'genre page \'{genre.title}\''] = genre_page(genre, clean=False)
+
+        return payloads
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson isn\'t installed, FastJSONRenderer falls back to the standard library')
+
+        repeat = options['repeat']
+        renderers = (JSONRenderer(), FastJSONRenderer())
+
+        for name, payload in self.payloads(options['term']).items():
+            rendered = [renderer.render(payload) for renderer in renderers]
+            if loads(rendered[0]) != loads(rendered[1]):
+                raise CommandError(f'The renderers disagree on the {name} payload')
+
+            standard, fast = [
+                timeit(lambda: renderer.render(payload), number=repeat) / repeat * 1000 for renderer in renderers
+            ]
+            self.stdout.write(
+                f'{name} ({len(rendered[0]) / 1024:.1f} KiB): JSONRenderer {standard:.3f} ms, '
+                f'FastJSONRenderer {fast:.3f} ms, {standard / fast:.1f}x'
+            )
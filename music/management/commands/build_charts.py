@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from music.charts import ChartBuilder, CHART_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the song and album charts, overall and for every genre'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=CHART_SIZE, help='Entries in each chart')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{ChartBuilder(size=options["size"]).build()} charts built')
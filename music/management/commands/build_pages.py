@@ -0,0 +1,31 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from music.pages import build_stale_pages, mark_pages_stale
+
+
+class Command(BaseCommand):
+    help = 'Build the genre and curator pages that changed since they were last built, pages are served as they were ' \
+           'until then'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also build pages of genres and curators never built')
+        parser.add_argument('--rebuild', action='store_true', help='Build every stored page again, stale or not')
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS', help='Keep running, building stale pages every SECONDS'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            mark_pages_stale()
+
+        self.stdout.write(f'{build_stale_pages(build_all=options["all"])} pages built')
+
+        while options['watch']:
+            sleep(options['watch'])
+            close_old_connections()
+            built = build_stale_pages()
+            if built:
+                self.stdout.write(f'{built} pages built')
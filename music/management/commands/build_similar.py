@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from music.similar import NEIGHBOURS, SimilarityBuilder
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the similar songs and artists from playlists, libraries, features and creator sections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=NEIGHBOURS, help='Similar songs or artists kept for each')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{SimilarityBuilder(size=options["size"]).build()} songs and artists with similar items')
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from music.history import compact_history
+
+
+class Command(BaseCommand):
+    help = 'Drop all but the last plays of every profile\'s recently played history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=settings.PLAY_HISTORY_SIZE, help='Plays to keep for each profile'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{compact_history(options["keep"])} plays dropped')
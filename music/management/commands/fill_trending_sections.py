@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from music.trending import fill_trending_sections
+
+
+class Command(BaseCommand):
+    help = 'Fill the creator sections set to auto fill with the trending artists or albums'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10, help='Artists or albums in each section')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{fill_trending_sections(options["size"])} sections filled')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from music.streams import stream_pipeline
+
+
+class Command(BaseCommand):
+    help = 'Write plays left in the spool files of stopped workers to song streams'
+
+    def handle(self, *args, **options):
+        stream_pipeline.recover()
+        counts = stream_pipeline.flush()
+        self.stdout.write(f'{sum(counts.values())} plays of {len(counts)} songs written')
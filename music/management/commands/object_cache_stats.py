@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from music.objects import object_caches
+
+
+class Command(BaseCommand):
+    help = 'Hit rates of the cached artists, albums and genres across the workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Start counting again after printing')
+
+    def handle(self, *args, **options):
+        for object_cache in object_caches:
+            stats = object_cache.stats()
+            self.stdout.write(
+                f'{object_cache.model._meta.verbose_name_plural}: {stats["hit_rate"]:.2%} hits '
+                f'({stats["local_hits"]} in memory, {stats["shared_hits"]} shared, {stats["misses"]} misses)'
+            )
+
+            if options['reset']:
+                object_cache.reset_stats()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from music.counters import song_counters
+
+
+class Command(BaseCommand):
+    help = 'Copy every song\'s streams from the database into the shared song counters file'
+
+    def handle(self, *args, **options):
+        if not song_counters:
+            raise CommandError('Shared song counters are off, set STREAMS_COUNTERS_FILE')
+
+        self.stdout.write(f'{song_counters.reconcile()} songs reconciled')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from music.recommend import FACTORS, ITERATIONS, REGULARIZATION, ALPHA, train
+
+
+class Command(BaseCommand):
+    help = 'Train the song recommendations for every profile from plays, library albums and playlists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=FACTORS, help='Size of the profile and song factors')
+        parser.add_argument('--iterations', type=int, default=ITERATIONS, help='Rounds of alternating least squares')
+        parser.add_argument('--regularization', type=float, default=REGULARIZATION)
+        parser.add_argument('--alpha', type=float, default=ALPHA, help='Confidence gained per play')
+
+    def handle(self, *args, **options):
+        profiles = train(
+            factors=options['factors'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            alpha=options['alpha']
+        )
+        self.stdout.write(f'Recommendations trained for {profiles} profiles')
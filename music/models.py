@@ -59,6 +59,12 @@ class Artist(models.Model):
     bio = models.TextField(blank=True, null=True, help_text='Info about the artist')
     nicknames = models.TextField(blank=True, null=True, help_text='Comma separated names the artist goes by')
     playlists = models.ManyToManyField('Playlist', blank=True)
+    top_songs = models.TextField(
+        help_text='Comma separated digits indicating a pk for each of the artist\'s top songs, most streamed first',
+        blank=True,
+        null=True,
+        default=None
+    )
     objects = models.Manager()
     avi = models.ImageField(
         default='/defaults/artist.png',
@@ -71,6 +77,14 @@ class Artist(models.Model):
         help_text='A 3x1 image'
     )
 
+    class Meta:
+        # the artists directory is read by name
+        indexes = (models.Index(fields=('name',)),)
+
+    @property
+    def top_songs_pk(self):
+        return [int(pk) for pk in self.top_songs.split(',') if pk.isdigit()] if self.top_songs else []
+
     def add_artist_to_group(self, artist: 'Artist'):
         if self.is_group and type(artist) == type(self) and not artist.is_group:
             self.group_members.add(artist)
@@ -152,6 +166,10 @@ class Album(models.Model):
     published = models.BooleanField(default=False)
     objects = models.Manager()
 
+    class Meta:
+        # the published albums listing, newest first, with dates as ranges
+        indexes = (models.Index(fields=('published', 'date_of_release')),)
+
     @property
     def album_type(self):
         return {
@@ -218,6 +236,14 @@ class Album(models.Model):
         return f'{self.title} ({self.date_of_release})'
 
 
+class SongQuerySet(models.QuerySet):
+    def for_profile(self, profile: Profile = None):
+        """The songs a profile may see, explicit songs are left out in the query for minors"""
+        if profile is not None and profile.minor:
+            return self.filter(explicit=False)
+        return self
+
+
 class Song(models.Model):
     disc = models.ForeignKey(Disc, on_delete=models.CASCADE, blank=False, null=False)
     track_no = models.IntegerField()
@@ -230,11 +256,13 @@ class Song(models.Model):
     additional_artists = models.ManyToManyField(Artist, blank=True, related_name='additions')
     featured_artists = models.ManyToManyField(Artist, blank=True, related_name='features')
     streams = models.IntegerField(default=0, blank=True, null=True)
-    objects = models.Manager()
+    objects = SongQuerySet.as_manager()
 
     class Meta:
         unique_together = (('disc', 'track_no'),)
         ordering = ('track_no',)
+        # a disc's songs for a minor profile are read from the index like everyone else's
+        indexes = (models.Index(fields=('disc', 'explicit', 'track_no')),)
 
     @property
     def album_art(self):
@@ -276,6 +304,12 @@ class Song(models.Model):
         return f'\'{self.title}\' from the album \'{self.disc.album}\''
 
 
+def profile_songs(lookup: str, profile: Profile = None, clean: bool = False) -> models.Prefetch:
+    """Prefetch the songs at `lookup` (e.g. 'disc_set__song_set') that a profile may see, clean=True for a minor's"""
+    songs = Song.objects.filter(explicit=False) if clean else Song.objects.for_profile(profile)
+    return models.Prefetch(lookup, queryset=songs.prefetch_related('additional_artists'))
+
+
 class Playlist(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -323,14 +357,17 @@ class Playlist(models.Model):
         return verification
 
     def songs_by_order(self):
+        """
+        Songs in songs_order, songs missing from the order come last. Uses the prefetched songs when there are any,
+        those may leave out songs a profile can't see (see profile_songs)
+        """
         order = self.songs_order_pk
-        all_songs = self.songs.all()
-        songs = list(range(len(order)))
-
-        if self.verify_songs_and_songs_order():
-            songs = [all_songs.get(pk=pk) for pk in order]
+        all_songs = {song.pk: song for song in self.songs.all()}
+        in_order = set(order)
 
-        return songs
+        return [all_songs[pk] for pk in order if pk in all_songs] + [
+            song for pk, song in all_songs.items() if pk not in in_order
+        ]
 
     def set_song_order(self, pk: int, position: int):
         if self.pk:
@@ -391,11 +428,27 @@ class Playlist(models.Model):
 
 
 class CreatorSection(models.Model):
+    MANUAL = ''
+    TRENDING_ARTISTS = 'TA'
+    TRENDING_ALBUMS = 'TL'
+    AUTO_FILL = (
+        (MANUAL, 'Curated'),
+        (TRENDING_ARTISTS, 'Trending artists'),
+        (TRENDING_ALBUMS, 'Trending albums')
+    )
+
     name = models.CharField(max_length=2000)
     creator = models.ForeignKey(Creator, on_delete=models.CASCADE)
     artists = models.ManyToManyField(Artist, blank=True)
     albums = models.ManyToManyField(Album, blank=True)
     playlists = models.ManyToManyField(Playlist, blank=True)
+    auto_fill = models.CharField(
+        max_length=2,
+        choices=AUTO_FILL,
+        blank=True,
+        default=MANUAL,
+        help_text='Fill the section with what\'s trending, updated periodically'
+    )
     objects = models.Manager()
 
     def __str__(self):
@@ -418,3 +471,184 @@ class LibraryAlbum(models.Model):
 
     def __str__(self):
         return f'{self.album.title} in {self.profile.name}\'s library'
+
+
+class LibraryTombstone(models.Model):
+    """Marks a playlist or library album removed from a profile's library, for clients syncing their library"""
+    PLAYLIST = 'PLAYLIST'
+    LIB_ALBUM = 'LIBRARY_ALBUM'
+    ITEM_TYPES = (
+        (PLAYLIST, 'Playlist'),
+        (LIB_ALBUM, 'Library album')
+    )
+    # tombstones older than this are dropped, clients with an older cursor have to sync the whole library
+    KEEP_DAYS = 30
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    item_type = models.CharField(max_length=20, choices=ITEM_TYPES)
+    item_id = models.BigIntegerField()
+    removed = models.DateTimeField(auto_now_add=True)
+    objects = models.Manager()
+
+    class Meta:
+        indexes = (models.Index(fields=('profile', 'removed')),)
+
+    def __str__(self):
+        return f'{self.item_type} {self.item_id} removed from {self.profile.name}\'s library'
+
+
+class SongDailyStreams(models.Model):
+    """Streams of a song on a day, added up from plays as they're written"""
+    song = models.ForeignKey(Song, on_delete=models.CASCADE)
+    day = models.DateField()
+    streams = models.IntegerField(default=0)
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = (('song', 'day'),)
+        indexes = (models.Index(fields=('day', 'song')),)
+
+    def __str__(self):
+        return f'{self.streams} streams of song {self.song_id} on {self.day}'
+
+
+class Chart(models.Model):
+    """A ranked list of the most streamed songs or albums, overall or in a genre, built by a periodic job"""
+    SONGS = 'S'
+    ALBUMS = 'A'
+    KINDS = (
+        (SONGS, 'Songs'),
+        (ALBUMS, 'Albums')
+    )
+    ALL_TIME = 'all'
+    DAY = '1d'
+    WEEK = '7d'
+    WINDOWS = (
+        (ALL_TIME, 'All time'),
+        (DAY, 'Today'),
+        (WEEK, 'Last 7 days')
+    )
+
+    kind = models.CharField(max_length=1, choices=KINDS)
+    window = models.CharField(max_length=3, choices=WINDOWS)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, blank=True, null=True)
+    ranking = models.TextField(
+        help_text='Comma separated \'pk:streams\' for each song or album, highest first',
+        blank=True,
+        default=''
+    )
+    built = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = (('kind', 'window', 'genre'),)
+
+    @property
+    def entries(self):
+        return [tuple(int(x) for x in entry.split(':')) for entry in self.ranking.split(',') if entry]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} chart ({self.get_window_display()}) {self.genre if self.genre else ""}'
+
+
+class SongTrend(models.Model):
+    """How much a song is trending, see music.trending"""
+    song = models.OneToOneField(Song, on_delete=models.CASCADE)
+    score = models.FloatField(blank=True, null=True)
+    objects = models.Manager()
+
+    class Meta:
+        indexes = (models.Index(fields=('-score',)),)
+
+
+class ArtistTrend(models.Model):
+    """How much an artist is trending, see music.trending"""
+    artist = models.OneToOneField(Artist, on_delete=models.CASCADE)
+    score = models.FloatField(blank=True, null=True)
+    objects = models.Manager()
+
+    class Meta:
+        indexes = (models.Index(fields=('-score',)),)
+
+
+class SimilarItems(models.Model):
+    """The songs or artists most often found together with a song or artist, see music.similar"""
+    SONGS = 'S'
+    ARTISTS = 'A'
+    KINDS = (
+        (SONGS, 'Songs'),
+        (ARTISTS, 'Artists')
+    )
+
+    kind = models.CharField(max_length=1, choices=KINDS)
+    item_id = models.BigIntegerField()
+    neighbours = models.TextField(
+        help_text='Comma separated \'pk:score\' for each similar song or artist, most similar first',
+        blank=True,
+        default=''
+    )
+    built = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = (('kind', 'item_id'),)
+
+    @property
+    def entries(self):
+        return [
+            (int(pk), float(score)) for pk, score in (entry.split(':') for entry in self.neighbours.split(',') if entry)
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} similar to {self.item_id}'
+
+
+class PageDocument(models.Model):
+    """A genre or curator page as it's served, built ahead of time and again after what's on it changes"""
+    GENRE = 'G'
+    CURATOR = 'C'
+    KINDS = (
+        (GENRE, 'Genre'),
+        (CURATOR, 'Curator')
+    )
+
+    kind = models.CharField(max_length=1, choices=KINDS)
+    object_id = models.BigIntegerField()
+    clean = models.BooleanField(default=False, help_text='Without explicit songs, for minors')
+    document = models.JSONField(default=dict)
+    stale = models.BooleanField(default=False)
+    # bumped every time the page goes stale, a build only lands if nothing changed while it ran
+    generation = models.IntegerField(default=0)
+    built = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        unique_together = (('kind', 'object_id', 'clean'),)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id} page{" (clean)" if self.clean else ""}'
+
+
+class PlayHistory(models.Model):
+    """A play of a song by a profile, only a profile's last plays are kept, see music.history"""
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE)
+    played = models.DateTimeField()
+    objects = models.Manager()
+
+    class Meta:
+        indexes = (models.Index(fields=('profile', '-played')),)
+
+    def __str__(self):
+        return f'{self.song.title} played by {self.profile.name}'
+
+
+class CatalogueStamp(models.Model):
+    """The version stamp of what the catalogue endpoints show under a name from music.stamps, see music.stamps"""
+    name = models.CharField(max_length=20, unique=True)
+    # nanoseconds since the epoch
+    stamp = models.BigIntegerField()
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.name} stamp {self.stamp}'
@@ -0,0 +1,180 @@
+from collections import Counter
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+
+from .models import Album, Artist, Genre
+
+
+class ObjectCache:
+    """
+    Read-through cache of a model's rows by pk, loaded with their related rows
+        albums = ObjectCache(Album, prefetch_related=('artists',), depends={Artist: 'artists'})
+
+    Usage:
+        albums.in_bulk([album_pk, ...]) -> {album_pk: album} like QuerySet.in_bulk, pks that don't exist are left out
+        albums.get(album_pk) -> album or None
+        albums.invalidate([album_pk, ...])
+        albums.stats() -> {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'hit_rate': 0.0}
+
+    Rows are looked for in each worker's memory first (kept OBJECT_CACHE_LOCAL_SECONDS), then in the OBJECT_CACHE
+    cache from CACHES shared by the workers (kept OBJECT_CACHE_SECONDS) and last in the database. Cached rows are
+    shared between requests, treat them as read only.
+
+    `depends` maps other models to the lookups from this model to them, when one of those rows changes the rows of
+    this model related to it are dropped too. music.signals drops rows when they're saved, deleted or their links
+    change; another worker may still have the old row in memory for up to OBJECT_CACHE_LOCAL_SECONDS.
+    """
+    STATS_FLUSH_SIZE = 100
+
+    def __init__(self, model, select_related=(), prefetch_related=(), depends: dict = None):
+        self.model = model
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        self.depends = {
+            other: (lookups,) if type(lookups) == str else tuple(lookups)
+            for other, lookups in (depends or {}).items()
+        }
+        self.prefix = f'music:objects:{model._meta.label_lower}'
+        self.__local = {}
+        self.__lock = Lock()
+        self.__pending = Counter()
+
+    @property
+    def cache(self):
+        return caches[settings.OBJECT_CACHE]
+
+    def key(self, pk) -> str:
+        return f'{self.prefix}:{pk}'
+
+    def in_bulk(self, pks: Iterable[int]) -> Dict[int, object]:
+        now = monotonic()
+        found = {}
+        missing = []
+
+        for pk in dict.fromkeys(pks):
+            entry = self.__local.get(pk)
+            if entry and entry[0] > now:
+                found[pk] = entry[1]
+            else:
+                missing.append(pk)
+
+        local_hits = len(found)
+        shared = self.cache.get_many([self.key(pk) for pk in missing]) if missing else {}
+        queried = []
+
+        for pk in missing:
+            if self.key(pk) in shared:
+                found[pk] = shared[self.key(pk)]
+            else:
+                queried.append(pk)
+
+        if queried:
+            loaded = self.model.objects.select_related(*self.select_related).prefetch_related(
+                *self.prefetch_related
+            ).in_bulk(queried)
+            self.cache.set_many({self.key(pk): obj for pk, obj in loaded.items()}, settings.OBJECT_CACHE_SECONDS)
+            found.update(loaded)
+
+        self.remember({pk: found[pk] for pk in missing if pk in found}, now)
+        self.count(local_hits, len(missing) - len(queried), len(queried))
+        return found
+
+    def get(self, pk: int) -> Optional[object]:
+        return self.in_bulk([pk]).get(pk)
+
+    def remember(self, objects: dict, now: float):
+        """Keep objects in this worker's memory, the oldest are dropped past OBJECT_CACHE_LOCAL_SIZE"""
+        if not objects:
+            return
+
+        expires = now + settings.OBJECT_CACHE_LOCAL_SECONDS
+        with self.__lock:
+            for pk, obj in objects.items():
+                self.__local.pop(pk, None)
+                self.__local[pk] = (expires, obj)
+
+            for pk in list(self.__local)[:max(len(self.__local) - settings.OBJECT_CACHE_LOCAL_SIZE, 0)]:
+                del self.__local[pk]
+
+    def invalidate(self, pks: Iterable[int]):
+        pks = list(pks)
+        with self.__lock:
+            for pk in pks:
+                self.__local.pop(pk, None)
+        self.cache.delete_many([self.key(pk) for pk in pks])
+
+    def clear(self):
+        """Forget every row in this worker's memory, rows in the shared cache expire on their own"""
+        with self.__lock:
+            self.__local.clear()
+
+    def count(self, local_hits: int, shared_hits: int, misses: int):
+        """Lookups are counted in memory and added to counts in the shared cache every STATS_FLUSH_SIZE lookups"""
+        with self.__lock:
+            self.__pending.update({'local_hits': local_hits, 'shared_hits': shared_hits, 'misses': misses})
+            if sum(self.__pending.values()) < self.STATS_FLUSH_SIZE:
+                return
+            pending, self.__pending = self.__pending, Counter()
+
+        for name, value in pending.items():
+            key = f'{self.prefix}:stats:{name}'
+            if not self.cache.add(key, value, None):
+                try:
+                    self.cache.incr(key, value)
+                except ValueError:
+                    # evicted meanwhile
+                    self.cache.add(key, value, None)
+
+    def stats(self) -> dict:
+        """Lookups of every worker since the counts were last reset (the counts this worker hasn't added yet too)"""
+        names = ('local_hits', 'shared_hits', 'misses')
+        shared = self.cache.get_many([f'{self.prefix}:stats:{name}' for name in names])
+        counts = {name: shared.get(f'{self.prefix}:stats:{name}', 0) + self.__pending[name] for name in names}
+        total = sum(counts.values())
+        counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / total, 4) if total else 0.0
+        return counts
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__pending = Counter()
+        self.cache.delete_many([f'{self.prefix}:stats:{name}' for name in ('local_hits', 'shared_hits', 'misses')])
+
+
+artist_cache = ObjectCache(Artist, prefetch_related=('group_members',), depends={Artist: 'group_members'})
+genre_cache = ObjectCache(Genre)
+album_cache = ObjectCache(
+    Album,
+    select_related=('genre',),
+    prefetch_related=('artists__group_members', 'other_versions'),
+    depends={Artist: ('artists', 'artists__group_members'), Album: 'other_versions', Genre: 'genre'}
+)
+object_caches = (artist_cache, genre_cache, album_cache)
+
+
+def invalidate_objects(model, pks: Iterable[int]):
+    """Drop the rows of `model` from its cache and the cached rows that show them"""
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+
+    for object_cache in object_caches:
+        if object_cache.model == model:
+            object_cache.invalidate(pks)
+
+        for lookup in object_cache.depends.get(model, ()):
+            object_cache.invalidate(set(
+                object_cache.model.objects.filter(**{f'{lookup}__in': pks}).values_list('pk', flat=True)
+            ))
+
+
+def cached_or_404(object_cache: ObjectCache, pk):
+    """Like get_object_or_404 for a cached model"""
+    obj = object_cache.get(int(pk))
+    if obj is None:
+        raise Http404
+    return obj
@@ -0,0 +1,157 @@
+from django.db import IntegrityError
+from django.db.models import Count, F, Prefetch, Q
+
+from .models import Album, Artist, Creator, CreatorSection, Genre, PageDocument, Playlist, Song, profile_songs
+from .serializers import CreatorSectionSerializer, CreatorSerializer, GenreSerializer, PlaylistSerializer
+from .stamps import PAGES, touch_stamps
+
+
+def section_items(clean: bool) -> list:
+    """
+    Prefetch what compact sections list, just the columns shown and a count of each playlist's songs; a page is
+    then 4 queries for the sections however much they hold. Sections are expanded one at a time by the section view
+    """
+    songs = Count('songs', filter=Q(songs__explicit=False)) if clean else Count('songs')
+    return [
+        Prefetch('artists', queryset=Artist.objects.only('id', 'name', 'avi')),
+        Prefetch('albums', queryset=Album.objects.only('id', 'title', 'cover')),
+        Prefetch('playlists', queryset=Playlist.objects.only('id', 'title', 'cover').annotate(song_count=songs))
+    ]
+
+
+def curator_content(curator: Creator, clean: bool) -> dict:
+    sections = curator.creatorsection_set.prefetch_related(*section_items(clean))
+    playlists = curator.playlist_set.filter(artist__isnull=True).prefetch_related(profile_songs('songs', clean=clean))
+    return {
+        'sections': CreatorSectionSerializer(sections, many=True, read_only=True, compact=True).data,
+        'playlists': PlaylistSerializer(playlists, many=True, read_only=True).data
+    }
+
+
+def genre_page(genre: Genre, clean: bool) -> dict:
+    page = GenreSerializer(genre, read_only=True).data
+    main_curator = [genre.main_curator] if genre.main_curator else []
+    genre_curators = set(list(genre.creator_set.all()) + main_curator)
+    page.update({'curators': CreatorSerializer(genre_curators, many=True, read_only=True).data})
+    page.update(curator_content(genre.main_curator, clean) if genre.main_curator else {'sections': [], 'playlists': []})
+    return page
+
+
+def curator_page(curator: Creator, clean: bool) -> dict:
+    page = CreatorSerializer(curator, read_only=True).data
+    page.update(curator_content(curator, clean))
+    return page
+
+
+BUILDERS = {
+    PageDocument.GENRE: (Genre, genre_page),
+    PageDocument.CURATOR: (Creator, curator_page)
+}
+# lookups from a curator to the rows of each model its page shows; a genre's page shows its curators and the page of
+# its main curator
+SHOWN_BY_CURATORS = {
+    Creator: ('pk',),
+    Genre: ('genres',),
+    CreatorSection: ('creatorsection',),
+    Playlist: ('playlist', 'creatorsection__playlists'),
+    Song: ('playlist__songs', 'creatorsection__playlists__songs'),
+    Album: ('creatorsection__albums',),
+    Artist: (
+        'creatorsection__artists',
+        'playlist__songs__additional_artists',
+        'playlist__songs__additional_artists__group_members'
+    )
+}
+
+
+def build_page(kind: str, obj, clean: bool, generation: int = None) -> dict:
+    """
+    Serialize the page and store it. A page that went stale again while it was being built (its generation moved on)
+    is returned but not stored as fresh
+    """
+    document = BUILDERS[kind][1](obj, clean)
+    page = PageDocument.objects.filter(kind=kind, object_id=obj.pk, clean=clean)
+
+    if generation is None:
+        try:
+            PageDocument.objects.create(kind=kind, object_id=obj.pk, clean=clean, document=document)
+        except IntegrityError:
+            # built by another worker meanwhile
+            return document
+    elif not page.filter(generation=generation).update(document=document, stale=False):
+        return document
+
+    # what the pages show moved on
+    touch_stamps(PAGES)
+    return document
+
+
+def page_document(kind: str, obj, clean: bool = False) -> dict:
+    """
+    The stored page, built first when there's none yet. A stale page is served as it is until `build_stale_pages`
+    (the build_pages command) builds it again
+    """
+    stored = PageDocument.objects.filter(kind=kind, object_id=obj.pk, clean=clean).values_list(
+        'document', flat=True
+    ).first()
+
+    return build_page(kind, obj, clean) if stored is None else stored
+
+
+def pages_showing(model, pks) -> Q:
+    """A PageDocument filter for the pages showing the rows of `model` with `pks`"""
+    pks = set(pks)
+    curators = set()
+    genres = pks if model == Genre else set()
+
+    for lookup in SHOWN_BY_CURATORS.get(model, ()):
+        curators.update(Creator.objects.filter(**{f'{lookup}__in': pks}).values_list('pk', flat=True))
+
+    if curators:
+        genres = genres | set(Genre.objects.filter(
+            Q(main_curator__in=curators) | Q(creator__in=curators)
+        ).values_list('pk', flat=True))
+
+    return Q(kind=PageDocument.CURATOR, object_id__in=curators) | Q(kind=PageDocument.GENRE, object_id__in=genres)
+
+
+def mark_pages_stale(model=None, pks=()):
+    """
+    Something shown on pages changed, the pages showing the rows of `model` with `pks` (every page without a model)
+    are built again by `build_stale_pages`
+    """
+    pages = PageDocument.objects.all()
+    if model is not None:
+        pks = [pk for pk in pks if pk is not None]
+        if not pks or not pages.exists():
+            return
+        pages = pages.filter(pages_showing(model, pks))
+
+    pages.update(stale=True, generation=F('generation') + 1)
+
+
+def build_stale_pages(build_all: bool = False) -> int:
+    """Build the stale pages (or every genre's and curator's with build_all), returns the number of pages built"""
+    built = 0
+
+    if build_all:
+        for kind, (model, _) in BUILDERS.items():
+            built_ids = set(PageDocument.objects.filter(kind=kind).values_list('object_id', 'clean'))
+            for obj in model.objects.all():
+                for clean in (False, True):
+                    if (obj.pk, clean) not in built_ids:
+                        build_page(kind, obj, clean)
+                        built += 1
+
+    for kind, object_id, clean, generation in PageDocument.objects.filter(stale=True).values_list(
+        'kind', 'object_id', 'clean', 'generation'
+    ):
+        obj = BUILDERS[kind][0].objects.filter(pk=object_id).first()
+
+        if obj is None:
+            PageDocument.objects.filter(kind=kind, object_id=object_id).delete()
+        else:
+            build_page(kind, obj, clean, generation)
+            built += 1
+
+    return built
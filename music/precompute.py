@@ -0,0 +1,61 @@
+from typing import Iterable, List, Optional
+
+from django.db.models import Q
+
+from .counters import top_song_pks
+from .models import Artist, Song
+
+TOP_SONGS = 10
+# twice as many are kept, minors get them without explicit songs and still get TOP_SONGS
+KEPT_TOP_SONGS = TOP_SONGS * 2
+
+
+def artist_songs(artist_pk: int):
+    """Published songs of an artist, from their albums, songs they're an additional artist on and features"""
+    return Song.objects.filter(
+        Q(disc__album__artists__pk=artist_pk) | Q(additional_artists__pk=artist_pk) | Q(featured_artists__pk=artist_pk),
+        disc__album__published=True
+    ).distinct()
+
+
+def refresh_top_songs(artist_pks: Iterable[int]):
+    """Work out and store the top songs of each artist"""
+    for artist_pk in set(artist_pks):
+        Artist.objects.filter(pk=artist_pk).update(
+            top_songs=','.join(str(pk) for pk in top_song_pks(artist_songs(artist_pk), KEPT_TOP_SONGS))
+        )
+
+
+def artist_top_songs(artist: Artist, size: Optional[int] = TOP_SONGS) -> List[int]:
+    """
+    Pks of the artist's top songs, they're worked out the first time they're asked for.
+    size=None gives all KEPT_TOP_SONGS, for lists cut after some songs are left out
+    """
+    if artist.top_songs is None:
+        refresh_top_songs([artist.pk])
+        artist.refresh_from_db(fields=['top_songs'])
+
+    return artist.top_songs_pk[:size]
+
+
+def song_artist_pks(song_pks: Iterable[int]) -> set:
+    """Pks of every artist on the songs; album artists, additional artists and features"""
+    song_pks = list(song_pks)
+    return set(Artist.objects.filter(
+        Q(album__disc__song__pk__in=song_pks) | Q(additions__pk__in=song_pks) | Q(features__pk__in=song_pks)
+    ).values_list('pk', flat=True).distinct())
+
+
+def album_artist_pks(album_pks: Iterable[int]) -> set:
+    """Pks of every artist on the albums, including those only on some of the songs"""
+    album_pks = list(album_pks)
+    return set(Artist.objects.filter(
+        Q(album__pk__in=album_pks) |
+        Q(additions__disc__album__pk__in=album_pks) |
+        Q(features__disc__album__pk__in=album_pks)
+    ).values_list('pk', flat=True).distinct())
+
+
+def forget_top_songs(artist_pks: Iterable[int]):
+    """The artists' top songs are worked out again the next time they're asked for"""
+    Artist.objects.filter(pk__in=list(artist_pks)).update(top_songs=None)
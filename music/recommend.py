@@ -0,0 +1,191 @@
+import os
+from pathlib import Path
+from shutil import rmtree
+from time import time_ns
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from scipy import sparse
+
+from core.models import Profile
+from .counters import top_k
+from .models import LibraryAlbum, PlayHistory, Playlist
+
+FACTORS = 32
+ITERATIONS = 15
+REGULARIZATION = 0.1
+# confidence in a preference is 1 + ALPHA * interactions
+ALPHA = 10
+# a song in the library counts as this many plays
+LIBRARY_WEIGHT = 5
+
+FILES = ('profile_pks', 'song_pks', 'profile_factors', 'song_factors')
+
+
+def library_pairs(profile: Profile = None) -> np.ndarray:
+    """(profile pk, song pk) of the songs in profiles' library albums and playlists"""
+    library_albums = LibraryAlbum.songs.through.objects.values_list('libraryalbum__profile', 'song')
+    playlists = Playlist.songs.through.objects.filter(playlist__profile__isnull=False).values_list(
+        'playlist__profile', 'song'
+    )
+
+    if profile:
+        library_albums = library_albums.filter(libraryalbum__profile=profile)
+        playlists = playlists.filter(playlist__profile=profile)
+
+    return np.array(
+        list(library_albums.iterator()) + list(playlists.iterator()), dtype=np.int64
+    ).reshape(-1, 2)
+
+
+def interactions() -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+    """
+    profile pks, song pks and a profile x song matrix of how much each profile listens to each song;
+    plays in the history plus LIBRARY_WEIGHT for songs in the library
+    """
+    library = library_pairs()
+    plays = np.array(
+        list(PlayHistory.objects.values('profile', 'song').annotate(plays=Count('pk')).values_list(
+            'profile', 'song', 'plays'
+        ).iterator()),
+        dtype=np.int64
+    ).reshape(-1, 3)
+
+    profiles = np.concatenate([library[:, 0], plays[:, 0]])
+    songs = np.concatenate([library[:, 1], plays[:, 1]])
+    weights = np.concatenate([np.full(len(library), LIBRARY_WEIGHT), plays[:, 2]]).astype(np.float64)
+
+    profile_pks, rows = np.unique(profiles, return_inverse=True)
+    song_pks, cols = np.unique(songs, return_inverse=True)
+    # repeated pairs (a song in two playlists) are summed
+    matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(len(profile_pks), len(song_pks)))
+    return profile_pks, song_pks, matrix
+
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren and Volinsky, 2008)
+        als = ImplicitALS(factors=32, regularization=0.1, alpha=10, iterations=15)
+        profile_factors, song_factors = als.fit(profile x song interactions)
+
+    Every interaction is a preference of 1 with a confidence of 1 + alpha * interactions, everything else a preference
+    of 0 with a confidence of 1. Each half step solves a small factors x factors system for every row using
+    Y^T C Y = Y^T Y + Y^T (C - I) Y, so the dense part is shared and only the row's interactions are touched.
+    """
+
+    def __init__(self, factors=FACTORS, regularization=REGULARIZATION, alpha=ALPHA, iterations=ITERATIONS, seed=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.seed = seed
+
+    def solve(self, fixed: np.ndarray, confidence: sparse.csr_matrix) -> np.ndarray:
+        """Factors of the rows of `confidence` (C - I) given the `fixed` factors of its columns"""
+        shared = fixed.T @ fixed + self.regularization * np.eye(self.factors)
+        solved = np.zeros((confidence.shape[0], self.factors))
+
+        for row in range(confidence.shape[0]):
+            start, end = confidence.indptr[row], confidence.indptr[row + 1]
+            if start == end:
+                continue
+
+            cols, extra = confidence.indices[start:end], confidence.data[start:end]
+            row_fixed = fixed[cols]
+            solved[row] = np.linalg.solve(
+                shared + (row_fixed.T * extra) @ row_fixed,
+                row_fixed.T @ (extra + 1)
+            )
+
+        return solved
+
+    def fit(self, matrix: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        confidence = (matrix * self.alpha).tocsr()
+        confidence_t = confidence.T.tocsr()
+        rng = np.random.default_rng(self.seed)
+        song_factors = rng.normal(scale=0.01, size=(matrix.shape[1], self.factors))
+        profile_factors = np.zeros((matrix.shape[0], self.factors))
+
+        for _ in range(self.iterations):
+            profile_factors = self.solve(song_factors, confidence)
+            song_factors = self.solve(profile_factors, confidence_t)
+
+        return profile_factors, song_factors
+
+
+def train(**options) -> int:
+    """Factorize the interactions and save the factors to RECOMMENDATIONS_DIR, returns the number of profiles"""
+    profile_pks, song_pks, matrix = interactions()
+    profile_factors, song_factors = ImplicitALS(**options).fit(matrix)
+    saved = {
+        'profile_pks': profile_pks,
+        'song_pks': song_pks,
+        'profile_factors': profile_factors.astype(np.float32),
+        'song_factors': song_factors.astype(np.float32)
+    }
+
+    # every run gets its own directory and 'current' is switched to it in one rename, readers never mix two runs
+    directory = Path(settings.RECOMMENDATIONS_DIR)
+    run = f'run-{time_ns()}'
+    (directory / run).mkdir(parents=True)
+    for name in FILES:
+        np.save(directory / run / f'{name}.npy', saved[name])
+
+    (directory / 'current.new').write_text(run)
+    os.replace(directory / 'current.new', directory / 'current')
+
+    for old in directory.glob('run-*'):
+        if old.name != run:
+            # workers that still have the old files mapped keep reading them until they reload
+            rmtree(old, ignore_errors=True)
+
+    return len(profile_pks)
+
+
+class Recommender:
+    """
+    Songs for a profile from the factors saved by `train`, the files are memory mapped and shared by the workers
+        recommender.recommend(profile, 20) -> [(song_pk, score), ...] best first
+
+    The factors are reloaded when a new training run replaces them.
+    """
+
+    def __init__(self):
+        self.__version = None
+        self.__arrays = None
+
+    def load(self) -> Optional[dict]:
+        directory = Path(settings.RECOMMENDATIONS_DIR)
+        try:
+            run = directory / (directory / 'current').read_text()
+            if run != self.__version:
+                self.__arrays = {name: np.load(run / f'{name}.npy', mmap_mode='r') for name in FILES}
+                self.__version = run
+        except FileNotFoundError:
+            # not trained yet, or replaced while loading
+            return self.__arrays
+
+        return self.__arrays
+
+    def recommend(self, profile: Profile, k: int) -> List[Tuple[int, float]]:
+        """The k songs with the highest predicted preference that aren't in the profile's library"""
+        arrays = self.load()
+        if not arrays:
+            return []
+
+        profile_pks, song_pks = arrays['profile_pks'], arrays['song_pks']
+        row = np.searchsorted(profile_pks, profile.pk)
+        if row >= len(profile_pks) or profile_pks[row] != profile.pk:
+            # no plays or library when the factors were trained
+            return []
+
+        scores = arrays['song_factors'] @ arrays['profile_factors'][row]
+        candidates = ~np.isin(song_pks, library_pairs(profile)[:, 1])
+        return [
+            (pk, round(score, 4)) for pk, score in top_k(song_pks[candidates], scores[candidates].astype(np.float64), k)
+        ]
+
+
+recommender = Recommender()
@@ -0,0 +1,73 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Song, SongDailyStreams, Genre
+
+
+def add_daily_streams(plays: List[Tuple[int, int, float]]):
+    """
+    Add plays [(song_pk, profile_pk, played_at)] to the streams of each song on the day (local time) it was played
+    Rows that don't exist yet are created empty in one INSERT ... ON CONFLICT DO NOTHING, then counts are added with
+    one UPDATE for each day and count, so workers flushing at the same time don't overwrite each other
+    """
+    counts = Counter(
+        (timezone.localdate(datetime.fromtimestamp(played_at, tz=timezone.utc)), song_pk)
+        for song_pk, _, played_at in plays
+    )
+    known = set(Song.objects.filter(pk__in={song_pk for _, song_pk in counts}).values_list('pk', flat=True))
+    by_count = defaultdict(list)
+
+    for (day, song_pk), count in counts.items():
+        if song_pk in known:
+            by_count[(day, count)].append(song_pk)
+
+    with transaction.atomic():
+        SongDailyStreams.objects.bulk_create(
+            [
+                SongDailyStreams(song_id=song_pk, day=day)
+                for (day, _), song_pks in by_count.items() for song_pk in song_pks
+            ],
+            ignore_conflicts=True
+        )
+
+        for (day, count), song_pks in by_count.items():
+            SongDailyStreams.objects.filter(day=day, song__pk__in=song_pks).update(streams=F('streams') + count)
+
+
+def streams_between(start: date, end: date, genre: Genre = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Streams of every song played from start to end (both included), optionally only songs in genre
+    Returns two arrays, song pks and their streams, added up by the database from the daily rows
+    """
+    daily = SongDailyStreams.objects.filter(day__gte=start, day__lte=end)
+
+    if genre:
+        daily = daily.filter(song__genre=genre)
+
+    rows = np.array(
+        list(daily.values('song').annotate(total=Sum('streams')).values_list('song', 'total').iterator()),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+
+def recent_streams(days: int, genre: Genre = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Streams of every song over the last `days` days including today, see `streams_between`"""
+    today = timezone.localdate()
+    return streams_between(today - timedelta(days=days - 1), today, genre)
+
+
+def song_history(song: Song, days: int) -> Dict[date, int]:
+    """A song's streams for each of the last `days` days including today, days with no streams are 0"""
+    today = timezone.localdate()
+    history = {today - timedelta(days=i): 0 for i in range(days - 1, -1, -1)}
+    history.update(
+        SongDailyStreams.objects.filter(song=song, day__gt=today - timedelta(days=days)).values_list('day', 'streams')
+    )
+    return history
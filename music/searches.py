@@ -11,10 +11,11 @@ from . import models as ms_models, serializers as ms_serializers
 class MusicSearch:
     """
     Search music
-        ms_search = MusicSearch(term='drake', staff_view=False)
-    takes two args
+        ms_search = MusicSearch(term='drake', staff_view=False, profile=None)
+    takes three args
         1. term = search term
         2. staff_view = True if used in a staff view else False for normal users view
+        3. profile = the profile searching, explicit songs are left out for minors
 
     Usage:
         ms_search.get_results()
@@ -40,9 +41,10 @@ class MusicSearch:
     serial_data, unless refresh=True hits database again
     """
 
-    def __init__(self, term='', staff_view=False):
+    def __init__(self, term='', staff_view=False, profile=None):
         self.term = term
         self.staff_view = staff_view
+        self.profile = profile
         self.results = None
         self.serial_data = None
         self.time_taken = None
@@ -98,7 +100,9 @@ class MusicSearch:
             Q(creator__name__icontains=self.term) |
             Q(creator__genres__title__icontains=self.term)
         )
-        s_playlists = ms_models.Playlist.objects.filter(playlist_q_set, profile__isnull=True)
+        s_playlists = ms_models.Playlist.objects.filter(playlist_q_set, profile__isnull=True).prefetch_related(
+            ms_models.profile_songs('songs', self.profile)
+        )
 
         return sorted(
             set(s_playlists),
@@ -112,7 +116,7 @@ class MusicSearch:
             Q(disc__album__title__icontains=self.term) |
             Q(additional_artists__name__icontains=self.term)
         )
-        s_songs = ms_models.Song.objects.filter(song_s)
+        s_songs = ms_models.Song.objects.for_profile(self.profile).filter(song_s).select_related('disc')
 
         if not self.staff_view:
             s_songs = s_songs.filter(disc__album__published=True)
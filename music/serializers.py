@@ -1,41 +1,146 @@
-from itertools import chain
-from datetime import datetime
-from pytz import UTC
+from heapq import merge
+from itertools import islice
 
+from django.db.models import Manager
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.serializers import ModelSerializer, SerializerMethodField, CharField, Serializer, ListSerializer
 
-from rest_framework.serializers import ModelSerializer, SerializerMethodField, CharField, Serializer
-
-from .models import Artist, Genre, Album, Disc, Song, Playlist, Creator, CreatorSection, LibraryAlbum
+from .models import Artist, Genre, Album, Disc, Song, Playlist, Creator, CreatorSection, LibraryAlbum, profile_songs
+from .objects import album_cache
 from core.serializers import ProfileSerializer
 from core.models import Profile
 
 
-class ArtistSerializer(ModelSerializer):
+MEMO = 'memo'
+ALBUMS = 'albums'
+
+
+def response_context() -> dict:
+    return {MEMO: {}, ALBUMS: {}}
+
+
+def warm_albums(songs, context: dict):
+    """
+    Read the albums of `songs` that `context` doesn't have yet with one album_cache lookup, SongSerializer finds them
+    there for album_info=True; the songs' discs should be read with them (select_related('disc'))
+    """
+    albums = context.setdefault(ALBUMS, {})
+    missing = {song.disc.album_id for song in songs} - albums.keys()
+    if missing:
+        albums.update(album_cache.in_bulk(missing))
+
+
+class MemoSerializerMixin:
+    """
+    Serialize each row once per response; the data of every (serializer, fields, pk) is kept in the root
+    serializer's context and reused when the row shows up again, e.g. an artist on an album and on each of its songs.\n
+    Pass context=response_context() to share it between the serializers of one response
+    """
+
+    def to_representation(self, instance):
+        if instance.pk is None:
+            return super().to_representation(instance)
+
+        memo = self.root._context.setdefault(MEMO, {})
+        key = (type(self), tuple(self.fields), instance.pk)
+
+        if key not in memo:
+            memo[key] = super().to_representation(instance)
+
+        return memo[key]
+
+
+class SparseFieldsMixin:
+    """
+    Serialize only some of the fields, pass fields=('id', 'title') to keep only those and/or exclude=('copyright',)
+    to leave some out; fields left out aren't worked out at all (method fields, nested serializers).\n
+    `related_fields` maps fields to the relation each reads, `related_lookups(...)` keeps the select_related and
+    prefetch_related lookups the kept fields need so dropping a field also saves the queries behind it
+    """
+    related_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        exclude = kwargs.pop('exclude', None)
+
+        super().__init__(*args, **kwargs)
+
+        for name in self.dropped_fields(fields, exclude):
+            self.fields.pop(name, None)
+
+    @classmethod
+    def field_names(cls) -> tuple:
+        return tuple(cls.Meta.fields)
+
+    @classmethod
+    def dropped_fields(cls, fields=None, exclude=None) -> set:
+        dropped = set(exclude or ())
+        if fields is not None:
+            dropped.update(name for name in cls.field_names() if name not in fields)
+        return dropped
+
+    @classmethod
+    def related_lookups(cls, lookups, fields=None, exclude=None) -> list:
+        """The lookups (names or Prefetch objects) that don't start at the relation of a dropped field"""
+        dropped = {
+            cls.related_fields[name] for name in cls.dropped_fields(fields, exclude) if name in cls.related_fields
+        }
+        return [
+            lookup for lookup in lookups
+            if getattr(lookup, 'prefetch_through', lookup).split(LOOKUP_SEP)[0] not in dropped
+        ]
+
+    @classmethod
+    def load_related(cls, queryset, select_related=(), prefetch_related=(), fields=None, exclude=None):
+        """`queryset` with the related rows the kept fields show"""
+        select_related = cls.related_lookups(select_related, fields, exclude)
+        prefetch_related = cls.related_lookups(prefetch_related, fields, exclude)
+        # select_related() without lookups would follow every foreign key
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.prefetch_related(*prefetch_related)
+
+
+class ArtistSerializer(SparseFieldsMixin, MemoSerializerMixin, ModelSerializer):
     group_members = SerializerMethodField()
+    related_fields = {'group_members': 'group_members'}
 
     class Meta:
         model = Artist
         fields = ('name', 'is_group', 'group_members', 'avi', 'cover', 'bio', 'id')
 
-    @staticmethod
-    def get_group_members(obj):
+    def get_group_members(self, obj):
         if hasattr(obj, 'is_group') and obj.is_group:
-            return ArtistSerializer(obj.group_members.all(), many=True, read_only=True).data
+            return ArtistSerializer(obj.group_members.all(), many=True, read_only=True, context=self.context).data
 
 
-class GenreSerializer(ModelSerializer):
+class GenreSerializer(SparseFieldsMixin, MemoSerializerMixin, ModelSerializer):
 
     class Meta:
         model = Genre
         fields = ('title', 'description', 'avi', 'cover', 'id')
 
 
-class SongSerializer(ModelSerializer):
+class SongListSerializer(ListSerializer):
+    """Reads the albums of all the songs at once before serializing them when they show album info"""
+
+    def to_representation(self, data):
+        songs = list(data.all() if isinstance(data, Manager) else data)
+        if 'album_art' in self.child.fields or 'album_artists' in self.child.fields:
+            warm_albums(songs, self.root._context)
+        return super(SongListSerializer, self).to_representation(songs)
+
+
+class SongSerializer(SparseFieldsMixin, MemoSerializerMixin, ModelSerializer):
+    """Pass album_info=True to add the album's cover and artists, albums are read from music.objects.album_cache"""
     additional_artists = ArtistSerializer(many=True, read_only=True)
-    album_artists = ArtistSerializer(many=True, read_only=True)
+    album_art = SerializerMethodField()
+    album_artists = SerializerMethodField()
+    related_fields = {'additional_artists': 'additional_artists'}
 
     class Meta:
         model = Song
+        list_serializer_class = SongListSerializer
         fields = (
             'id', 'track_no', 'title', 'explicit', 'length', 'file', 'likes', 'streams', 'additional_artists',
             'album_art', 'album_artists'
@@ -47,8 +152,21 @@ class SongSerializer(ModelSerializer):
         super(SongSerializer, self).__init__(*args, **kwargs)
 
         if not album_info:
-            self.fields.pop('album_art')
-            self.fields.pop('album_artists')
+            self.fields.pop('album_art', None)
+            self.fields.pop('album_artists', None)
+
+    def album(self, obj):
+        # songs of the same album are usually serialized together
+        albums = self.root._context.setdefault(ALBUMS, {})
+        if obj.disc.album_id not in albums:
+            albums[obj.disc.album_id] = album_cache.get(obj.disc.album_id)
+        return albums[obj.disc.album_id]
+
+    def get_album_art(self, obj):
+        return self.album(obj).cover.url
+
+    def get_album_artists(self, obj):
+        return ArtistSerializer(self.album(obj).artists.all(), many=True, read_only=True, context=self.context).data
 
 
 class DiscSerializer(ModelSerializer):
@@ -59,12 +177,13 @@ class DiscSerializer(ModelSerializer):
         fields = ('id', 'name', 'songs')
 
 
-class AlbumSerializer(ModelSerializer):
+class AlbumSerializer(SparseFieldsMixin, MemoSerializerMixin, ModelSerializer):
     discs = DiscSerializer(source='disc_set', many=True)
     album_type = CharField(source='al_code')
     artists = ArtistSerializer(many=True)
     genre = GenreSerializer()
     other_versions = SerializerMethodField()
+    related_fields = {'genre': 'genre', 'artists': 'artists', 'other_versions': 'other_versions', 'discs': 'disc_set'}
 
     def __init__(self, *args, **kwargs):
         no_discs = kwargs.pop('no_discs', False)
@@ -72,7 +191,7 @@ class AlbumSerializer(ModelSerializer):
         super(AlbumSerializer, self).__init__(*args, **kwargs)
 
         if no_discs:
-            self.fields.pop('discs')
+            self.fields.pop('discs', None)
 
     class Meta:
         model = Album
@@ -110,7 +229,37 @@ class PlaylistSerializer(ModelSerializer):
             return obj.modified.strftime('%Y-%m-%d')
 
 
+class SectionArtistSerializer(ModelSerializer):
+
+    class Meta:
+        model = Artist
+        fields = ('id', 'name', 'avi')
+
+
+class SectionAlbumSerializer(ModelSerializer):
+
+    class Meta:
+        model = Album
+        fields = ('id', 'title', 'cover')
+
+
+class SectionPlaylistSerializer(ModelSerializer):
+    song_count = SerializerMethodField()
+
+    class Meta:
+        model = Playlist
+        fields = ('id', 'title', 'cover', 'song_count')
+
+    @staticmethod
+    def get_song_count(obj):
+        return obj.song_count if hasattr(obj, 'song_count') else obj.songs.count()
+
+
 class CreatorSectionSerializer(ModelSerializer):
+    """
+    A curator's section with its artists, albums and playlists (and their songs) in full.\n
+    Pass compact=True to only list the items; ids, titles, covers and song counts of playlists
+    """
     artists = ArtistSerializer(many=True)
     albums = AlbumSerializer(many=True, no_discs=True)
     playlists = PlaylistSerializer(many=True)
@@ -119,6 +268,16 @@ class CreatorSectionSerializer(ModelSerializer):
         model = CreatorSection
         fields = ('id', 'name', 'artists', 'albums', 'playlists')
 
+    def __init__(self, *args, **kwargs):
+        compact = kwargs.pop('compact', False)
+
+        super(CreatorSectionSerializer, self).__init__(*args, **kwargs)
+
+        if compact:
+            self.fields['artists'] = SectionArtistSerializer(many=True)
+            self.fields['albums'] = SectionAlbumSerializer(many=True)
+            self.fields['playlists'] = SectionPlaylistSerializer(many=True)
+
 
 class CreatorSerializer(ModelSerializer):
     genres = GenreSerializer(many=True)
@@ -149,48 +308,92 @@ class LibraryAlbumSerializer(ModelSerializer):
             return obj.added.strftime('%Y-%m-%d')
 
 
+LIBRARY_PAGE_SIZE = 50
+MAX_LIBRARY_PAGE_SIZE = 200
+PLAYLIST = 'PLAYLIST'
+LIB_ALBUM = 'LIBRARY_ALBUM'
+
+
 class Library(Serializer):
+    """
+    A profile's library; playlists and library albums newest first.\n
+    Pass context={'page': 1, 'page_size': 50} to get a specific page of the library
+    """
     library_profile = SerializerMethodField()
     library_items = SerializerMethodField()
+    library_page = SerializerMethodField()
+
+    def __init__(self, *args, **kwargs):
+        super(Library, self).__init__(*args, **kwargs)
+        self.has_next = False
 
     @staticmethod
     def get_library_profile(obj):
         if type(obj) == Profile:
             return ProfileSerializer(obj).data
 
+    def page_info(self):
+        page = self.context.get('page', 1)
+        page_size = self.context.get('page_size', LIBRARY_PAGE_SIZE)
+        page = page if type(page) == int and page > 0 else 1
+        page_size = page_size if type(page_size) == int and page_size > 0 else LIBRARY_PAGE_SIZE
+        return page, min(page_size, MAX_LIBRARY_PAGE_SIZE)
+
     @staticmethod
-    def get_library_items(obj):
+    def timeline(profile, limit: int = None, chunk_size: int = LIBRARY_PAGE_SIZE):
+        """(added, pk, item type) of every playlist and library album, newest first; the first `limit` of each"""
+        playlists = profile.playlist_set.order_by('-created', '-pk').values_list('created', 'pk')
+        lib_albums = profile.libraryalbum_set.order_by('-added', '-pk').values_list('added', 'pk')
+
+        if limit is not None:
+            playlists, lib_albums = playlists[:limit], lib_albums[:limit]
+
+        return merge(
+            ((stamp, pk, PLAYLIST) for stamp, pk in playlists.iterator(chunk_size=chunk_size)),
+            ((stamp, pk, LIB_ALBUM) for stamp, pk in lib_albums.iterator(chunk_size=chunk_size)),
+            reverse=True
+        )
+
+    def get_library_items(self, obj):
         if hasattr(obj, 'playlist_set') and hasattr(obj, 'libraryalbum_set'):
-            playlists = obj.playlist_set.order_by('-created')
-            lib_albums = obj.libraryalbum_set.order_by('-added')
-            PLAYLIST = 'PLAYLIST'
-            LIB_ALBUM = 'LIBRARY_ALBUM'
-
-            def get_item_timestamp(pk, type_):
-                stamp = datetime(1970, 1, 1, 0, 0, 0, 0, UTC)
-
-                if type_ == PLAYLIST:
-                    stamp = playlists.get(pk=pk).created
-                elif type_ == LIB_ALBUM:
-                    stamp = lib_albums.get(pk=pk).added
-
-                return stamp
-
-            # all items
-            items = list(chain(
-                PlaylistSerializer(playlists, many=True).data,
-                LibraryAlbumSerializer(lib_albums, many=True).data
-            ))
-
-            # label each as playlist or album
-            for item_ in items:
-                item_['item_type'] = PLAYLIST if item_.get('title') else LIB_ALBUM
-
-            # arrange them by time stamp
-            items = sorted(
-                items,
-                reverse=True,
-                key=lambda item: get_item_timestamp(item.get('id'), item.get('item_type'))
-            )
-
-            return items
+            page, page_size = self.page_info()
+            start = (page - 1) * page_size
+            end = start + page_size
+
+            # both are already newest first, only the rows up to this page (plus one to know if there's more) are read
+            timeline = self.timeline(obj, end + 1)
+            window = list(islice(timeline, start, end + 1))
+            self.has_next = len(window) > page_size
+            return self.serialize_items(obj, window[:page_size], self.context)
+
+    @staticmethod
+    def serialize_items(profile, window, context=None) -> list:
+        """Serialized playlists and library albums of a window of the timeline, [(stamp, pk, item type), ...]"""
+        # fetch and serialize only the items in the window, explicit songs are left out for minors
+        playlists = Playlist.objects.prefetch_related(profile_songs('songs', profile)).in_bulk(
+            [pk for _, pk, type_ in window if type_ == PLAYLIST]
+        )
+        lib_albums = LibraryAlbum.objects.select_related('album', 'album__genre').prefetch_related(
+            profile_songs('songs', profile), 'album__artists', 'album__other_versions'
+        ).in_bulk([pk for _, pk, type_ in window if type_ == LIB_ALBUM])
+
+        context = response_context() if context is None else context
+        items = []
+        for _, pk, type_ in window:
+            if type_ == PLAYLIST:
+                item = PlaylistSerializer(playlists[pk], context=context).data
+            else:
+                item = LibraryAlbumSerializer(lib_albums[pk], context=context).data
+
+            item['item_type'] = type_
+            items.append(item)
+
+        return items
+
+    def get_library_page(self, obj):
+        page, page_size = self.page_info()
+        return {
+            'page': page,
+            'page_size': page_size,
+            'has_next': self.has_next
+        }
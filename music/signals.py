@@ -0,0 +1,304 @@
+from datetime import timedelta
+from itertools import chain
+
+from django.db.models.signals import post_delete, post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Profile, User
+from .models import Album, Artist, Creator, CreatorSection, Disc, Genre, Playlist, LibraryAlbum, LibraryTombstone, Song
+from .directory import invalidate_artist_directory
+from .graph import artist_graph
+from .pages import mark_pages_stale
+from .history import add_history
+from .objects import invalidate_objects
+from .precompute import album_artist_pks, forget_top_songs, refresh_top_songs, song_artist_pks
+from .rollups import add_daily_streams
+from .stamps import ALBUMS, ARTISTS, GENRES, PLAYLISTS, SONGS, touch_stamps
+from .streams import streams_flushed
+from .trending import add_trending_plays
+
+
+def profile_being_deleted(origin) -> bool:
+    """True when a delete started from the profile or user, no tombstones are needed then"""
+    return isinstance(origin, (Profile, User))
+
+
+def add_library_tombstone(profile_pk: int, item_type: str, item_id: int):
+    now = timezone.now()
+    LibraryTombstone.objects.filter(
+        profile__pk=profile_pk,
+        removed__lt=now - timedelta(days=LibraryTombstone.KEEP_DAYS)
+    ).delete()
+    LibraryTombstone.objects.create(profile_id=profile_pk, item_type=item_type, item_id=item_id)
+
+
+@receiver(post_delete, sender=Playlist)
+def playlist_deleted(sender, instance: Playlist, origin=None, **kwargs):
+    if instance.profile_id and not profile_being_deleted(origin):
+        add_library_tombstone(instance.profile_id, LibraryTombstone.PLAYLIST, instance.pk)
+
+
+@receiver(post_delete, sender=LibraryAlbum)
+def library_album_deleted(sender, instance: LibraryAlbum, origin=None, **kwargs):
+    if not profile_being_deleted(origin):
+        add_library_tombstone(instance.profile_id, LibraryTombstone.LIB_ALBUM, instance.pk)
+
+
+@receiver(m2m_changed, sender=Playlist.songs.through)
+@receiver(m2m_changed, sender=LibraryAlbum.songs.through)
+def library_songs_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Adding or removing songs does not save the playlist/library album, touch 'modified' so syncing picks it up"""
+    if reverse and action == 'pre_clear':
+        # song.playlist_set.clear(), the playlists/library albums it's cleared from are gone by post_clear
+        cleared = getattr(instance, 'cleared_library_pks', {})
+        cleared[model] = list(model.objects.filter(songs=instance).values_list('pk', flat=True))
+        instance.cleared_library_pks = cleared
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # songs.playlist_set.add(...) etc. instance is the song, pk_set the playlists/library albums
+        if action == 'post_clear':
+            pk_set = getattr(instance, 'cleared_library_pks', {}).pop(model, None)
+        if pk_set:
+            model.objects.filter(pk__in=pk_set).update(modified=timezone.now())
+    else:
+        type(instance).objects.filter(pk=instance.pk).update(modified=timezone.now())
+
+
+@receiver(streams_flushed)
+def streams_written(sender, counts, plays, **kwargs):
+    add_daily_streams(plays)
+    add_history(plays)
+    add_trending_plays(counts)
+    refresh_top_songs(song_artist_pks(counts.keys()))
+
+
+@receiver(post_save, sender=Album)
+def album_saved(sender, instance: Album, created, **kwargs):
+    # publishing or un publishing changes which songs count
+    if not created:
+        refresh_top_songs(album_artist_pks([instance.pk]))
+
+
+@receiver(pre_delete, sender=Album)
+def album_deleted(sender, instance: Album, **kwargs):
+    forget_top_songs(album_artist_pks([instance.pk]))
+
+
+@receiver(post_save, sender=Song)
+@receiver(pre_delete, sender=Song)
+def song_saved_or_deleted(sender, instance: Song, **kwargs):
+    # album artists, additional artists and features; before a delete, the song's credits go with it
+    forget_top_songs(song_artist_pks([instance.pk]))
+
+
+ARTIST_FIELDS = {
+    Album.artists.through: 'artists',
+    Song.additional_artists.through: 'additional_artists',
+    Song.featured_artists.through: 'featured_artists'
+}
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+@receiver(m2m_changed, sender=Song.additional_artists.through)
+@receiver(m2m_changed, sender=Song.featured_artists.through)
+def artist_songs_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """An artist added to or removed from an album or song"""
+    if reverse:
+        # artist.album_set.add(...) etc.
+        artist_pks = [instance.pk] if action in ('post_add', 'post_remove', 'pre_clear') else []
+    elif action in ('post_add', 'post_remove'):
+        artist_pks = pk_set
+    elif action == 'pre_clear':
+        artist_pks = getattr(instance, ARTIST_FIELDS[sender]).values_list('pk', flat=True)
+    else:
+        artist_pks = []
+
+    forget_top_songs(artist_pks)
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+@receiver(m2m_changed, sender=Song.additional_artists.through)
+@receiver(m2m_changed, sender=Song.featured_artists.through)
+def artist_credits_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the collaborations in the artist graph up to date, see music.graph"""
+    if reverse:
+        artist_pks = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action in ('post_add', 'post_remove'):
+        artist_pks = pk_set
+    elif action == 'pre_clear':
+        # the graph is read after they're cleared
+        instance.cleared_artist_pks = list(getattr(instance, ARTIST_FIELDS[sender]).values_list('pk', flat=True))
+        artist_pks = []
+    elif action == 'post_clear':
+        artist_pks = getattr(instance, 'cleared_artist_pks', [])
+    else:
+        artist_pks = []
+
+    artist_graph.refresh_collaborators(artist_pks)
+
+
+@receiver(m2m_changed, sender=Artist.group_members.through)
+def group_members_changed(sender, instance, action, **kwargs):
+    # the other side of every link added or removed is fixed by the graph
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        artist_graph.refresh_members([instance.pk])
+
+
+@receiver(pre_delete, sender=Album)
+@receiver(pre_delete, sender=Song)
+def credited_deleting(sender, instance, **kwargs):
+    if sender == Album:
+        instance.credited_artist_pks = list(instance.artists.values_list('pk', flat=True))
+    else:
+        instance.credited_artist_pks = list(chain(
+            instance.additional_artists.values_list('pk', flat=True),
+            instance.featured_artists.values_list('pk', flat=True)
+        ))
+
+
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Song)
+def credited_deleted(sender, instance, **kwargs):
+    artist_graph.refresh_collaborators(getattr(instance, 'credited_artist_pks', []))
+
+
+@receiver(post_delete, sender=Artist)
+def artist_deleted(sender, instance: Artist, **kwargs):
+    artist_graph.invalidate()
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def artist_saved_or_deleted(sender, instance: Artist, **kwargs):
+    invalidate_artist_directory()
+
+
+@receiver(m2m_changed, sender=Artist.group_members.through)
+def group_changed(sender, action, **kwargs):
+    # groups are listed with their members
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_artist_directory()
+
+
+@receiver(post_save, sender=Creator)
+@receiver(pre_delete, sender=Creator)
+@receiver(post_save, sender=CreatorSection)
+@receiver(pre_delete, sender=CreatorSection)
+@receiver(post_save, sender=Playlist)
+@receiver(pre_delete, sender=Playlist)
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+@receiver(post_save, sender=Album)
+@receiver(pre_delete, sender=Album)
+@receiver(post_save, sender=Artist)
+@receiver(pre_delete, sender=Artist)
+@receiver(post_save, sender=Song)
+@receiver(pre_delete, sender=Song)
+def page_content_changed(sender, instance, **kwargs):
+    """Genre and curator pages show these, see music.pages. The pages showing a deleted row are found before it's
+    deleted"""
+    # profiles' playlists aren't on any page
+    if sender != Playlist or not instance.profile_id:
+        mark_pages_stale(sender, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Creator.genres.through)
+@receiver(m2m_changed, sender=CreatorSection.artists.through)
+@receiver(m2m_changed, sender=CreatorSection.albums.through)
+@receiver(m2m_changed, sender=CreatorSection.playlists.through)
+@receiver(m2m_changed, sender=Playlist.songs.through)
+@receiver(m2m_changed, sender=Album.artists.through)
+@receiver(m2m_changed, sender=Album.other_versions.through)
+@receiver(m2m_changed, sender=Song.additional_artists.through)
+@receiver(m2m_changed, sender=Artist.group_members.through)
+def page_links_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if sender == Playlist.songs.through and not reverse and instance.profile_id:
+        return
+
+    # pages show the rows holding the links (e.g. playlists with their songs), genre pages list their curators too
+    if action in ('post_add', 'post_remove'):
+        if reverse or sender == Creator.genres.through:
+            mark_pages_stale(model, pk_set)
+        if not reverse or sender == Creator.genres.through:
+            mark_pages_stale(type(instance), [instance.pk])
+    elif action == 'pre_clear':
+        # the links are still there to find the pages with
+        mark_pages_stale(type(instance), [instance.pk])
+
+
+@receiver(post_save, sender=Artist)
+@receiver(pre_delete, sender=Artist)
+@receiver(post_delete, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(pre_delete, sender=Album)
+@receiver(post_delete, sender=Album)
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def cached_object_changed(sender, instance, **kwargs):
+    """Drop the row and the cached rows showing it, see music.objects. The rows showing a deleted row are found
+    before it's deleted"""
+    invalidate_objects(sender, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+@receiver(m2m_changed, sender=Album.other_versions.through)
+@receiver(m2m_changed, sender=Artist.group_members.through)
+def cached_links_changed(sender, instance, action, model, pk_set, **kwargs):
+    # rows on both sides show the link, on a clear the other side is found before the links are gone
+    if action in ('pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        invalidate_objects(type(instance), [instance.pk])
+        invalidate_objects(model, pk_set or [])
+
+
+STAMPED = {
+    Genre: (GENRES,),
+    Artist: (ARTISTS,),
+    Album: (ALBUMS,),
+    Disc: (ALBUMS,),
+    Song: (SONGS,),
+    Playlist: (PLAYLISTS,),
+    Album.artists.through: (ALBUMS,),
+    Album.other_versions.through: (ALBUMS,),
+    Artist.group_members.through: (ARTISTS,),
+    Song.additional_artists.through: (SONGS,),
+    Song.featured_artists.through: (SONGS,),
+    Playlist.songs.through: (PLAYLISTS,),
+    Artist.playlists.through: (PLAYLISTS,)
+}
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+@receiver(post_save, sender=Disc)
+@receiver(post_delete, sender=Disc)
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+@receiver(post_save, sender=Playlist)
+@receiver(post_delete, sender=Playlist)
+@receiver(m2m_changed, sender=Album.artists.through)
+@receiver(m2m_changed, sender=Album.other_versions.through)
+@receiver(m2m_changed, sender=Artist.group_members.through)
+@receiver(m2m_changed, sender=Song.additional_artists.through)
+@receiver(m2m_changed, sender=Song.featured_artists.through)
+@receiver(m2m_changed, sender=Playlist.songs.through)
+@receiver(m2m_changed, sender=Artist.playlists.through)
+def catalogue_changed(sender, action=None, **kwargs):
+    """The catalogue views' ETags move on, see music.stamps"""
+    if action is None or action in ('post_add', 'post_remove', 'post_clear'):
+        touch_stamps(*STAMPED[sender])
+
+
+@receiver(streams_flushed)
+def streams_stamped(sender, **kwargs):
+    # songs show their streams and artists their top songs
+    touch_stamps(SONGS)
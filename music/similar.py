@@ -0,0 +1,159 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .counters import top_k
+from .models import CreatorSection, LibraryAlbum, Playlist, SimilarItems, Song
+
+NEIGHBOURS = 20
+# rows per INSERT
+INSERT_BATCH = 500
+
+Neighbours = Dict[int, List[Tuple[int, float]]]
+
+
+def pairs(values_list) -> np.ndarray:
+    """(item pk, container pk) rows of a values_list as an n x 2 array"""
+    return np.array(list(values_list.iterator()), dtype=np.int64).reshape(-1, 2)
+
+
+def incidence(item_pks: np.ndarray, *groups: np.ndarray) -> sparse.csr_matrix:
+    """
+    0/1 matrix, a row for each of item_pks (sorted) and a column for each container in the groups of
+    (item pk, container pk) pairs, e.g. playlists and library albums. An item in a container twice counts once
+    """
+    rows, cols, containers = [], [], 0
+
+    for group in groups:
+        known = np.isin(group[:, 0], item_pks)
+        group = group[known]
+        keys, col = np.unique(group[:, 1], return_inverse=True)
+        rows.append(np.searchsorted(item_pks, group[:, 0]))
+        cols.append(col + containers)
+        containers += len(keys)
+
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(item_pks), containers))
+    return binary(matrix)
+
+
+def binary(matrix: sparse.spmatrix) -> sparse.csr_matrix:
+    matrix = matrix.tocsr()
+    # duplicates were summed
+    matrix.data[:] = 1
+    return matrix
+
+
+def similarity(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """
+    Cosine similarity of the rows of a 0/1 item x container matrix, the number of containers two items share over
+    the geometric mean of the number of containers each is in. An item isn't similar to itself
+    """
+    if not matrix.shape[0]:
+        return sparse.csr_matrix((0, 0))
+
+    shared = (matrix @ matrix.T).tocsr()
+    # setdiag on a csr matrix changes its structure (and warns), the diagonal is subtracted instead
+    shared = (shared - sparse.diags(shared.diagonal())).tocsr()
+    shared.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    scale = sparse.diags(1 / norms)
+    return (scale @ shared @ scale).tocsr()
+
+
+def top_neighbours(item_pks: np.ndarray, similar: sparse.csr_matrix, k: int) -> Neighbours:
+    """The k most similar items of every item that has any, {item pk: [(pk, score), ...] most similar first}"""
+    neighbours = {}
+
+    for row in range(similar.shape[0]):
+        start, end = similar.indptr[row], similar.indptr[row + 1]
+        if start < end:
+            # rounded first so items that tie as stored are ordered by pk
+            scores = np.round(similar.data[start:end], 4)
+            neighbours[int(item_pks[row])] = top_k(item_pks[similar.indices[start:end]], scores, k)
+
+    return neighbours
+
+
+class SimilarityBuilder:
+    """
+    Precompute similar songs and artists from what people put together
+        builder = SimilarityBuilder(size=20)
+        builder.build() -> number of songs and artists with similar items saved
+
+    Songs are similar when they're in the same playlists and library albums. Artists are similar when they're on the
+    same songs (album, additional and featured artists), their songs are in the same playlists and library albums
+    or they're in the same creator sections (directly or through an album).
+    The memberships are loaded once into sparse item x container matrices and similarity is one sparse product,
+    only the top `size` neighbours of each item are stored.
+    """
+
+    def __init__(self, size: int = NEIGHBOURS):
+        self.size = size
+        self.song_pks = np.sort(np.fromiter(Song.objects.values_list('pk', flat=True).iterator(), dtype=np.int64))
+        self.song_containers = incidence(
+            self.song_pks,
+            pairs(Playlist.songs.through.objects.values_list('song', 'playlist')),
+            pairs(LibraryAlbum.songs.through.objects.values_list('song', 'libraryalbum'))
+        )
+
+    def song_neighbours(self) -> Neighbours:
+        return top_neighbours(self.song_pks, similarity(self.song_containers), self.size)
+
+    def artist_neighbours(self) -> Neighbours:
+        on_songs = np.concatenate([
+            pairs(Song.objects.filter(disc__album__artists__isnull=False).values_list('disc__album__artists', 'pk')),
+            pairs(Song.additional_artists.through.objects.values_list('artist', 'song')),
+            pairs(Song.featured_artists.through.objects.values_list('artist', 'song'))
+        ])
+        in_sections = np.concatenate([
+            pairs(CreatorSection.artists.through.objects.values_list('artist', 'creatorsection')),
+            pairs(CreatorSection.albums.through.objects.filter(album__artists__isnull=False).values_list(
+                'album__artists', 'creatorsection'
+            ))
+        ])
+        artist_pks = np.unique(np.concatenate([on_songs[:, 0], in_sections[:, 0]]))
+
+        # artist x song in the same order as the song rows of song_containers, a song is a container of its artists
+        songs = binary(sparse.csr_matrix(
+            (np.ones(len(on_songs)), (
+                np.searchsorted(artist_pks, on_songs[:, 0]),
+                np.searchsorted(self.song_pks, on_songs[:, 1])
+            )),
+            shape=(len(artist_pks), len(self.song_pks))
+        ))
+        matrix = sparse.hstack([
+            songs,
+            binary(songs @ self.song_containers),
+            incidence(artist_pks, in_sections)
+        ]).tocsr()
+        return top_neighbours(artist_pks, similarity(matrix), self.size)
+
+    @staticmethod
+    def save(kind: str, neighbours: Neighbours) -> int:
+        with transaction.atomic():
+            SimilarItems.objects.filter(kind=kind).delete()
+            SimilarItems.objects.bulk_create([
+                SimilarItems(
+                    kind=kind,
+                    item_id=pk,
+                    neighbours=','.join(f'{neighbour}:{score}' for neighbour, score in similar)
+                ) for pk, similar in neighbours.items()
+            ], batch_size=INSERT_BATCH)
+
+        return len(neighbours)
+
+    def build(self) -> int:
+        return self.save(SimilarItems.SONGS, self.song_neighbours()) + \
+            self.save(SimilarItems.ARTISTS, self.artist_neighbours())
+
+
+def similar_items(kind: str, item_pk: int, k: int) -> List[Tuple[int, float]]:
+    """The k most similar songs or artists to an item as precomputed, [(pk, score), ...]"""
+    similar = SimilarItems.objects.filter(kind=kind, item_id=item_pk).first()
+    return similar.entries[:k] if similar else []
@@ -0,0 +1,56 @@
+from datetime import datetime
+from hashlib import md5
+from time import time_ns
+from typing import Dict, Iterable
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CatalogueStamp
+
+# what the catalogue endpoints show, each has a version stamp that moves on when any of it changes (see music.signals)
+GENRES = 'genres'
+ARTISTS = 'artists'
+ALBUMS = 'albums'
+SONGS = 'songs'
+PLAYLISTS = 'playlists'
+PAGES = 'pages'
+STAMPS = (GENRES, ARTISTS, ALBUMS, SONGS, PLAYLISTS, PAGES)
+SECOND = 10 ** 9
+
+
+def touch_stamps(*names: str):
+    """
+    Something shown under these names changed, their stamps become now (in nanoseconds since the epoch) and at least
+    the second after the one they were in, Last-Modified has whole seconds and moves on with every change.
+    Stamps are rows in the database so every worker sees them, the update is one statement
+    """
+    CatalogueStamp.objects.filter(name__in=names).update(
+        stamp=Greatest(Value(time_ns()), F('stamp') - F('stamp') % SECOND + SECOND)
+    )
+
+
+def catalogue_stamps(names: Iterable[str]) -> Dict[str, int]:
+    """The stamps of `names`, read in one query; stamps that were never read start now"""
+    names = list(names)
+    stamps = dict(CatalogueStamp.objects.filter(name__in=names).values_list('name', 'stamp'))
+    missing = [name for name in names if name not in stamps]
+
+    if missing:
+        now = time_ns()
+        CatalogueStamp.objects.bulk_create(
+            [CatalogueStamp(name=name, stamp=now) for name in missing], ignore_conflicts=True
+        )
+        stamps.update(CatalogueStamp.objects.filter(name__in=missing).values_list('name', 'stamp'))
+
+    return {name: stamps[name] for name in names}
+
+
+def stamps_etag(stamps: Dict[str, int], *variant) -> str:
+    """An ETag for a response showing what `stamps` cover, `variant` tells apart responses built from the same data"""
+    return md5(repr((sorted(stamps.items()), variant)).encode()).hexdigest()
+
+
+def stamps_last_modified(stamps: Dict[str, int]) -> datetime:
+    return datetime.fromtimestamp(max(stamps.values()) / 1e9, tz=timezone.utc)
@@ -0,0 +1,258 @@
+import atexit
+import logging
+import os
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from itertools import chain
+from pathlib import Path
+from threading import Lock, Timer
+from time import monotonic, time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .models import Song
+from .counters import song_counters
+
+
+logger = logging.getLogger(__name__)
+
+# sent after buffered plays are written to the database
+#   counts = {song_pk: number_of_plays}
+#   plays = [(song_pk, profile_pk or None, played_at unix timestamp)]
+streams_flushed = Signal()
+
+# how many pks go into one UPDATE ... WHERE pk IN (...)
+UPDATE_BATCH = 500
+
+Play = Tuple[int, Optional[int], float]
+
+
+class StreamPipeline:
+    """
+    Write-behind counter for song streams
+        pipeline = StreamPipeline(spool_dir='spool/streams', flush_size=500, flush_interval=10)
+
+    Usage:
+        pipeline.record(song_pk, profile_pk)
+
+    Plays are kept in memory and written every `flush_size` plays or `flush_interval` seconds, whichever is first,
+    plays of the same song are added up and songs with the same count are updated in one
+    `UPDATE ... SET streams = streams + n` statement. Flushes run on a timer thread started with the first play after
+    a flush, a full buffer makes it go off at once, recording never waits for the database. Plays are recorded while a
+    flush is writing, it works on the plays taken before it.
+
+    Every play is appended to a spool file for the process (spool_dir/<pid>.spool) before it's acknowledged. A flush
+    moves the file to spool_dir/<pid>.flushing and deletes it once its plays are in the database. Spool files of
+    processes that died before flushing are picked up and replayed by the timer of a live process or by recover(),
+    plays are counted at least once.
+
+    With `counters` (SharedSongCounters) written counts are also added to the shared counters while holding their lock.
+    """
+
+    def __init__(self, spool_dir, flush_size=500, flush_interval=10, fsync=False, counters=None):
+        self.spool_dir = Path(spool_dir)
+        self.counters = counters
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.plays: List[Play] = []
+        self.last_flush = monotonic()
+        # the buffer and spool file, held only while they're read or swapped
+        self.lock = Lock()
+        # one flush at a time, held while plays are written
+        self.flush_lock = Lock()
+        self.__spool = None
+        self.__spool_pid = None
+        self.__timer = None
+        self.__timer_pid = None
+
+    @property
+    def spool_path(self) -> Path:
+        return self.spool_dir / f'{os.getpid()}.spool'
+
+    @property
+    def flushing_path(self) -> Path:
+        return self.spool_dir / f'{os.getpid()}.flushing'
+
+    def __open_spool(self):
+        # a forked worker must not write into its parent's spool
+        if self.__spool is None or self.__spool_pid != os.getpid():
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self.__spool = open(self.spool_path, 'a')
+            self.__spool_pid = os.getpid()
+        return self.__spool
+
+    def __write_spool(self, plays: List[Play]):
+        spool = self.__open_spool()
+        spool.write(''.join(
+            f'{song_pk},{profile_pk if profile_pk else ""},{played_at}\n' for song_pk, profile_pk, played_at in plays
+        ))
+        spool.flush()
+        if self.fsync:
+            os.fsync(spool.fileno())
+
+    @staticmethod
+    def __read_spool(path: Path) -> List[Play]:
+        plays = []
+        with open(path) as spool:
+            for line in spool:
+                try:
+                    song_pk, profile_pk, played_at = line.strip().split(',')
+                    plays.append((int(song_pk), int(profile_pk) if profile_pk else None, float(played_at)))
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+        return plays
+
+    @staticmethod
+    def __is_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def __recover(self):
+        """Take over the spool files of dead processes; their plays are added to this process' buffer and spool"""
+        for path in chain(self.spool_dir.glob('*.spool'), self.spool_dir.glob('*.flushing')):
+            if not path.stem.isdigit() or int(path.stem) == os.getpid() or self.__is_running(int(path.stem)):
+                continue
+
+            claimed = path.with_suffix(f'.{os.getpid()}.recovering')
+            try:
+                # only one process gets to rename it
+                path.rename(claimed)
+            except FileNotFoundError:
+                continue
+
+            plays = self.__read_spool(claimed)
+            self.__write_spool(plays)
+            self.plays.extend(plays)
+            claimed.unlink()
+            logger.info(f'Recovered {len(plays)} plays from {path.name}')
+
+    def record(self, song_pk: int, profile_pk: int = None, played_at: float = None):
+        self.record_many([(song_pk, profile_pk, played_at if played_at else time())])
+
+    def record_many(self, plays: List[Play]):
+        with self.lock:
+            self.__write_spool(plays)
+            self.plays.extend(plays)
+            due = len(self.plays) >= self.flush_size or monotonic() - self.last_flush >= self.flush_interval
+            # a full buffer is flushed on the timer's thread right away, not in the caller's request
+            self.__start_timer(0 if due else self.flush_interval)
+
+    def __start_timer(self, delay: float):
+        # timers don't survive a fork, a forked worker starts its own
+        if self.__timer is not None and self.__timer_pid == os.getpid() and self.__timer.is_alive():
+            if self.__timer.interval <= delay:
+                return
+            self.__timer.cancel()
+
+        self.__timer = Timer(delay, self.__flush_on_timer)
+        self.__timer.daemon = True
+        self.__timer_pid = os.getpid()
+        self.__timer.start()
+
+    def __stop_timer(self):
+        if self.__timer is not None and self.__timer_pid == os.getpid():
+            self.__timer.cancel()
+        self.__timer = None
+
+    def __flush_on_timer(self):
+        try:
+            self.recover()
+            self.flush()
+        except Exception:
+            logger.exception('Flushing streams on the timer failed')
+        finally:
+            # the timer's thread has its own database connection
+            connections.close_all()
+
+    def write_counts(self, counts: Dict[int, int]):
+        """Add counts to Song.streams, one UPDATE for each batch of songs played the same number of times"""
+        by_count = defaultdict(list)
+        for song_pk, count in counts.items():
+            by_count[count].append(song_pk)
+
+        # the shared counters stay locked until the counts are committed, a reconcile can't read them half way
+        with self.counters.locked() if self.counters else nullcontext():
+            if self.counters:
+                # a new counters file is filled from Song.streams, that has to happen before these counts are added
+                self.counters.open()
+
+            with transaction.atomic():
+                for count, song_pks in by_count.items():
+                    for i in range(0, len(song_pks), UPDATE_BATCH):
+                        Song.objects.filter(pk__in=song_pks[i:i + UPDATE_BATCH]).update(
+                            streams=Coalesce(F('streams'), 0) + count
+                        )
+
+            if self.counters:
+                self.counters.add(counts)
+
+    def recover(self):
+        """Pick up plays left in the spool files of dead processes, run on the timer and by flush_streams"""
+        with self.lock:
+            self.__recover()
+
+    def __take_plays(self) -> List[Play]:
+        """Swap the buffer for an empty one and move the spool to flushing_path, plays from now on go to a new spool"""
+        with self.lock:
+            self.__stop_timer()
+            self.last_flush = monotonic()
+            plays, self.plays = self.plays, []
+
+            if plays:
+                self.__open_spool().close()
+                self.spool_path.rename(self.flushing_path)
+                self.__spool = None
+                self.__open_spool()
+
+            return plays
+
+    def __put_back(self, plays: List[Play]):
+        """Plays that couldn't be written go back into the buffer and spool for the next flush"""
+        with self.lock:
+            self.__write_spool(plays)
+            self.plays[:0] = plays
+            self.__start_timer(self.flush_interval)
+
+    def flush(self) -> Dict[int, int]:
+        """Write buffered plays to the database, returns {song_pk: plays} that were written"""
+        with self.flush_lock:
+            plays = self.__take_plays()
+            counts = dict(Counter(song_pk for song_pk, _, _ in plays))
+
+            if counts:
+                try:
+                    self.write_counts(counts)
+                except Exception:
+                    self.__put_back(plays)
+                    raise
+                finally:
+                    self.flushing_path.unlink(missing_ok=True)
+
+        if counts:
+            for receiver, response in streams_flushed.send_robust(sender=self.__class__, counts=counts, plays=plays):
+                if isinstance(response, Exception):
+                    logger.error(f'{receiver} failed on flushed streams: {response!r}')
+
+        return counts
+
+
+stream_pipeline = StreamPipeline(
+    spool_dir=settings.STREAMS_SPOOL_DIR,
+    flush_size=settings.STREAMS_FLUSH_SIZE,
+    flush_interval=settings.STREAMS_FLUSH_INTERVAL,
+    fsync=settings.STREAMS_SPOOL_FSYNC,
+    counters=song_counters
+)
+atexit.register(stream_pipeline.flush)
@@ -0,0 +1,151 @@
+from datetime import datetime, time
+
+from django.test import TestCase, tag
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.charts import ChartBuilder
+from music.rollups import add_daily_streams
+
+
+class ChartsTestMixin:
+    def make_catalogue(self):
+        self.hip_hop = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.rnb = ms_models.Genre.objects.create(title='R&B')
+        self.album_1 = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.hip_hop,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.album_2 = ms_models.Album.objects.create(
+            title='Slow',
+            genre=self.rnb,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.album_3 = ms_models.Album.objects.create(
+            title='Unreleased',
+            genre=self.rnb,
+            date_of_release='2021-05-12'
+        )
+        self.song_1 = self.make_song(self.album_1, 1, self.hip_hop, 50)
+        self.song_2 = self.make_song(self.album_1, 2, self.rnb, 30)
+        self.song_3 = self.make_song(self.album_2, 1, self.rnb, 60)
+        self.song_4 = self.make_song(self.album_3, 1, self.rnb, 900)
+        self.song_5 = self.make_song(self.album_2, 2, self.rnb, 0)
+
+        played = timezone.make_aware(datetime.combine(timezone.localdate(), time(12))).timestamp()
+        add_daily_streams(
+            [(self.song_2.pk, None, played)] * 3 + [(self.song_1.pk, None, played)] + [(self.song_4.pk, None, played)]
+        )
+
+    @staticmethod
+    def make_song(album, track_no, genre, streams):
+        return ms_models.Song.objects.create(
+            title=f'{album.title} {track_no}',
+            track_no=track_no,
+            disc=album.disc_one,
+            genre=genre,
+            streams=streams
+        )
+
+
+@tag('music-charts')
+class ChartBuilderTestCase(ChartsTestMixin, TestCase):
+    def setUp(self):
+        self.make_catalogue()
+
+    def chart(self, kind, window, genre=None):
+        return ms_models.Chart.objects.get(kind=kind, window=window, genre=genre).entries
+
+    def test_build(self):
+        # (2 kinds x 3 windows) overall and for each genre
+        self.assertEqual(ChartBuilder(size=2).build(), 18)
+        self.assertListEqual(
+            self.chart(ms_models.Chart.SONGS, ms_models.Chart.ALL_TIME),
+            [(self.song_3.pk, 60), (self.song_1.pk, 50)]
+        )
+        self.assertListEqual(
+            self.chart(ms_models.Chart.SONGS, ms_models.Chart.ALL_TIME, self.rnb),
+            [(self.song_3.pk, 60), (self.song_2.pk, 30)]
+        )
+        self.assertListEqual(
+            self.chart(ms_models.Chart.ALBUMS, ms_models.Chart.ALL_TIME),
+            [(self.album_1.pk, 80), (self.album_2.pk, 60)]
+        )
+        self.assertListEqual(
+            self.chart(ms_models.Chart.ALBUMS, ms_models.Chart.ALL_TIME, self.rnb),
+            [(self.album_2.pk, 60)]
+        )
+        self.assertListEqual(
+            self.chart(ms_models.Chart.SONGS, ms_models.Chart.DAY),
+            [(self.song_2.pk, 3), (self.song_1.pk, 1)]
+        )
+        self.assertListEqual(
+            self.chart(ms_models.Chart.ALBUMS, ms_models.Chart.WEEK, self.hip_hop),
+            [(self.album_1.pk, 4)]
+        )
+
+        # rebuilding replaces the charts
+        self.song_5.streams = 100
+        self.song_5.save()
+        ChartBuilder(size=1).build()
+        self.assertEqual(ms_models.Chart.objects.count(), 18)
+        self.assertListEqual(self.chart(ms_models.Chart.SONGS, ms_models.Chart.ALL_TIME), [(self.song_5.pk, 100)])
+
+
+@tag('music-charts')
+class ChartsViewTestCase(ChartsTestMixin, APITestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        self.client.force_login(self.user)
+        self.url = reverse('music:charts')
+
+    def test_charts(self):
+        response = self.client.get(self.url).json()
+        self.assertListEqual(response['entries'], [])
+        self.assertIsNone(response['built'])
+
+        ChartBuilder().build()
+        response = self.client.get(self.url, {'window': '1d'}).json()
+        self.assertListEqual(response['entries'], [
+            {
+                'rank': 1,
+                'streams': 3,
+                'song': ms_s.SongSerializer(self.song_2, album_info=True).data
+            },
+            {
+                'rank': 2,
+                'streams': 1,
+                'song': ms_s.SongSerializer(self.song_1, album_info=True).data
+            }
+        ])
+
+        response = self.client.get(self.url, {'type': 'albums', 'g': self.rnb.pk}).json()
+        self.assertListEqual(response['entries'], [
+            {
+                'rank': 1,
+                'streams': 60,
+                'album': ms_s.AlbumSerializer(self.album_2, no_discs=True).data
+            }
+        ])
+
+        self.assertEqual(self.client.get(self.url, {'type': 'playlists'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'window': '30d'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'g': 800}).status_code, 404)
+
+    def test_unpublished(self):
+        ChartBuilder().build()
+        self.album_2.published = False
+        self.album_2.save()
+
+        response = self.client.get(self.url).json()
+        self.assertListEqual([entry['song']['id'] for entry in response['entries']], [self.song_1.pk, self.song_2.pk])
+        self.assertListEqual([entry['rank'] for entry in response['entries']], [1, 2])
+        response = self.client.get(self.url, {'type': 'albums'}).json()
+        self.assertListEqual([entry['album']['id'] for entry in response['entries']], [self.album_1.pk])
@@ -0,0 +1,108 @@
+import multiprocessing
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase, tag
+
+from music import counters as ms_counters, models as ms_models
+from music.counters import SharedSongCounters
+from music.streams import StreamPipeline
+
+
+def add_plays(path, song_pk, times):
+    counters = SharedSongCounters(path)
+    for _ in range(times):
+        counters.add({song_pk: 1})
+
+
+@tag('music-counters')
+class SharedSongCountersTestCase(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = f'{self.tmp.name}/song_streams.bin'
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.album = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.songs = [
+            ms_models.Song.objects.create(
+                title=f'Song {i}',
+                track_no=i,
+                disc=self.album.disc_one,
+                genre=self.genre,
+                streams=streams
+            ) for i, streams in enumerate([5, 20, 5, 0, 11], start=1)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_seeded_from_streams(self):
+        counters = SharedSongCounters(self.path)
+        self.assertListEqual(
+            list(counters.get_many([song.pk for song in self.songs] + [90000])),
+            [5, 20, 5, 0, 11, 0]
+        )
+
+    def test_add_and_top(self):
+        counters = SharedSongCounters(self.path)
+        counters.add({self.songs[3].pk: 30, self.songs[0].pk: 1})
+        self.assertEqual(counters.get(self.songs[3].pk), 30)
+
+        pks = [song.pk for song in self.songs]
+        self.assertListEqual(counters.top(pks, 3), [(pks[3], 30), (pks[1], 20), (pks[4], 11)])
+
+        # the tie at the end goes to the lower pk
+        self.assertListEqual(counters.top(pks, 5)[3:], [(pks[0], 6), (pks[2], 5)])
+        counters.add({pks[0]: -1})
+        self.assertListEqual(counters.top(pks, 4)[3:], [(pks[0], 5)])
+        self.assertListEqual(counters.top(pks, 0), [])
+
+    def test_grows_and_is_shared(self):
+        counters = SharedSongCounters(self.path)
+        other_worker = SharedSongCounters(self.path)
+        counters.add({SharedSongCounters.GROW_BY + 10: 3})
+        self.assertEqual(other_worker.get(SharedSongCounters.GROW_BY + 10), 3)
+
+    def test_concurrent_adds(self):
+        SharedSongCounters(self.path).get(1)
+        song_pk = self.songs[3].pk
+        workers = [
+            multiprocessing.get_context('fork').Process(target=add_plays, args=(self.path, song_pk, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(SharedSongCounters(self.path).get(song_pk), 800)
+
+    def test_reconcile(self):
+        counters = SharedSongCounters(self.path)
+        counters.add({self.songs[0].pk: 100})
+        self.assertEqual(counters.reconcile(), 5)
+        self.assertEqual(counters.get(self.songs[0].pk), 5)
+
+    def test_pipeline_and_top_songs(self):
+        counters = SharedSongCounters(self.path)
+        pipeline = StreamPipeline(self.tmp.name, flush_size=100, flush_interval=600, counters=counters)
+        for _ in range(25):
+            pipeline.record(self.songs[3].pk)
+        pipeline.flush()
+
+        self.songs[3].refresh_from_db()
+        self.assertEqual(self.songs[3].streams, 25)
+        self.assertEqual(counters.get(self.songs[3].pk), 25)
+
+        songs = ms_models.Song.objects.filter(disc__album=self.album)
+        by_database = ms_counters.top_songs(songs, 2)
+        song_counters = ms_counters.song_counters
+        ms_counters.song_counters = counters
+        try:
+            self.assertListEqual(ms_counters.top_songs(songs, 2), by_database)
+        finally:
+            ms_counters.song_counters = song_counters
+        self.assertListEqual(by_database, [self.songs[3], self.songs[1]])
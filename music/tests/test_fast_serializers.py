@@ -0,0 +1,110 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.fast_serializers import AlbumValuesSerializer, ArtistValuesSerializer, GenreValuesSerializer
+from tyne_utils.renderers import FastJSONRenderer
+
+
+@tag('music-fast')
+class ValuesSerializerTestCase(TestCase):
+    def setUp(self):
+        self.clear_caches()
+        self.render = FastJSONRenderer().render
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop', description='Rap')
+        self.genre_2 = ms_models.Genre.objects.create(title='Trap', description='', avi='')
+        self.artist_1 = ms_models.Artist.objects.create(name='Quavo', bio='From Georgia')
+        self.artist_2 = ms_models.Artist.objects.create(name='Takeoff')
+        self.artist_3 = ms_models.Artist.objects.create(name='Migos', is_group=True, cover='')
+        self.artist_4 = ms_models.Artist.objects.create(name='Empty Group', is_group=True)
+        self.artist_3.add_artist_to_group(self.artist_1)
+        self.artist_3.add_artist_to_group(self.artist_2)
+
+        self.album_1 = ms_models.Album.objects.create(
+            title='Culture', genre=self.genre, date_of_release='2017-01-27', copyright='QC', published=True
+        )
+        self.album_1.artists.add(self.artist_3)
+        self.album_2 = ms_models.Album.objects.create(
+            title='Culture (Deluxe)', genre=self.genre_2, date_of_release='2017-01-27', is_ep=True, likes=None
+        )
+        self.album_2.artists.add(self.artist_1, self.artist_2)
+        self.album_2.add_sister_album(self.album_1)
+        self.album_3 = ms_models.Album.objects.create(
+            title='Bad and Boujee', genre=self.genre, date_of_release='2016-10-28', is_single=True, notes='Single'
+        )
+
+    @staticmethod
+    def clear_caches():
+        for cache in caches.all():
+            cache.clear()
+
+    def assertSameData(self, fast, data):
+        self.assertListEqual(fast, data)
+        # the same JSON, keys in the same order
+        self.assertEqual(self.render(fast), self.render(data))
+
+    def test_genres(self):
+        genres = ms_models.Genre.objects.order_by('pk')
+        self.assertSameData(
+            GenreValuesSerializer(GenreValuesSerializer.values(genres)).data,
+            ms_s.GenreSerializer(genres, many=True).data
+        )
+
+    def test_artists(self):
+        artists = ms_models.Artist.objects.order_by('name')
+        with self.assertNumQueries(2):
+            data = ArtistValuesSerializer(ArtistValuesSerializer.values(artists)).data
+        self.assertSameData(data, ms_s.ArtistSerializer(artists, many=True).data)
+
+    def test_albums(self):
+        albums = ms_models.Album.objects.order_by('-date_of_release', '-pk')
+        # albums; genres; artists and their members; other versions
+        with self.assertNumQueries(5):
+            data = AlbumValuesSerializer(AlbumValuesSerializer.values(albums)).data
+        self.assertSameData(data, ms_s.AlbumSerializer(albums, many=True, no_discs=True).data)
+        self.assertListEqual(AlbumValuesSerializer(AlbumValuesSerializer.values(albums.none())).data, [])
+
+    def test_sparse_fields(self):
+        albums = ms_models.Album.objects.order_by('pk')
+        for sparse in ({'fields': ('id', 'title', 'cover')}, {'exclude': ('artists', 'copyright')}):
+            self.assertSameData(
+                AlbumValuesSerializer(AlbumValuesSerializer.values(albums), **sparse).data,
+                ms_s.AlbumSerializer(albums, many=True, no_discs=True, **sparse).data
+            )
+
+        # related rows of fields left out aren't read
+        with self.assertNumQueries(1):
+            AlbumValuesSerializer(AlbumValuesSerializer.values(albums), fields=('id', 'title', 'cover')).data
+        artists = ArtistValuesSerializer.values(ms_models.Artist.objects.all())
+        with self.assertNumQueries(1):
+            ArtistValuesSerializer(artists, exclude=('group_members',)).data
+
+    def test_views(self):
+        client = APIClient()
+        client.force_login(User.objects.create_user(username='fast', email='fast@tyne.com', password='pass@123'))
+        self.album_2.published = True
+        self.album_2.save()
+
+        requests = (
+            (reverse('music:albums'), {}),
+            (reverse('music:albums'), {'size': 1, 'fields': 'id,title,artists'}),
+            (reverse('music:albums'), {'stream': 1, 'exclude': 'genre'}),
+            (reverse('music:artists'), {}),
+            (reverse('music:artists'), {'stream': 1, 'letter': 'm'}),
+            (reverse('music:genres'), {'fields': 'id,avi'}),
+        )
+        for url, params in requests:
+            fast = client.get(url, params)
+            with override_settings(FAST_SERIALIZER_VIEWS=()):
+                self.clear_caches()
+                model = client.get(url, params)
+            self.clear_caches()
+            self.assertEqual(fast.status_code, 200)
+
+            read = (lambda response: b''.join(response.streaming_content)) if params.get('stream') else (
+                lambda response: response.content
+            )
+            self.assertEqual(read(fast), read(model), params)
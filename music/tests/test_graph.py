@@ -0,0 +1,127 @@
+from django.test import TestCase, tag
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.graph import artist_graph
+
+
+class GraphTestMixin:
+    def make_artists(self):
+        """group A with members B and C, D featured on A's song, B on E's song"""
+        artist_graph.invalidate()
+        genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.a = ms_models.Artist.objects.create(name='Migos', is_group=True)
+        self.b, self.c, self.d, self.e, self.f = [
+            ms_models.Artist.objects.create(name=name) for name in ('Quavo', 'Offset', 'Drake', 'Future', 'Gunna')
+        ]
+        self.a.add_artist_to_group(self.b)
+        self.a.add_artist_to_group(self.c)
+
+        self.album_1 = ms_models.Album.objects.create(title='Culture', genre=genre, date_of_release='2017-01-27')
+        self.album_1.artists.add(self.a)
+        self.song_1 = ms_models.Song.objects.create(
+            title='Walk It', track_no=1, disc=self.album_1.disc_one, genre=genre
+        )
+        self.song_1.add_featured_artist(self.d)
+
+        self.album_2 = ms_models.Album.objects.create(title='Hndrxx', genre=genre, date_of_release='2017-02-17')
+        self.album_2.artists.add(self.e)
+        self.song_2 = ms_models.Song.objects.create(
+            title='Mask Off', track_no=1, disc=self.album_2.disc_one, genre=genre
+        )
+        self.song_2.add_additional_artist(self.b)
+
+    def pks(self, *artists):
+        return [artist.pk for artist in artists]
+
+
+@tag('music-graph')
+class ArtistGraphTestCase(GraphTestMixin, TestCase):
+    def setUp(self):
+        self.make_artists()
+
+    def assertFreshGraph(self):
+        """what was updated bit by bit matches the graph loaded in full"""
+        everyone = ms_models.Artist.objects.values_list('pk', flat=True)
+        updated = [(artist_graph.collaborators(pk), artist_graph.linked(pk)) for pk in everyone]
+        artist_graph.invalidate()
+        self.assertListEqual(updated, [(artist_graph.collaborators(pk), artist_graph.linked(pk)) for pk in everyone])
+
+    def test_graph(self):
+        self.assertListEqual(artist_graph.collaborators(self.a.pk), self.pks(self.d))
+        self.assertListEqual(artist_graph.collaborators(self.b.pk), self.pks(self.e))
+        self.assertListEqual(artist_graph.linked(self.a.pk), self.pks(self.b, self.c))
+        self.assertListEqual(artist_graph.linked(self.c.pk), self.pks(self.a))
+        self.assertListEqual(artist_graph.collaborators(self.f.pk), [])
+
+    def test_path(self):
+        self.assertListEqual(artist_graph.path(self.d.pk, self.e.pk), self.pks(self.d, self.a, self.b, self.e))
+        self.assertListEqual(artist_graph.path(self.c.pk, self.c.pk), self.pks(self.c))
+        self.assertIsNone(artist_graph.path(self.d.pk, self.e.pk, max_hops=2))
+        self.assertIsNone(artist_graph.path(self.d.pk, self.f.pk))
+
+    def test_credit_changes(self):
+        artist_graph.collaborators(self.a.pk)
+
+        self.song_2.add_featured_artist(self.f)
+        self.assertListEqual(artist_graph.collaborators(self.f.pk), self.pks(self.b, self.e))
+        self.assertListEqual(artist_graph.collaborators(self.e.pk), self.pks(self.b, self.f))
+        self.assertFreshGraph()
+
+        self.f.features.remove(self.song_2)
+        self.assertListEqual(artist_graph.collaborators(self.e.pk), self.pks(self.b))
+        self.assertListEqual(artist_graph.collaborators(self.f.pk), [])
+
+        self.album_1.artists.add(self.f)
+        self.assertListEqual(artist_graph.collaborators(self.d.pk), self.pks(self.a, self.f))
+        self.song_1.featured_artists.clear()
+        self.assertListEqual(artist_graph.collaborators(self.a.pk), self.pks(self.f))
+        self.assertListEqual(artist_graph.collaborators(self.d.pk), [])
+        self.assertFreshGraph()
+
+        self.song_2.delete()
+        self.assertListEqual(artist_graph.collaborators(self.e.pk), [])
+        self.assertFreshGraph()
+
+    def test_member_changes(self):
+        artist_graph.linked(self.a.pk)
+
+        self.a.group_members.remove(self.c)
+        self.assertListEqual(artist_graph.linked(self.a.pk), self.pks(self.b))
+        self.assertListEqual(artist_graph.linked(self.c.pk), [])
+
+        self.f.group_members.add(self.a)
+        self.assertListEqual(artist_graph.linked(self.a.pk), self.pks(self.b, self.f))
+        self.a.group_members.clear()
+        self.assertListEqual(artist_graph.linked(self.b.pk), [])
+        self.assertFreshGraph()
+
+
+@tag('music-graph')
+class ArtistGraphViewTestCase(GraphTestMixin, APITestCase):
+    def setUp(self):
+        self.make_artists()
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        self.client.force_login(self.user)
+
+    def test_collaborators(self):
+        response = self.client.get(reverse('music:collaborators', args=(self.a.pk,))).json()
+        self.assertListEqual(response['collaborators'], ms_s.ArtistSerializer([self.d], many=True).data)
+        self.assertEqual(self.client.get(reverse('music:collaborators', args=(800,))).status_code, 404)
+
+    def test_groups(self):
+        response = self.client.get(reverse('music:groups', args=(self.a.pk,))).json()
+        self.assertListEqual(response['members'], ms_s.ArtistSerializer([self.b, self.c], many=True).data)
+        self.assertListEqual(response['groups'], [])
+
+        response = self.client.get(reverse('music:groups', args=(self.b.pk,))).json()
+        self.assertListEqual(response['groups'], ms_s.ArtistSerializer([self.a], many=True).data)
+        self.assertListEqual(response['members'], [])
+
+    def test_path(self):
+        response = self.client.get(reverse('music:artist-path', args=(self.d.pk, self.e.pk))).json()
+        self.assertEqual(response['hops'], 3)
+        self.assertListEqual([artist['id'] for artist in response['path']], self.pks(self.d, self.a, self.b, self.e))
+        self.assertEqual(self.client.get(reverse('music:artist-path', args=(self.d.pk, self.f.pk))).status_code, 404)
@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.history import add_history, compact_history, recently_played
+
+
+class HistoryTestMixin:
+    def make_songs(self):
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        self.profile = self.user.main_profile
+        genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        album = ms_models.Album.objects.create(title='WAX', genre=genre, date_of_release='2021-05-12', published=True)
+        self.songs = [
+            ms_models.Song.objects.create(title=f'Song {i}', track_no=i, disc=album.disc_one, genre=genre)
+            for i in range(1, 4)
+        ]
+        self.start = timezone.now().timestamp() - 3600
+
+    def play(self, *song_indexes, profile_pk=None):
+        """one play of each song a minute apart"""
+        profile_pk = profile_pk if profile_pk else self.profile.pk
+        return [
+            (self.songs[index].pk, profile_pk, self.start + 60 * i) for i, index in enumerate(song_indexes)
+        ]
+
+
+@tag('music-history')
+class HistoryTestCase(HistoryTestMixin, TestCase):
+    def setUp(self):
+        self.make_songs()
+
+    def test_add_history(self):
+        plays = self.play(0, 1, 0)
+        # anonymous plays and unknown songs or profiles aren't kept
+        plays += [(self.songs[2].pk, None, self.start), (800, self.profile.pk, self.start), (self.songs[2].pk, 800, 1)]
+        self.assertEqual(add_history(plays), 3)
+        self.assertEqual(ms_models.PlayHistory.objects.filter(profile=self.profile).count(), 3)
+
+    def test_recently_played(self):
+        add_history(self.play(0, 1, 0, 2, 2))
+        self.assertListEqual(
+            [song_pk for song_pk, _ in recently_played(self.profile, 10)],
+            [self.songs[2].pk, self.songs[0].pk, self.songs[1].pk]
+        )
+        song_pk, played = recently_played(self.profile, 1)[0]
+        self.assertEqual(song_pk, self.songs[2].pk)
+        self.assertEqual(played.timestamp(), self.start + 240)
+
+    @override_settings(PLAY_HISTORY_SIZE=3)
+    def test_ring(self):
+        add_history(self.play(0, 1, 2, 2, 2))
+        other = User.objects.create_user(username='ot', email='ot@tyne.com', password='pass@123').main_profile
+        add_history(self.play(0, profile_pk=other.pk))
+
+        # only the last 3 plays count even before compaction
+        self.assertListEqual([song_pk for song_pk, _ in recently_played(self.profile, 10)], [self.songs[2].pk])
+
+        self.assertEqual(compact_history(), 2)
+        self.assertListEqual(
+            list(ms_models.PlayHistory.objects.filter(profile=self.profile).values_list('song', flat=True)),
+            [self.songs[2].pk] * 3
+        )
+        self.assertEqual(compact_history(), 0)
+        self.assertEqual(compact_history(keep=1), 2)
+        self.assertEqual(ms_models.PlayHistory.objects.filter(profile=other).count(), 1)
+
+
+@tag('music-history')
+class RecentlyPlayedViewTestCase(HistoryTestMixin, APITestCase):
+    def setUp(self):
+        self.make_songs()
+        self.client.force_login(self.user)
+
+    def test_recently_played(self):
+        url = reverse('music:recently-played')
+        add_history(self.play(0, 1, 0))
+        response = self.client.get(url).json()
+        self.assertListEqual(
+            [entry['song'] for entry in response['results']],
+            ms_s.SongSerializer([self.songs[0], self.songs[1]], many=True, album_info=True).data
+        )
+        self.assertEqual(len(self.client.get(url, {'size': 1}).json()['results']), 1)
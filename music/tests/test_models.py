@@ -2,8 +2,8 @@ from django.test import TestCase, tag, TransactionTestCase
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
 
-from music.models import Artist, Creator, Genre, Album, Song, Playlist, CreatorSection, LibraryAlbum
-from core.models import User
+from music.models import Artist, Creator, Genre, Album, Song, Playlist, CreatorSection, LibraryAlbum, profile_songs
+from core.models import Profile, User
 
 
 @tag('music-m-artist')
@@ -330,6 +330,18 @@ class PlaylistTestCase(TestCase):
         self.assertListEqual(self.playlist_1.songs_order_pk, [self.song_1.pk, self.song_2.pk])
         self.assertListEqual(self.playlist_1.songs_by_order(), [self.song_1, self.song_2])
 
+        # songs a minor can't see aren't prefetched
+        self.song_1.explicit = True
+        self.song_1.save()
+        minor = Profile(minor=True)
+        playlist = Playlist.objects.prefetch_related(
+            profile_songs('songs', minor)
+        ).get(pk=self.playlist_1.pk)
+        with self.assertNumQueries(0):
+            self.assertListEqual(playlist.songs_by_order(), [self.song_2])
+        self.assertNotIn(self.song_1, Song.objects.for_profile(minor))
+        self.assertIn(self.song_1, Song.objects.for_profile(self.playlist_2.profile))
+
     def test_string_name(self):
         self.assertEqual(
             repr(self.playlist_1),
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings, tag
+
+from music import models as ms_models, serializers as ms_s
+from music.checks import check_shared_caches
+from music.objects import ObjectCache, album_cache, artist_cache, object_caches
+
+
+# kept in memory so only database rows are counted in queries, the test's "workers" share it all the same
+@override_settings(OBJECT_CACHE='default')
+@tag('music-objects')
+class ObjectCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        for object_cache in object_caches:
+            object_cache.clear()
+            object_cache.reset_stats()
+
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.artist_1 = ms_models.Artist.objects.create(name='Quavo')
+        self.artist_2 = ms_models.Artist.objects.create(name='Migos', is_group=True)
+        self.artist_2.add_artist_to_group(self.artist_1)
+        self.album = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.album.artists.add(self.artist_2)
+        self.song = ms_models.Song.objects.create(title='Timmy', track_no=1, disc=self.album.disc_one, genre=self.genre)
+
+    def test_read_through(self):
+        # the album, its artists and their members, other versions
+        with self.assertNumQueries(4):
+            albums = album_cache.in_bulk([self.album.pk, 800])
+        self.assertListEqual(list(albums), [self.album.pk])
+
+        with self.assertNumQueries(0):
+            data = ms_s.AlbumSerializer(album_cache.get(self.album.pk), no_discs=True).data
+        self.assertDictEqual(data, ms_s.AlbumSerializer(self.album, no_discs=True).data)
+
+        # another worker, only the shared cache has it
+        album_cache.clear()
+        with self.assertNumQueries(0):
+            album_cache.get(self.album.pk)
+
+        self.assertDictEqual(album_cache.stats(), {'local_hits': 1, 'shared_hits': 1, 'misses': 2, 'hit_rate': 0.5})
+
+    def test_stats(self):
+        small = ObjectCache(ms_models.Genre)
+        small.STATS_FLUSH_SIZE = 2
+        small.reset_stats()
+        small.get(self.genre.pk)
+        small.get(self.genre.pk)
+        self.assertEqual(cache.get(f'{small.prefix}:stats:local_hits'), 1)
+        small.get(self.genre.pk)
+        self.assertDictEqual(small.stats(), {'local_hits': 2, 'shared_hits': 0, 'misses': 1, 'hit_rate': 0.6667})
+        small.reset_stats()
+        self.assertEqual(small.stats()['hit_rate'], 0)
+
+    def test_invalidation(self):
+        def album_artists():
+            return ms_s.ArtistSerializer(album_cache.get(self.album.pk).artists.all(), many=True).data
+
+        album_cache.get(self.album.pk)
+        artist_cache.get(self.artist_1.pk)
+
+        # saved rows and the rows showing them
+        self.artist_1.name = 'Huncho'
+        self.artist_1.save()
+        self.assertEqual(artist_cache.get(self.artist_1.pk).name, 'Huncho')
+        self.assertEqual(album_artists()[0]['group_members'][0]['name'], 'Huncho')
+
+        self.genre.title = 'Trap'
+        self.genre.save()
+        self.assertEqual(album_cache.get(self.album.pk).genre.title, 'Trap')
+
+        # links
+        artist_3 = ms_models.Artist.objects.create(name='Offset')
+        self.artist_2.add_artist_to_group(artist_3)
+        self.assertEqual(len(artist_cache.get(self.artist_2.pk).group_members.all()), 2)
+        artist_3.album_set.add(self.album)
+        self.assertEqual(len(album_artists()), 2)
+        self.album.artists.clear()
+        self.assertEqual(album_artists(), [])
+
+        other = ms_models.Album.objects.create(title='WAX (Deluxe)', genre=self.genre, date_of_release='2021-06-12')
+        self.album.add_sister_album(other)
+        album_cache.get(self.album.pk)
+        other.title = 'WAXX'
+        other.save()
+        self.assertListEqual(
+            ms_s.AlbumSerializer(album_cache.get(self.album.pk), no_discs=True).data['other_versions'],
+            [{'title': 'WAXX', 'id': other.pk}]
+        )
+
+        # deleted rows
+        artist_3.album_set.add(self.album)
+        album_cache.get(self.album.pk)
+        artist_3.delete()
+        self.assertEqual(album_artists(), [])
+        self.assertIsNone(artist_cache.get(artist_3.pk))
+
+    def test_song_album_info(self):
+        data = ms_s.SongSerializer(ms_models.Song.objects.select_related('disc').get(), album_info=True).data
+        self.assertEqual(data['album_art'], self.album.cover.url)
+        self.assertListEqual(data['album_artists'], ms_s.ArtistSerializer([self.artist_2], many=True).data)
+
+        # no more queries for the album once it's cached
+        with self.assertNumQueries(2):
+            ms_s.SongSerializer(
+                ms_models.Song.objects.select_related('disc').prefetch_related('additional_artists'),
+                many=True,
+                album_info=True
+            ).data
+
+    def test_song_albums_read_at_once(self):
+        other = ms_models.Album.objects.create(title='Nope', genre=self.genre, date_of_release='2021-06-12')
+        ms_models.Song.objects.create(title='Pig', track_no=1, disc=other.disc_one, genre=self.genre)
+        songs = ms_models.Song.objects.select_related('disc').prefetch_related('additional_artists')
+
+        with patch.object(album_cache, 'in_bulk', wraps=album_cache.in_bulk) as in_bulk:
+            data = ms_s.SongSerializer(songs, many=True, album_info=True).data
+        in_bulk.assert_called_once()
+        self.assertSetEqual(set(in_bulk.call_args.args[0]), {self.album.pk, other.pk})
+        self.assertListEqual([song['album_art'] for song in data], [self.album.cover.url, other.cover.url])
+
+
+@tag('music-objects')
+class SharedCachesCheckTestCase(TestCase):
+    def test_check(self):
+        self.assertListEqual(check_shared_caches(None), [])
+        with override_settings(OBJECT_CACHE='default'):
+            self.assertListEqual([error.id for error in check_shared_caches(None)], ['music.W001'])
+        with override_settings(ARTIST_DIRECTORY_CACHE='default'):
+            self.assertListEqual([error.id for error in check_shared_caches(None)], ['music.W001'])
+        with override_settings(OBJECT_CACHE='nope'):
+            self.assertListEqual([error.id for error in check_shared_caches(None)], ['music.E001'])
@@ -0,0 +1,195 @@
+from django.test import TestCase, tag
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.pages import build_page, build_stale_pages, curator_page, page_document
+
+
+class PagesTestMixin:
+    def make_pages(self):
+        self.curator = ms_models.Creator.objects.create(name='Tyne Music Hip-Hop')
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop', main_curator=self.curator)
+        self.section = ms_models.CreatorSection.objects.create(name='Top Playlists', creator=self.curator)
+        album = ms_models.Album.objects.create(
+            title='WAX', genre=self.genre, date_of_release='2021-05-12', published=True
+        )
+        self.song = ms_models.Song.objects.create(title='Timmy', track_no=1, disc=album.disc_one, genre=self.genre)
+        self.explicit = ms_models.Song.objects.create(
+            title='Pig', track_no=2, disc=album.disc_one, genre=self.genre, explicit=True
+        )
+        self.playlist = ms_models.Playlist.objects.create(title='Trap', creator=self.curator)
+        self.playlist.add_song_to_playlist(self.song)
+        self.playlist.add_song_to_playlist(self.explicit)
+        self.section.playlists.add(self.playlist)
+
+
+@tag('music-pages')
+class PagesTestCase(PagesTestMixin, TestCase):
+    def setUp(self):
+        self.make_pages()
+
+    def test_read_through(self):
+        page = page_document(ms_models.PageDocument.CURATOR, self.curator)
+        self.assertDictEqual(page, curator_page(self.curator, clean=False))
+        self.assertEqual(ms_models.PageDocument.objects.count(), 1)
+
+        # straight from storage
+        with self.assertNumQueries(1):
+            self.assertDictEqual(page_document(ms_models.PageDocument.CURATOR, self.curator), page)
+
+        # a change makes it stale, it's served as it was until it's built again
+        self.section.name = 'Best Playlists'
+        self.section.save()
+        self.assertTrue(ms_models.PageDocument.objects.get().stale)
+        self.assertDictEqual(page_document(ms_models.PageDocument.CURATOR, self.curator), page)
+        self.assertEqual(build_stale_pages(), 1)
+        page = page_document(ms_models.PageDocument.CURATOR, self.curator)
+        self.assertEqual(page['sections'][0]['name'], 'Best Playlists')
+        self.assertFalse(ms_models.PageDocument.objects.get().stale)
+
+        # profiles' playlists aren't on pages
+        ms_models.Playlist.objects.create(title='Mine', profile=User.objects.create_user(
+            username='pl', email='pl@tyne.com', password='pass@123'
+        ).main_profile)
+        self.assertFalse(ms_models.PageDocument.objects.get().stale)
+
+    def test_pages_showing_a_change(self):
+        other = ms_models.Creator.objects.create(name='Tyne Music Pop')
+        other_genre = ms_models.Genre.objects.create(title='Pop', main_curator=other)
+        listed = ms_models.Genre.objects.create(title='Trap')
+        self.curator.genres.add(listed)
+        artist = ms_models.Artist.objects.create(name='Quavo')
+        self.song.additional_artists.add(artist)
+        build_stale_pages(build_all=True)
+
+        def stale():
+            pages = ms_models.PageDocument.objects.filter(stale=True, clean=False)
+            found = set(pages.values_list('kind', 'object_id'))
+            build_stale_pages()
+            return found
+
+        curator_pages = {('C', self.curator.pk), ('G', self.genre.pk), ('G', listed.pk)}
+        self.song.title = 'Tim'
+        self.song.save()
+        self.assertSetEqual(stale(), curator_pages)
+        artist.name = 'Huncho'
+        artist.save()
+        self.assertSetEqual(stale(), curator_pages)
+        other.name = 'Tyne Music Pop Hits'
+        other.save()
+        self.assertSetEqual(stale(), {('C', other.pk), ('G', other_genre.pk)})
+        listed.save()
+        self.assertSetEqual(stale(), curator_pages)
+
+        # links, on either end
+        ms_models.Playlist.objects.create(title='Pop', creator=other).songs.add(self.explicit)
+        self.assertSetEqual(stale(), {('C', other.pk), ('G', other_genre.pk)})
+        self.explicit.playlist_set.clear()
+        self.assertSetEqual(stale(), {('C', other.pk), ('G', other_genre.pk)} | curator_pages)
+
+        # songs nowhere on the pages
+        album = ms_models.Album.objects.create(title='Culture', genre=other_genre, date_of_release='2017-01-27')
+        ms_models.Song.objects.create(title='T-Shirt', track_no=1, disc=album.disc_one, genre=other_genre)
+        self.assertSetEqual(stale(), set())
+
+        # deleted rows
+        self.playlist.delete()
+        self.assertSetEqual(stale(), curator_pages)
+
+    def test_clean(self):
+        page = page_document(ms_models.PageDocument.GENRE, self.genre, clean=True)
+        self.assertListEqual([song['id'] for song in page['playlists'][0]['songs']], [self.song.pk])
+        self.assertEqual(page['sections'][0]['playlists'][0]['song_count'], 1)
+        page = page_document(ms_models.PageDocument.GENRE, self.genre)
+        self.assertEqual(len(page['playlists'][0]['songs']), 2)
+        self.assertEqual(page['sections'][0]['playlists'][0]['song_count'], 2)
+
+    def test_compact_sections(self):
+        artist = ms_models.Artist.objects.create(name='Quavo')
+        self.section.artists.add(artist)
+        self.section.albums.add(self.song.disc.album)
+        self.assertDictEqual(curator_page(self.curator, clean=False)['sections'][0], {
+            'id': self.section.pk,
+            'name': 'Top Playlists',
+            'artists': [{'id': artist.pk, 'name': 'Quavo', 'avi': artist.avi.url}],
+            'albums': [{'id': self.song.disc.album.pk, 'title': 'WAX', 'cover': self.song.disc.album.cover.url}],
+            'playlists': [{'id': self.playlist.pk, 'title': 'Trap', 'cover': self.playlist.cover.url, 'song_count': 2}]
+        })
+
+        # the cost of a page doesn't grow with what its sections hold
+        with self.assertNumQueries(8):
+            curator_page(self.curator, clean=False)
+
+        for i in range(5):
+            section = ms_models.CreatorSection.objects.create(name=f'Section {i}', creator=self.curator)
+            playlist = ms_models.Playlist.objects.create(title=f'Playlist {i}', creator=self.curator)
+            section.artists.add(artist)
+            section.albums.add(self.song.disc.album)
+            section.playlists.add(playlist, self.playlist)
+
+        with self.assertNumQueries(8):
+            curator_page(self.curator, clean=False)
+
+    def test_build_stale_pages(self):
+        self.assertEqual(build_stale_pages(), 0)
+        # a genre and a curator, with and without explicit songs
+        self.assertEqual(build_stale_pages(build_all=True), 4)
+        self.assertEqual(build_stale_pages(build_all=True), 0)
+
+        self.playlist.songs.remove(self.song)
+        self.assertEqual(build_stale_pages(), 4)
+        self.assertEqual(
+            ms_models.PageDocument.objects.get(kind=ms_models.PageDocument.CURATOR, clean=False).document['playlists'],
+            ms_s.PlaylistSerializer([self.playlist], many=True).data
+        )
+
+        # a change while a page is being built leaves it stale
+        self.section.save()
+        stale = ms_models.PageDocument.objects.get(kind=ms_models.PageDocument.CURATOR, clean=False)
+        self.section.save()
+        build_page(stale.kind, self.curator, stale.clean, stale.generation)
+        self.assertTrue(ms_models.PageDocument.objects.get(pk=stale.pk).stale)
+
+        # pages of deleted curators are dropped
+        curator = ms_models.Creator.objects.create(name='Tyne Music Pop')
+        page_document(ms_models.PageDocument.CURATOR, curator)
+        curator.delete()
+        build_stale_pages()
+        self.assertFalse(ms_models.PageDocument.objects.filter(object_id=curator.pk, kind='C').exists())
+
+
+@tag('music-pages')
+class PagesViewTestCase(PagesTestMixin, APITestCase):
+    def setUp(self):
+        self.make_pages()
+        self.user = User.objects.create_user(username='fm', email='fm@tyne.com', password='pass@123', tier='F')
+        self.client.force_login(self.user)
+
+    def test_pages(self):
+        minor = self.user.profile_set.create(name='Kid', minor=True)
+        url = reverse('music:curator', args=(self.curator.pk,))
+        response = self.client.get(url).json()
+        self.assertEqual(len(response['playlists'][0]['songs']), 2)
+        response = self.client.get(url, {'p': minor.pk}).json()
+        self.assertEqual(len(response['playlists'][0]['songs']), 1)
+        response = self.client.get(url, {'io': 1}).json()
+        self.assertDictEqual(response, ms_s.CreatorSerializer(self.curator).data)
+
+        response = self.client.get(reverse('music:genres'), {'id': self.genre.pk, 'p': minor.pk}).json()
+        self.assertEqual(response['sections'][0]['playlists'][0]['song_count'], 1)
+
+    def test_section(self):
+        minor = self.user.profile_set.create(name='Kid', minor=True)
+        url = reverse('music:curator-section', args=(self.curator.pk, self.section.pk))
+        response = self.client.get(url).json()
+        self.assertDictEqual(response, ms_s.CreatorSectionSerializer(self.section).data)
+        self.assertEqual(len(response['playlists'][0]['songs']), 2)
+        response = self.client.get(url, {'p': minor.pk}).json()
+        self.assertListEqual([song['id'] for song in response['playlists'][0]['songs']], [self.song.pk])
+
+        # sections of other curators
+        other = ms_models.Creator.objects.create(name='Tyne Music Pop')
+        url = reverse('music:curator-section', args=(other.pk, self.section.pk))
+        self.assertEqual(self.client.get(url).status_code, 404)
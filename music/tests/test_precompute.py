@@ -0,0 +1,140 @@
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.contrib.admin import site
+from django.test import RequestFactory, TestCase, tag
+from django.urls import reverse
+
+from core.models import User
+from music import models as ms_models
+from music.admin import AlbumModelAdmin
+from music.precompute import artist_top_songs
+from music.streams import StreamPipeline
+
+
+@tag('music-precompute')
+class ArtistTopSongsTestCase(TestCase):
+    def setUp(self):
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.artist_1 = ms_models.Artist.objects.create(name='Quavo')
+        self.artist_2 = ms_models.Artist.objects.create(name='Takeoff')
+        self.album = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.album.artists.add(self.artist_1)
+        self.album_2 = ms_models.Album.objects.create(
+            title='Rocket',
+            genre=self.genre,
+            date_of_release='2021-06-12'
+        )
+        self.album_2.artists.add(self.artist_2)
+        self.songs = [
+            ms_models.Song.objects.create(
+                title=f'Song {i}',
+                track_no=i,
+                disc=self.album.disc_one,
+                genre=self.genre,
+                streams=i
+            ) for i in range(1, 13)
+        ]
+        self.feature = ms_models.Song.objects.create(
+            title='Feature',
+            track_no=1,
+            disc=self.album_2.disc_one,
+            genre=self.genre,
+            streams=100
+        )
+        self.feature.add_featured_artist(self.artist_1)
+
+    def top(self, artist):
+        artist.refresh_from_db()
+        return artist_top_songs(artist)
+
+    def test_top_songs(self):
+        # album 2 isn't published
+        self.assertListEqual(self.top(self.artist_1), [song.pk for song in reversed(self.songs[2:])])
+        self.assertListEqual(self.top(self.artist_2), [])
+
+        # publishing puts the feature on top
+        self.album_2.published = True
+        self.album_2.save()
+        self.artist_1.refresh_from_db()
+        self.assertEqual(self.artist_1.top_songs_pk[0], self.feature.pk)
+        self.assertListEqual(self.top(self.artist_2), [self.feature.pk])
+
+    def test_minor_profile(self):
+        # the two most streamed are explicit, a minor still gets ten
+        for song in self.songs[-2:]:
+            song.explicit = True
+            song.save()
+        user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123', tier='F')
+        minor = user.profile_set.create(name='Kid', minor=True)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('music:artists'), {'id': self.artist_1.pk, 'p': minor.pk}).json()
+        self.assertListEqual(
+            [song['id'] for song in response['top_songs']], [song.pk for song in reversed(self.songs[:10])]
+        )
+
+    def test_refreshed_on_flush(self):
+        self.top(self.artist_1)
+
+        with TemporaryDirectory() as spool_dir:
+            pipeline = StreamPipeline(spool_dir, flush_size=100, flush_interval=600)
+            for _ in range(50):
+                pipeline.record(self.songs[0].pk)
+            pipeline.flush()
+
+        self.artist_1.refresh_from_db()
+        self.assertEqual(self.artist_1.top_songs_pk[0], self.songs[0].pk)
+
+    def test_forgotten_on_artist_changes(self):
+        self.top(self.artist_2)
+        self.album.artists.add(self.artist_2)
+        self.artist_2.refresh_from_db()
+        self.assertIsNone(self.artist_2.top_songs)
+        self.assertEqual(len(self.top(self.artist_2)), 10)
+
+        self.album.artists.clear()
+        self.artist_2.refresh_from_db()
+        self.assertIsNone(self.artist_2.top_songs)
+        self.assertListEqual(self.top(self.artist_2), [])
+
+    def test_refreshed_on_publish_action(self):
+        self.assertListEqual(self.top(self.artist_2), [])
+
+        # from the changelist filtered to albums that aren't published
+        with patch.object(AlbumModelAdmin, 'message_user'):
+            AlbumModelAdmin(ms_models.Album, site).publish_albums(
+                RequestFactory().get('/'), ms_models.Album.objects.filter(published=False)
+            )
+        self.artist_2.refresh_from_db()
+        self.assertListEqual(self.artist_2.top_songs_pk, [self.feature.pk])
+
+    def test_forgotten_on_song_changes(self):
+        self.songs[0].additional_artists.add(self.artist_2)
+        self.assertListEqual(self.top(self.artist_2), [self.songs[0].pk])
+
+        # edited or deleted
+        self.songs[0].title = 'Renamed'
+        self.songs[0].save()
+        self.artist_2.refresh_from_db()
+        self.assertIsNone(self.artist_2.top_songs)
+        self.assertListEqual(self.top(self.artist_2), [self.songs[0].pk])
+        self.songs[0].delete()
+        self.artist_2.refresh_from_db()
+        self.assertIsNone(self.artist_2.top_songs)
+        self.assertListEqual(self.top(self.artist_2), [])
+
+        # added or removed from either side
+        self.songs[1].additional_artists.add(self.artist_2)
+        self.assertListEqual(self.top(self.artist_2), [self.songs[1].pk])
+        self.artist_2.additions.remove(self.songs[1])
+        self.assertListEqual(self.top(self.artist_2), [])
+        self.songs[2].additional_artists.add(self.artist_2)
+        self.assertListEqual(self.top(self.artist_2), [self.songs[2].pk])
+        self.songs[2].additional_artists.clear()
+        self.assertListEqual(self.top(self.artist_2), [])
@@ -0,0 +1,122 @@
+from tempfile import TemporaryDirectory
+from pathlib import Path
+
+import numpy as np
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from scipy import sparse
+
+from core.models import User
+from music import models as ms_models
+from music.history import add_history
+from music.recommend import ImplicitALS, Recommender, interactions, train
+
+
+class RecommendTestMixin:
+    def make_listeners(self):
+        """
+        profiles 0-2 listen to songs 0-3 and profiles 3-5 to songs 4-7,
+        profile 0 has songs 0-2 in its library and never played song 3
+        """
+        self.spool = TemporaryDirectory()
+        self.profiles = [
+            User.objects.create_user(username=f'pl{i}', email=f'pl{i}@tyne.com', password='pass@123').main_profile
+            for i in range(6)
+        ]
+        genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.album = ms_models.Album.objects.create(
+            title='WAX', genre=genre, date_of_release='2021-05-12', published=True
+        )
+        self.songs = [
+            ms_models.Song.objects.create(title=f'Song {i}', track_no=i, disc=self.album.disc_one, genre=genre)
+            for i in range(8)
+        ]
+        now = timezone.now().timestamp()
+        plays = []
+        for p, profile in enumerate(self.profiles):
+            group = self.songs[:4] if p < 3 else self.songs[4:]
+            plays += [(song.pk, profile.pk, now) for song in group if not (p == 0 and song == self.songs[3])]
+        add_history(plays)
+
+        library_album = ms_models.LibraryAlbum.objects.create(profile=self.profiles[0], album=self.album)
+        library_album.songs.add(*self.songs[:3])
+
+    def tearDown(self):
+        self.spool.cleanup()
+
+
+@tag('music-recommend')
+class ImplicitALSTestCase(TestCase):
+    def test_fit(self):
+        matrix = sparse.csr_matrix(np.array([
+            [1, 1, 0, 0],
+            [1, 1, 1, 0],
+            [0, 0, 1, 1],
+        ], dtype=np.float64))
+        profile_factors, song_factors = ImplicitALS(factors=2, iterations=10).fit(matrix)
+        self.assertTupleEqual(profile_factors.shape, (3, 2))
+        self.assertTupleEqual(song_factors.shape, (4, 2))
+
+        predicted = profile_factors @ song_factors.T
+        # interactions are predicted close to 1, the rest lower
+        self.assertTrue(np.all(predicted[matrix.toarray() > 0] > 0.7))
+        self.assertGreater(predicted[0, 2], predicted[0, 3])
+
+
+@tag('music-recommend')
+class RecommendTestCase(RecommendTestMixin, TestCase):
+    def setUp(self):
+        self.make_listeners()
+
+    def test_interactions(self):
+        profile_pks, song_pks, matrix = interactions()
+        self.assertListEqual(profile_pks.tolist(), sorted(profile.pk for profile in self.profiles))
+        self.assertEqual(len(song_pks), 8)
+        # a play and in the library
+        self.assertEqual(matrix[0, 0], 6)
+        self.assertEqual(matrix[0, 3], 0)
+        self.assertEqual(matrix.nnz, 23)
+
+    def test_recommend(self):
+        with override_settings(RECOMMENDATIONS_DIR=self.spool.name):
+            recommender = Recommender()
+            self.assertListEqual(recommender.recommend(self.profiles[0], 5), [])
+            self.assertEqual(train(factors=4, iterations=10), 6)
+
+            recommended = [pk for pk, _ in recommender.recommend(self.profiles[0], 8)]
+            # what people with the same taste play first, nothing from the library
+            self.assertEqual(recommended[0], self.songs[3].pk)
+            self.assertListEqual(sorted(recommended[1:]), [song.pk for song in self.songs[4:]])
+
+            # retraining switches runs
+            first_run = (Path(self.spool.name) / 'current').read_text()
+            self.assertEqual(train(factors=4, iterations=10), 6)
+            self.assertNotEqual((Path(self.spool.name) / 'current').read_text(), first_run)
+            self.assertFalse((Path(self.spool.name) / first_run).exists())
+            self.assertEqual(recommender.recommend(self.profiles[0], 1)[0][0], self.songs[3].pk)
+
+            newcomer = User.objects.create_user(username='nw', email='nw@tyne.com', password='pass@123').main_profile
+            self.assertListEqual(recommender.recommend(newcomer, 5), [])
+
+
+@tag('music-recommend')
+class RecommendationsViewTestCase(RecommendTestMixin, APITestCase):
+    def setUp(self):
+        self.make_listeners()
+        self.client.force_login(self.profiles[0].user)
+
+    def test_recommendations(self):
+        url = reverse('music:recommendations')
+        with override_settings(RECOMMENDATIONS_DIR=self.spool.name):
+            self.assertListEqual(self.client.get(url).json()['results'], [])
+            train(factors=4, iterations=10)
+            response = self.client.get(url, {'size': 1}).json()
+            self.assertListEqual([entry['song']['id'] for entry in response['results']], [self.songs[3].pk])
+            self.assertEqual(self.client.get(url, {'size': 0}).json(), self.client.get(url).json())
+            self.assertNotEqual(self.client.get(url).json()['results'], [])
+
+            self.album.published = False
+            self.album.save()
+            self.assertListEqual(self.client.get(url).json()['results'], [])
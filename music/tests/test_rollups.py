@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from music import models as ms_models
+from music.rollups import add_daily_streams, recent_streams, song_history, streams_between
+from music.streams import StreamPipeline
+
+
+@tag('music-rollups')
+class DailyStreamsTestCase(TestCase):
+    def setUp(self):
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.genre_2 = ms_models.Genre.objects.create(title='R&B')
+        self.album = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.song_1 = ms_models.Song.objects.create(
+            title='Timmy',
+            track_no=1,
+            disc=self.album.disc_one,
+            genre=self.genre
+        )
+        self.song_2 = ms_models.Song.objects.create(
+            title='Pig',
+            track_no=2,
+            disc=self.album.disc_one,
+            genre=self.genre_2
+        )
+        self.today = timezone.localdate()
+
+    def played(self, days_ago: int) -> float:
+        return timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(12))).timestamp()
+
+    def test_daily_rows(self):
+        add_daily_streams([
+            (self.song_1.pk, None, self.played(0)),
+            (self.song_1.pk, None, self.played(0)),
+            (self.song_1.pk, 1, self.played(3)),
+            (self.song_2.pk, None, self.played(10)),
+            (800, None, self.played(0)),
+        ])
+        add_daily_streams([(self.song_1.pk, None, self.played(0))])
+
+        self.assertSetEqual(
+            set(ms_models.SongDailyStreams.objects.values_list('song', 'day', 'streams')),
+            {
+                (self.song_1.pk, self.today, 3),
+                (self.song_1.pk, self.today - timedelta(days=3), 1),
+                (self.song_2.pk, self.today - timedelta(days=10), 1),
+            }
+        )
+
+        songs, streams = recent_streams(7)
+        self.assertDictEqual(dict(zip(songs.tolist(), streams.tolist())), {self.song_1.pk: 4})
+        songs, streams = recent_streams(30, genre=self.genre_2)
+        self.assertDictEqual(dict(zip(songs.tolist(), streams.tolist())), {self.song_2.pk: 1})
+        songs, streams = streams_between(self.today - timedelta(days=3), self.today - timedelta(days=1))
+        self.assertDictEqual(dict(zip(songs.tolist(), streams.tolist())), {self.song_1.pk: 1})
+        songs, streams = recent_streams(1, genre=self.genre_2)
+        self.assertEqual(len(songs), 0)
+
+        self.assertListEqual(list(song_history(self.song_1, 4).values()), [1, 0, 0, 3])
+
+    def test_written_on_flush(self):
+        with TemporaryDirectory() as spool_dir:
+            pipeline = StreamPipeline(spool_dir, flush_size=100, flush_interval=600)
+            pipeline.record(self.song_2.pk)
+            pipeline.record(self.song_2.pk)
+            pipeline.flush()
+
+        self.assertEqual(ms_models.SongDailyStreams.objects.get(song=self.song_2, day=self.today).streams, 2)
@@ -208,6 +208,53 @@ class MusicSerializerTestCase(TestCase):
             }
         )
 
+    def test_memo(self):
+        group = Artist.objects.create(name='Migos', is_group=True)
+        group.add_artist_to_group(self.artist_2)
+        self.song_1.add_additional_artist(group)
+        self.song_2.add_additional_artist(group)
+        songs = Song.objects.filter(pk__in=[self.song_1.pk, self.song_2.pk]).prefetch_related('additional_artists')
+
+        # the group is on both songs, its members are read once
+        with self.assertNumQueries(3):
+            data = m_serializers.SongSerializer(songs, many=True).data
+
+        self.assertListEqual(
+            [song['additional_artists'] for song in data],
+            [m_serializers.SongSerializer(song).data['additional_artists'] for song in songs]
+        )
+        self.assertIs(data[0]['additional_artists'][-1], data[1]['additional_artists'][-1])
+
+        # shared between serializers of the same response, variants are kept apart
+        context = m_serializers.response_context()
+        song = m_serializers.SongSerializer(self.song_1, context=context).data
+        with self.assertNumQueries(0):
+            self.assertDictEqual(m_serializers.SongSerializer(self.song_1, context=context).data, song)
+        self.assertIn('album_art', m_serializers.SongSerializer(self.song_1, album_info=True, context=context).data)
+
+    def test_sparse_fields(self):
+        album = m_serializers.AlbumSerializer(self.album_1).data
+        data = m_serializers.AlbumSerializer(self.album_1, fields=('id', 'title', 'cover')).data
+        self.assertDictEqual(data, {'id': album['id'], 'title': album['title'], 'cover': album['cover']})
+        data = m_serializers.AlbumSerializer(self.album_1, no_discs=True, exclude=('copyright', 'discs')).data
+        self.assertDictEqual(data, {name: value for name, value in album.items() if name not in ('copyright', 'discs')})
+        data = m_serializers.SongSerializer(self.song_1, album_info=True, fields=('id', 'album_art')).data
+        self.assertListEqual(list(data), ['id', 'album_art'])
+
+        # the related rows of fields left out aren't read
+        lookups = m_serializers.AlbumSerializer.related_lookups(
+            ['genre', 'artists__group_members', 'other_versions'], fields=('id', 'title', 'artists')
+        )
+        self.assertListEqual(lookups, ['artists__group_members'])
+        albums = m_serializers.AlbumSerializer.load_related(
+            Album.objects.filter(pk=self.album_1.pk),
+            select_related=('genre',),
+            prefetch_related=('artists', 'other_versions'),
+            fields=('id', 'title', 'cover')
+        )
+        with self.assertNumQueries(1):
+            m_serializers.AlbumSerializer(albums, many=True, fields=('id', 'title', 'cover')).data
+
     def test_disc_data(self):
         disc = self.album_1.disc_one
         ds = m_serializers.DiscSerializer(disc)
@@ -316,4 +363,31 @@ class MusicSerializerTestCase(TestCase):
 
     def test_library_data(self):
         lib = m_serializers.Library(self.user.main_profile)
-        self.assertListEqual(list(lib.data.keys()), ['library_profile', 'library_items'])
+        self.assertListEqual(list(lib.data.keys()), ['library_profile', 'library_items', 'library_page'])
+
+    def test_library_items_order_and_pages(self):
+        profile = self.user.main_profile
+        lib = m_serializers.Library(profile)
+        self.assertListEqual(
+            [(item['item_type'], item['id']) for item in lib.data['library_items']],
+            [
+                ('PLAYLIST', self.playlist_3.pk),
+                ('LIBRARY_ALBUM', self.lib_album_2.pk),
+                ('LIBRARY_ALBUM', self.lib_album.pk),
+                ('PLAYLIST', self.playlist_2.pk),
+            ]
+        )
+        self.assertDictEqual(
+            lib.data['library_items'][0],
+            dict(m_serializers.PlaylistSerializer(self.playlist_3).data, item_type='PLAYLIST')
+        )
+
+        # second page of 3 items each
+        lib = m_serializers.Library(profile, context={'page': 2, 'page_size': 3})
+        self.assertListEqual(
+            [(item['item_type'], item['id']) for item in lib.data['library_items']],
+            [('PLAYLIST', self.playlist_2.pk)]
+        )
+        self.assertDictEqual(lib.data['library_page'], {'page': 2, 'page_size': 3, 'has_next': False})
+        lib = m_serializers.Library(profile, context={'page': 1, 'page_size': 3})
+        self.assertTrue(lib.data['library_page']['has_next'])
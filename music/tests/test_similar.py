@@ -0,0 +1,110 @@
+from django.test import TestCase, tag
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.similar import SimilarityBuilder, similar_items
+
+
+class SimilarTestMixin:
+    def make_catalogue(self):
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        creator = ms_models.Creator.objects.create(name='Tyne Music Hip-Hop')
+        self.artists = [ms_models.Artist.objects.create(name=f'Artist {i}') for i in range(4)]
+        self.album_1 = ms_models.Album.objects.create(
+            title='WAX', genre=genre, date_of_release='2021-05-12', published=True
+        )
+        self.album_1.artists.add(self.artists[0])
+        self.album_2 = ms_models.Album.objects.create(
+            title='Rocket', genre=genre, date_of_release='2021-06-12', published=True
+        )
+        self.album_2.artists.add(self.artists[1])
+        self.songs = [
+            ms_models.Song.objects.create(title=f'Song {i}', track_no=i, disc=album.disc_one, genre=genre)
+            for i, album in enumerate([self.album_1, self.album_1, self.album_2, self.album_2])
+        ]
+        self.songs[2].add_featured_artist(self.artists[2])
+
+        playlist_1 = ms_models.Playlist.objects.create(title='One', creator=creator)
+        playlist_1.songs.add(*self.songs[:3])
+        playlist_2 = ms_models.Playlist.objects.create(title='Two', profile=self.user.main_profile)
+        playlist_2.songs.add(*self.songs[:2])
+        library_album = ms_models.LibraryAlbum.objects.create(profile=self.user.main_profile, album=self.album_2)
+        library_album.songs.add(self.songs[1], self.songs[3])
+        section = ms_models.CreatorSection.objects.create(name='Picks', creator=creator)
+        section.artists.add(self.artists[0], self.artists[3])
+
+    def pks(self, items, *indexes):
+        return [items[index].pk for index in indexes]
+
+
+@tag('music-similar')
+class SimilarityTestCase(SimilarTestMixin, TestCase):
+    def setUp(self):
+        self.make_catalogue()
+
+    def test_similar_songs(self):
+        neighbours = SimilarityBuilder(size=2).song_neighbours()
+        self.assertListEqual(neighbours[self.songs[0].pk], [(self.songs[1].pk, 0.8165), (self.songs[2].pk, 0.7071)])
+        # songs 2 and 3 tie
+        self.assertListEqual(neighbours[self.songs[1].pk], [(self.songs[0].pk, 0.8165), (self.songs[2].pk, 0.5774)])
+        self.assertListEqual(neighbours[self.songs[3].pk], [(self.songs[1].pk, 0.5774)])
+
+    def test_similar_artists(self):
+        neighbours = SimilarityBuilder().artist_neighbours()
+        # same song, then same playlist
+        self.assertListEqual(
+            neighbours[self.artists[2].pk], [(self.artists[1].pk, 0.7071), (self.artists[0].pk, 0.2887)]
+        )
+        # same creator section
+        self.assertListEqual([pk for pk, _ in neighbours[self.artists[3].pk]], self.pks(self.artists, 0))
+
+    def test_build(self):
+        self.assertEqual(SimilarityBuilder().build(), 8)
+        self.assertListEqual(
+            [pk for pk, _ in similar_items(ms_models.SimilarItems.SONGS, self.songs[1].pk, 10)],
+            self.pks(self.songs, 0, 2, 3)
+        )
+        self.assertEqual(len(similar_items(ms_models.SimilarItems.SONGS, self.songs[1].pk, 1)), 1)
+        self.assertListEqual(similar_items(ms_models.SimilarItems.ARTISTS, 800, 10), [])
+
+        # rebuilding replaces
+        ms_models.Playlist.objects.all().delete()
+        ms_models.LibraryAlbum.objects.all().delete()
+        self.assertEqual(SimilarityBuilder().build(), 4)
+        self.assertFalse(ms_models.SimilarItems.objects.filter(kind=ms_models.SimilarItems.SONGS).exists())
+
+
+@tag('music-similar')
+class SimilarViewTestCase(SimilarTestMixin, APITestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.client.force_login(self.user)
+        SimilarityBuilder().build()
+
+    def test_similar(self):
+        url = reverse('music:similar')
+        response = self.client.get(url, {'id': self.songs[0].pk, 'size': 1}).json()
+        self.assertListEqual(response['entries'], [
+            {'score': 0.8165, 'song': ms_s.SongSerializer(self.songs[1], album_info=True).data}
+        ])
+        self.assertEqual(
+            self.client.get(url, {'id': self.songs[0].pk, 'size': 0}).json(),
+            self.client.get(url, {'id': self.songs[0].pk}).json()
+        )
+
+        response = self.client.get(url, {'type': 'artists', 'id': self.artists[3].pk}).json()
+        self.assertListEqual(
+            [entry['artist'] for entry in response['entries']],
+            ms_s.ArtistSerializer([self.artists[0]], many=True).data
+        )
+
+        # unpublished songs are left out
+        self.album_2.published = False
+        self.album_2.save()
+        response = self.client.get(url, {'id': self.songs[0].pk}).json()
+        self.assertListEqual([entry['song']['id'] for entry in response['entries']], self.pks(self.songs, 1))
+        self.assertEqual(self.client.get(url, {'id': self.songs[2].pk}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'type': 'albums', 'id': self.album_1.pk}).status_code, 404)
@@ -0,0 +1,26 @@
+from unittest.mock import patch
+
+from django.test import TestCase, tag
+
+from music.stamps import ALBUMS, GENRES, SECOND, catalogue_stamps, stamps_last_modified, touch_stamps
+
+
+@tag('music-stamps')
+class StampsTestCase(TestCase):
+    def test_stamps(self):
+        with patch('music.stamps.time_ns', return_value=5 * SECOND + 10):
+            stamps = catalogue_stamps([GENRES, ALBUMS])
+        self.assertDictEqual(stamps, {GENRES: 5 * SECOND + 10, ALBUMS: 5 * SECOND + 10})
+
+        # changes in the same second move Last-Modified on a second each
+        with patch('music.stamps.time_ns', return_value=5 * SECOND + 20):
+            touch_stamps(GENRES)
+            touch_stamps(GENRES)
+        stamps = catalogue_stamps([GENRES, ALBUMS])
+        self.assertDictEqual(stamps, {GENRES: 7 * SECOND, ALBUMS: 5 * SECOND + 10})
+        self.assertEqual(stamps_last_modified(stamps).timestamp(), 7)
+
+        # later changes are stamped with their time
+        with patch('music.stamps.time_ns', return_value=9 * SECOND + 30):
+            touch_stamps(GENRES, ALBUMS)
+        self.assertDictEqual(catalogue_stamps([GENRES, ALBUMS]), {GENRES: 9 * SECOND + 30, ALBUMS: 9 * SECOND + 30})
@@ -0,0 +1,182 @@
+import subprocess
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event, current_thread
+from unittest.mock import patch
+
+from django.test import TestCase, tag
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models
+from music.streams import StreamPipeline, stream_pipeline, streams_flushed
+
+
+class StreamsTestMixin:
+    def make_catalogue(self):
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.album = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.song_1 = ms_models.Song.objects.create(
+            title='Timmy', track_no=1, disc=self.album.disc_one, genre=self.genre
+        )
+        self.song_2 = ms_models.Song.objects.create(
+            title='Pig', track_no=2, disc=self.album.disc_one, genre=self.genre
+        )
+
+
+@tag('music-streams')
+class StreamPipelineTestCase(StreamsTestMixin, TestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.spool_dir = TemporaryDirectory()
+        self.pipeline = StreamPipeline(self.spool_dir.name, flush_size=5, flush_interval=600)
+
+    def tearDown(self):
+        self.spool_dir.cleanup()
+
+    def test_flush_adds_up_plays(self):
+        flushed = []
+
+        def receiver(sender, counts, plays, **kwargs):
+            flushed.append((counts, plays))
+
+        streams_flushed.connect(receiver)
+        self.pipeline.record(self.song_1.pk, played_at=1.0)
+        self.pipeline.record(self.song_1.pk, played_at=2.0)
+        self.pipeline.record(self.song_2.pk, played_at=3.0)
+
+        # nothing written yet
+        self.song_1.refresh_from_db()
+        self.assertEqual(self.song_1.streams, 0)
+        self.assertEqual(len(self.pipeline.spool_path.read_text().splitlines()), 3)
+
+        self.assertDictEqual(self.pipeline.flush(), {self.song_1.pk: 2, self.song_2.pk: 1})
+        streams_flushed.disconnect(receiver)
+        self.song_1.refresh_from_db()
+        self.song_2.refresh_from_db()
+        self.assertEqual(self.song_1.streams, 2)
+        self.assertEqual(self.song_2.streams, 1)
+        self.assertEqual(self.pipeline.spool_path.read_text(), '')
+        self.assertListEqual(flushed, [(
+            {self.song_1.pk: 2, self.song_2.pk: 1},
+            [(self.song_1.pk, None, 1.0), (self.song_1.pk, None, 2.0), (self.song_2.pk, None, 3.0)]
+        )])
+
+        # nothing to flush
+        self.assertDictEqual(self.pipeline.flush(), {})
+
+    def test_flush_size(self):
+        flushed = Event()
+        flushed_on = []
+
+        def flush():
+            flushed_on.append(current_thread())
+            flushed.set()
+
+        # a full buffer goes to the timer's thread at once, the interval is far off
+        with patch.object(self.pipeline, 'flush', side_effect=flush):
+            for _ in range(4):
+                self.pipeline.record(self.song_1.pk)
+            self.assertFalse(flushed.wait(timeout=0.1))
+            self.pipeline.record(self.song_1.pk)
+            self.assertTrue(flushed.wait(timeout=5))
+
+        self.assertEqual(len(self.pipeline.plays), 5)
+        self.assertIsNot(flushed_on[0], current_thread())
+
+    def test_recover_dead_worker_spool(self):
+        worker = subprocess.Popen(['true'])
+        worker.wait()
+        dead_spool = self.pipeline.spool_dir / f'{worker.pid}.spool'
+        dead_spool.write_text(f'{self.song_1.pk},,10.0\n{self.song_2.pk},3,11.0\n{self.song_2.pk},3')
+
+        # recording alone leaves other processes' spools alone, the timer picks them up
+        self.pipeline.record(self.song_1.pk, played_at=9.0)
+        self.assertTrue(dead_spool.exists())
+        self.pipeline.recover()
+        self.assertFalse(dead_spool.exists())
+        self.assertListEqual(
+            self.pipeline.plays, [(self.song_1.pk, None, 9.0), (self.song_1.pk, None, 10.0), (self.song_2.pk, 3, 11.0)]
+        )
+        self.assertDictEqual(self.pipeline.flush(), {self.song_1.pk: 2, self.song_2.pk: 1})
+
+    def test_recover_dead_worker_flush(self):
+        worker = subprocess.Popen(['true'])
+        worker.wait()
+        flushing = self.pipeline.spool_dir / f'{worker.pid}.flushing'
+        flushing.write_text(f'{self.song_1.pk},,10.0\n')
+
+        self.pipeline.recover()
+        self.assertFalse(flushing.exists())
+        self.assertListEqual(self.pipeline.plays, [(self.song_1.pk, None, 10.0)])
+
+    def test_records_while_writing(self):
+        write_counts = self.pipeline.write_counts
+
+        def record_then_write(counts):
+            # the buffer isn't locked while plays are written
+            self.assertTrue(self.pipeline.lock.acquire(timeout=1))
+            self.pipeline.lock.release()
+            self.pipeline.record(self.song_2.pk, played_at=2.0)
+            write_counts(counts)
+
+        self.pipeline.record(self.song_1.pk, played_at=1.0)
+        with patch.object(self.pipeline, 'write_counts', side_effect=record_then_write):
+            self.assertDictEqual(self.pipeline.flush(), {self.song_1.pk: 1})
+
+        self.assertListEqual(self.pipeline.plays, [(self.song_2.pk, None, 2.0)])
+        self.assertEqual(self.pipeline.spool_path.read_text(), f'{self.song_2.pk},,2.0\n')
+        self.assertFalse(self.pipeline.flushing_path.exists())
+
+    def test_failed_flush_keeps_plays(self):
+        self.pipeline.record(self.song_1.pk, played_at=1.0)
+        with patch.object(self.pipeline, 'write_counts', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.pipeline.flush()
+
+        self.assertListEqual(self.pipeline.plays, [(self.song_1.pk, None, 1.0)])
+        self.assertEqual(len(self.pipeline.spool_path.read_text().splitlines()), 1)
+        self.assertDictEqual(self.pipeline.flush(), {self.song_1.pk: 1})
+
+    def test_flush_interval_timer(self):
+        pipeline = StreamPipeline(self.spool_dir.name, flush_size=5, flush_interval=0.05)
+        flushed = Event()
+        # the timer's thread can't see the test's transaction, only the call is checked
+        with patch.object(pipeline, 'flush', side_effect=lambda: flushed.set()):
+            pipeline.record(self.song_1.pk)
+            self.assertTrue(flushed.wait(timeout=5))
+
+
+@tag('music-streams')
+class PlaysViewTestCase(StreamsTestMixin, APITestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        self.client.force_login(self.user)
+        self.spool_dir = TemporaryDirectory()
+        self.spool_dir_og = stream_pipeline.spool_dir
+        stream_pipeline.spool_dir = Path(self.spool_dir.name)
+
+    def tearDown(self):
+        stream_pipeline.spool_dir = self.spool_dir_og
+        self.spool_dir.cleanup()
+
+    def test_plays(self):
+        url = reverse('music:plays')
+        response = self.client.post(url, {'songs': [self.song_1.pk, self.song_1.pk, 800]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['recorded'], 2)
+        stream_pipeline.flush()
+        self.song_1.refresh_from_db()
+        self.assertEqual(self.song_1.streams, 2)
+
+        response = self.client.post(url, {'songs': 'all'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        for body in ([self.song_1.pk], 'songs', 1):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, 400)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.test import TestCase, tag
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import User
+from music import models as ms_models, serializers as ms_s
+from music.trending import add_trending_plays, artist_trends, fill_trending_sections, song_trends, trending_albums
+
+
+class TrendingTestMixin:
+    def make_catalogue(self):
+        self.genre = ms_models.Genre.objects.create(title='Hip-Hop')
+        self.creator = ms_models.Creator.objects.create(name='Tyne Music Hip-Hop')
+        self.artist_1 = ms_models.Artist.objects.create(name='Quavo')
+        self.artist_2 = ms_models.Artist.objects.create(name='Takeoff')
+        self.album_1 = ms_models.Album.objects.create(
+            title='WAX',
+            genre=self.genre,
+            date_of_release='2021-05-12',
+            published=True
+        )
+        self.album_1.artists.add(self.artist_1)
+        self.album_2 = ms_models.Album.objects.create(
+            title='Rocket',
+            genre=self.genre,
+            date_of_release='2021-06-12',
+            published=True
+        )
+        self.album_2.artists.add(self.artist_2)
+        self.song_1 = ms_models.Song.objects.create(
+            title='Timmy', track_no=1, disc=self.album_1.disc_one, genre=self.genre
+        )
+        self.song_2 = ms_models.Song.objects.create(
+            title='Pig', track_no=2, disc=self.album_1.disc_one, genre=self.genre
+        )
+        self.song_3 = ms_models.Song.objects.create(
+            title='Lift', track_no=1, disc=self.album_2.disc_one, genre=self.genre
+        )
+        self.song_3.add_featured_artist(self.artist_1)
+
+
+@tag('music-trending')
+class TrendingTestCase(TrendingTestMixin, TestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.now = timezone.now()
+
+    def test_decayed_scores(self):
+        song_trends.add({self.song_1.pk: 3}, at=self.now - timedelta(hours=24))
+        self.assertAlmostEqual(song_trends.top(1, at=self.now - timedelta(hours=24))[0][1], 3)
+        self.assertAlmostEqual(song_trends.top(1, at=self.now)[0][1], 1.5)
+
+        song_trends.add({self.song_1.pk: 1, self.song_2.pk: 2}, at=self.now)
+        self.assertEqual(len(song_trends.top(1, at=self.now)), 1)
+        top = song_trends.top(5, at=self.now)
+        self.assertListEqual([pk for pk, _ in top], [self.song_1.pk, self.song_2.pk])
+        self.assertAlmostEqual(top[0][1], 2.5)
+        self.assertAlmostEqual(top[1][1], 2)
+
+        # older plays fade
+        song_trends.add({self.song_3.pk: 1}, at=self.now + timedelta(hours=48))
+        self.assertListEqual(
+            [pk for pk, _ in song_trends.top(5, at=self.now + timedelta(hours=48))],
+            [self.song_3.pk, self.song_1.pk, self.song_2.pk]
+        )
+
+    def test_plays(self):
+        add_trending_plays({self.song_1.pk: 2, self.song_3.pk: 3, 800: 10})
+        self.assertListEqual([pk for pk, _ in song_trends.top(5)], [self.song_3.pk, self.song_1.pk])
+
+        # quavo gets plays of his songs and features
+        artists = artist_trends.top(5)
+        self.assertListEqual([pk for pk, _ in artists], [self.artist_1.pk, self.artist_2.pk])
+        self.assertAlmostEqual(artists[0][1], 5, places=3)
+        self.assertListEqual([pk for pk, _ in trending_albums(5)], [self.album_2.pk, self.album_1.pk])
+
+    def test_sections(self):
+        add_trending_plays({self.song_1.pk: 2, self.song_3.pk: 3})
+        artists_section = ms_models.CreatorSection.objects.create(
+            name='Trending',
+            creator=self.creator,
+            auto_fill=ms_models.CreatorSection.TRENDING_ARTISTS
+        )
+        albums_section = ms_models.CreatorSection.objects.create(
+            name='Hot albums',
+            creator=self.creator,
+            auto_fill=ms_models.CreatorSection.TRENDING_ALBUMS
+        )
+        manual = ms_models.CreatorSection.objects.create(name='Picks', creator=self.creator)
+
+        self.assertEqual(fill_trending_sections(1), 2)
+        self.assertListEqual(list(artists_section.artists.all()), [self.artist_1])
+        self.assertListEqual(list(albums_section.albums.all()), [self.album_2])
+        self.assertEqual(manual.artists.count(), 0)
+
+
+@tag('music-trending')
+class TrendingViewTestCase(TrendingTestMixin, APITestCase):
+    def setUp(self):
+        self.make_catalogue()
+        self.user = User.objects.create_user(username='pl', email='pl@tyne.com', password='pass@123')
+        self.client.force_login(self.user)
+
+    def test_trending(self):
+        url = reverse('music:trending')
+        add_trending_plays({self.song_1.pk: 2, self.song_3.pk: 3})
+        response = self.client.get(url, {'size': 1}).json()
+        self.assertListEqual(response['entries'], [
+            {'rank': 1, 'score': 3, 'song': ms_s.SongSerializer(self.song_3, album_info=True).data}
+        ])
+        # sizes below 1 get the default
+        self.assertEqual(self.client.get(url, {'size': 0}).json(), self.client.get(url).json())
+        response = self.client.get(url, {'type': 'artists'}).json()
+        self.assertListEqual(
+            [entry['artist'] for entry in response['entries']],
+            ms_s.ArtistSerializer([self.artist_1, self.artist_2], many=True).data
+        )
+        response = self.client.get(url, {'type': 'albums'}).json()
+        self.assertListEqual(
+            [entry['album']['id'] for entry in response['entries']], [self.album_2.pk, self.album_1.pk]
+        )
+        self.assertEqual(self.client.get(url, {'type': 'genres'}).status_code, 404)
+
+    def test_unpublished(self):
+        url = reverse('music:trending')
+        add_trending_plays({self.song_1.pk: 2, self.song_3.pk: 3})
+        self.album_2.published = False
+        self.album_2.save()
+
+        response = self.client.get(url, {'size': 1}).json()
+        self.assertListEqual(response['entries'], [
+            {'rank': 1, 'score': 2, 'song': ms_s.SongSerializer(self.song_1, album_info=True).data}
+        ])
+        response = self.client.get(url, {'type': 'albums'}).json()
+        self.assertListEqual([entry['album']['id'] for entry in response['entries']], [self.album_1.pk])
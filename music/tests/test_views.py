@@ -1,15 +1,23 @@
+import json
+from unittest.mock import patch
+
 from rest_framework.test import APIClient, APITestCase
-from django.test import tag
+from django.test import override_settings, tag
 from django.urls import reverse
+from django.utils.http import parse_http_date
 
 from music import models as ms_models, serializers as ms_s
+from music.stamps import STAMPS, catalogue_stamps
 from core.models import User
+from tyne_utils.cursors import encode_cursor
 
 
 @tag('music-v')
 class MusicViewsTestCase(APITestCase):
     def setUp(self):
         self.maxDiff = None
+        # stamps are made the first time they're read
+        catalogue_stamps(STAMPS)
         self.client = APIClient()
         # users
         self.user = User.objects.create_user(
@@ -127,14 +135,17 @@ class MusicViewsTestCase(APITestCase):
 
         # album list
         response = self.client.get(url)
-        self.assertListEqual(
+        self.assertDictEqual(
             response.json(),
-            ms_s.AlbumSerializer(
-                ms_models.Album.objects.filter(published=True).order_by('date_of_release'),
-                many=True,
-                read_only=True,
-                no_discs=True
-            ).data
+            {
+                'results': ms_s.AlbumSerializer(
+                    ms_models.Album.objects.filter(published=True).order_by('-date_of_release', '-pk'),
+                    many=True,
+                    read_only=True,
+                    no_discs=True
+                ).data,
+                'next': None
+            }
         )
 
         # specific album
@@ -147,14 +158,111 @@ class MusicViewsTestCase(APITestCase):
         response = self.client.get(f'{url}?id=800')
         self.assertEqual(response.status_code, 404)
 
+    def test_albums_pages(self):
+        url = reverse('music:albums')
+        older = ms_models.Album.objects.create(
+            title='Culture',
+            genre=self.genre,
+            date_of_release='2017-01-27',
+            published=True
+        )
+        newest_first = [self.album_2.pk, self.album_1.pk, older.pk]
+
+        # pages of 2, same release date ordered by pk
+        response = self.client.get(url, {'size': 2}).json()
+        self.assertListEqual([album['id'] for album in response['results']], newest_first[:2])
+        self.assertEqual(response['next'], encode_cursor('2021-05-12', self.album_1.pk))
+        response = self.client.get(url, {'size': 2, 'cursor': response['next']}).json()
+        self.assertListEqual([album['id'] for album in response['results']], newest_first[2:])
+        self.assertIsNone(response['next'])
+        self.assertEqual(self.client.get(url, {'cursor': f'2021-05-12:{self.album_1.pk}'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'cursor': encode_cursor('yesterday', 1)}).status_code, 404)
+
+        # years
+        response = self.client.get(url, {'y': '2017'}).json()
+        self.assertListEqual([album['id'] for album in response['results']], [older.pk])
+        response = self.client.get(url, {'y': '2016-2021'}).json()
+        self.assertListEqual([album['id'] for album in response['results']], newest_first)
+        response = self.client.get(url, {'y': '2018-2020'}).json()
+        self.assertListEqual(response['results'], [])
+
+    def test_streaming(self):
+        def streamed(url, params):
+            response = self.client.get(url, params)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            return json.loads(b''.join(response.streaming_content))
+
+        # albums, with the filters
+        response = streamed(reverse('music:albums'), {'stream': 1})
+        self.assertDictEqual(response, {
+            'results': ms_s.AlbumSerializer(
+                ms_models.Album.objects.filter(published=True).order_by('-date_of_release', '-pk'),
+                many=True,
+                read_only=True,
+                no_discs=True
+            ).data
+        })
+        response = streamed(reverse('music:albums'), {'stream': 1, 'y': '2018-2020'})
+        self.assertDictEqual(response, {'results': []})
+        for flag in ('0', 'false'):
+            self.assertFalse(self.client.get(reverse('music:albums'), {'stream': flag}).streaming)
+
+        # artists, in more than one chunk
+        with patch('music.views.STREAM_CHUNK_SIZE', 2):
+            response = streamed(reverse('music:artists'), {'stream': 1})
+        self.assertDictEqual(response, {
+            'results': ms_s.ArtistSerializer(ms_models.Artist.objects.order_by('name'), many=True, read_only=True).data
+        })
+
+        # library
+        response = streamed(reverse('music:library'), {'stream': 1})
+        library = ms_s.Library(self.user.main_profile).data
+        self.assertDictEqual(response, {
+            'library_profile': library['library_profile'], 'library_items': library['library_items']
+        })
+
+    def test_sparse_fields(self):
+        albums = reverse('music:albums')
+        published = ms_models.Album.objects.filter(published=True).order_by('-date_of_release', '-pk')
+
+        # session, user, stamps, profile, albums; no genres, artists or other versions
+        with self.assertNumQueries(5):
+            response = self.client.get(albums, {'fields': 'id,title,cover'}).json()
+        self.assertListEqual(
+            response['results'], ms_s.AlbumSerializer(published, many=True, fields=('id', 'title', 'cover')).data
+        )
+        response = self.client.get(albums, {'id': self.album_1.pk, 'exclude': 'discs,copyright'}).json()
+        self.assertDictEqual(response, ms_s.AlbumSerializer(self.album_1, exclude=('discs', 'copyright')).data)
+        self.assertEqual(self.client.get(albums, {'fields': 'id,lyrics'}).status_code, 404)
+        self.assertEqual(self.client.get(albums, {'exclude': ''}).status_code, 404)
+
+        # artists, songs and genres
+        response = self.client.get(reverse('music:artists'), {'fields': 'id,name'}).json()
+        self.assertListEqual(
+            response['results'],
+            [{'id': artist.pk, 'name': artist.name} for artist in ms_models.Artist.objects.order_by('name')]
+        )
+        response = self.client.get(reverse('music:songs'), {'ids': self.song_1.pk, 'exclude': 'additional_artists'})
+        response = response.json()
+        self.assertNotIn('additional_artists', response['results'][0])
+        self.assertIn('album_art', response['results'][0])
+        response = self.client.get(reverse('music:genres'), {'fields': 'id,title'}).json()
+        self.assertListEqual(response, [{'title': self.genre.title, 'id': self.genre.pk}])
+
     def test_artists(self):
         url = reverse('music:artists')
 
         # list
         response = self.client.get(url)
-        self.assertListEqual(
+        self.assertDictEqual(
             response.json(),
-            ms_s.ArtistSerializer(ms_models.Artist.objects.order_by('name'), many=True, read_only=True).data
+            {
+                'results': ms_s.ArtistSerializer(
+                    ms_models.Artist.objects.order_by('name'), many=True, read_only=True
+                ).data,
+                'next': None
+            }
         )
 
         # specific artist
@@ -187,6 +295,80 @@ class MusicViewsTestCase(APITestCase):
         response = self.client.get(f'{url}?id=800')
         self.assertEqual(response.status_code, 404)
 
+    def test_multi_get(self):
+        # albums in the order asked for, unpublished and unknown ones missing
+        url = reverse('music:albums')
+        response = self.client.get(url, {'ids': f'{self.album_2.pk},{self.album_3.pk},{self.album_1.pk},800'}).json()
+        self.assertListEqual(
+            response['results'],
+            ms_s.AlbumSerializer([self.album_2, self.album_1], many=True, read_only=True).data
+        )
+        self.assertListEqual(response['missing'], [self.album_3.pk, 800])
+        self.assertEqual(self.client.get(url, {'ids': '1,a'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(str(i) for i in range(101))}).status_code, 404)
+
+        url = reverse('music:artists')
+        # the shared cache's queries aren't counted
+        with self.settings(OBJECT_CACHE='default'), self.assertNumQueries(6):
+            # session, user, stamps, profile, artists, group members
+            response = self.client.get(url, {'ids': f'{self.artist_4.pk},{self.artist_1.pk},{self.artist_4.pk}'})
+        self.assertDictEqual(response.json(), {
+            'results': ms_s.ArtistSerializer([self.artist_4, self.artist_1], many=True, read_only=True).data,
+            'missing': []
+        })
+
+        url = reverse('music:songs')
+        response = self.client.get(url, {'ids': f'800,{self.song_1.pk}'}).json()
+        self.assertListEqual(response['results'], [ms_s.SongSerializer(self.song_1, album_info=True).data])
+        self.assertListEqual(response['missing'], [800])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        # curators' and the profile's own playlists
+        url = reverse('music:playlists')
+        own = ms_models.Playlist.objects.create(title='Mine', profile=self.user.main_profile)
+        response = self.client.get(url, {'ids': f'{self.playlist_2.pk},{own.pk},{self.playlist_1.pk}'}).json()
+        self.assertListEqual(
+            response['results'],
+            ms_s.PlaylistSerializer([own, self.playlist_1], many=True, read_only=True).data
+        )
+        self.assertListEqual(response['missing'], [self.playlist_2.pk])
+
+    # kept in memory so only database rows are counted in queries
+    @override_settings(ARTIST_DIRECTORY_CACHE='default')
+    def test_artists_directory(self):
+        url = reverse('music:artists')
+        self.artist_4.add_artist_to_group(self.artist_1)
+        self.artist_4.add_artist_to_group(self.artist_3)
+        by_name = [self.artist_4, self.artist_3, self.artist_1, self.artist_2]
+
+        # pages of 3
+        with self.assertNumQueries(6):
+            # session, user, stamps, profile, artists, group members
+            response = self.client.get(url, {'size': 3}).json()
+        self.assertListEqual(response['results'], ms_s.ArtistSerializer(by_name[:3], many=True).data)
+        response = self.client.get(url, {'size': 3, 'cursor': response['next']}).json()
+        self.assertListEqual(response['results'], ms_s.ArtistSerializer(by_name[3:], many=True).data)
+        self.assertIsNone(response['next'])
+        self.assertEqual(self.client.get(url, {'cursor': 'abc'}).status_code, 404)
+
+        # by letter
+        response = self.client.get(url, {'letter': 'q'}).json()
+        self.assertListEqual(response['results'], ms_s.ArtistSerializer([self.artist_1], many=True).data)
+        self.assertEqual(self.client.get(url, {'letter': 'ab'}).status_code, 404)
+
+        # cached until an artist changes
+        with self.assertNumQueries(4):
+            self.client.get(url, {'size': 3})
+        self.artist_3.name = 'Kiari'
+        self.artist_3.save()
+        response = self.client.get(url, {'size': 3}).json()
+        self.assertListEqual([artist['name'] for artist in response['results']], ['Kiari', 'Migos', 'Quavo'])
+        self.artist_4.group_members.remove(self.artist_1)
+        response = self.client.get(url, {'size': 3}).json()
+        self.assertListEqual(
+            [member['name'] for member in response['results'][1]['group_members']], ['Kiari']
+        )
+
     def test_genres(self):
         url = reverse('music:genres')
 
@@ -203,7 +385,9 @@ class MusicViewsTestCase(APITestCase):
         curators = list(self.genre.creator_set.all()) + [self.genre.main_curator]
         genre_info.update({
             'curators': ms_s.CreatorSerializer(set(curators), many=True).data,
-            'sections': ms_s.CreatorSectionSerializer(self.genre.main_curator.creatorsection_set.all(), many=True).data,
+            'sections': ms_s.CreatorSectionSerializer(
+                self.genre.main_curator.creatorsection_set.all(), many=True, compact=True
+            ).data,
             'playlists': ms_s.PlaylistSerializer(
                 self.genre.main_curator.playlist_set.filter(artist__isnull=True),
                 many=True,
@@ -224,7 +408,8 @@ class MusicViewsTestCase(APITestCase):
             'sections': ms_s.CreatorSectionSerializer(
                 self.creator.creatorsection_set.all(),
                 many=True,
-                read_only=True
+                read_only=True,
+                compact=True
             ).data,
             'playlists': ms_s.PlaylistSerializer(
                 self.creator.playlist_set.filter(artist__isnull=True),
@@ -233,3 +418,162 @@ class MusicViewsTestCase(APITestCase):
             ).data
         })
         self.assertEqual(response.json(), c_info)
+
+    def test_conditional_get(self):
+        url = reverse('music:genres')
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # nothing changed
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # other parameters, another profile or a change
+        genre_url = f'{url}?id={self.genre.pk}'
+        genre_etag = self.client.get(genre_url)['ETag']
+        self.assertNotEqual(genre_etag, etag)
+        minor = self.user.profile_set.create(name='Kid', minor=True)
+        self.assertEqual(self.client.get(genre_url, {'p': minor.pk}, HTTP_IF_NONE_MATCH=genre_etag).status_code, 200)
+        self.creator_2.playlist_set.create(title='Trap')
+        self.assertEqual(self.client.get(genre_url, HTTP_IF_NONE_MATCH=genre_etag).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.genre.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # Last-Modified has whole seconds, it moves on with a change in the same second too
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        self.assertGreater(parse_http_date(self.client.get(url)['Last-Modified']), parse_http_date(last_modified))
+
+        # albums come with their songs, the list doesn't
+        url = reverse('music:albums')
+        etag = self.client.get(url)['ETag']
+        album_etag = self.client.get(url, {'id': self.album_1.pk})['ETag']
+        self.song_1.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'id': self.album_1.pk}, HTTP_IF_NONE_MATCH=album_etag).status_code, 200)
+        self.album_1.artists.add(self.artist_2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse('music:artists')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.artist_4.add_artist_to_group(self.artist_1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # still needs a login
+        self.client.logout()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 401)
+
+    def test_conditional_get_artist_playlists(self):
+        url = reverse('music:artists')
+        params = {'id': self.artist_1.pk}
+
+        def changed(etag):
+            return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        etag = self.client.get(url, params)['ETag']
+        self.assertFalse(changed(etag))
+
+        # a playlist saved, its songs, the artist's playlists and a playlist deleted
+        self.playlist_3.title = 'Migos Essentials'
+        self.playlist_3.save()
+        self.assertTrue(changed(etag))
+        etag = self.client.get(url, params)['ETag']
+        self.playlist_3.songs.add(self.song_1)
+        self.assertTrue(changed(etag))
+        etag = self.client.get(url, params)['ETag']
+        self.artist_1.playlists.add(self.playlist_1)
+        self.assertTrue(changed(etag))
+        etag = self.client.get(url, params)['ETag']
+        self.playlist_1.delete()
+        self.assertTrue(changed(etag))
+
+    def test_minor_profile(self):
+        minor = self.user.profile_set.create(name='Kid', minor=True)
+        explicit = ms_models.Song.objects.create(
+            title='Bad and Boujee',
+            track_no=2,
+            disc=self.album_1.disc_one,
+            genre=self.genre,
+            explicit=True
+        )
+        self.playlist_3.add_song_to_playlist(explicit)
+        self.playlist_3.add_song_to_playlist(self.song_1)
+        library = ms_models.LibraryAlbum.objects.create(profile=minor, album=self.album_1)
+        library.songs.add(self.song_1, explicit)
+
+        def song_ids(songs):
+            return [song['id'] for song in songs]
+
+        # album
+        url = reverse('music:albums')
+        discs = self.client.get(url, {'id': self.album_1.pk}).json()['discs']
+        self.assertListEqual(song_ids(discs[0]['songs']), [self.song_1.pk, explicit.pk])
+        discs = self.client.get(url, {'id': self.album_1.pk, 'p': minor.pk}).json()['discs']
+        self.assertListEqual(song_ids(discs[0]['songs']), [self.song_1.pk])
+
+        # artist playlists
+        url = reverse('music:artists')
+        playlists = self.client.get(url, {'id': self.artist_1.pk, 'p': minor.pk}).json()['playlists']
+        self.assertListEqual(song_ids(playlists[0]['songs']), [self.song_1.pk])
+
+        # search
+        url = reverse('music:search')
+        self.assertListEqual(song_ids(self.client.get(url, {'q': 'boujee'}).json()['songs']), [explicit.pk])
+        self.assertListEqual(self.client.get(url, {'q': 'boujee', 'p': minor.pk}).json()['songs'], [])
+
+        # library
+        url = reverse('music:library')
+        items = self.client.get(url, {'p': minor.pk}).json()['library_items']
+        self.assertListEqual(song_ids(items[0]['songs']), [self.song_1.pk])
+        albums = self.client.get(reverse('music:library-sync'), {'p': minor.pk}).json()['albums']
+        self.assertListEqual(song_ids(albums[0]['songs']), [self.song_1.pk])
+
+    def test_library_sync(self):
+        url = reverse('music:library-sync')
+        profile = self.user.main_profile
+        playlist = ms_models.Playlist.objects.create(title='Road trip', profile=profile)
+
+        # no cursor, everything
+        response = self.client.get(url).json()
+        self.assertTrue(response['full'])
+        self.assertListEqual([p['id'] for p in response['playlists']], [playlist.pk])
+        self.assertListEqual([a['id'] for a in response['albums']], [self.library.pk])
+        self.assertListEqual(response['removed'], [])
+
+        # nothing changed since
+        cursor = response['cursor']
+        response = self.client.get(url, {'since': cursor}).json()
+        self.assertFalse(response['full'])
+        self.assertListEqual(response['playlists'], [])
+        self.assertListEqual(response['albums'], [])
+        self.assertListEqual(response['removed'], [])
+
+        # a song added to a playlist, a library album removed
+        playlist.songs.add(self.song_1)
+        library_pk = self.library.pk
+        self.library.delete()
+        response = self.client.get(url, {'since': cursor}).json()
+        self.assertListEqual([p['id'] for p in response['playlists']], [playlist.pk])
+        self.assertListEqual(response['albums'], [])
+        self.assertListEqual(response['removed'], [{'item_type': 'LIBRARY_ALBUM', 'id': library_pk}])
+
+        # the cursor goes into a url as it is
+        cursor = response['cursor']
+        self.assertTrue(cursor.isdigit())
+        response = self.client.get(f'{url}?since={cursor}').json()
+        self.assertFalse(response['full'])
+        self.assertListEqual(response['playlists'], [])
+
+        # a song cleared from the playlists it's on
+        self.song_1.playlist_set.clear()
+        response = self.client.get(url, {'since': cursor}).json()
+        self.assertListEqual([p['id'] for p in response['playlists']], [playlist.pk])
+
+        # too old, everything
+        self.assertTrue(self.client.get(url, {'since': '0'}).json()['full'])
+
+        # not a cursor
+        for since in ('yesterday', '2021-05-12T10:00:00 00:00', '', '9' * 30):
+            self.assertEqual(self.client.get(url, {'since': since}).status_code, 404)
@@ -0,0 +1,133 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from math import exp, log
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Exp, Ln
+from django.utils import timezone
+
+from .models import Album, Artist, ArtistTrend, CreatorSection, Song, SongTrend
+
+# scores are relative to this moment, see TrendingScores
+LANDMARK = datetime(2021, 1, 1, tzinfo=timezone.utc)
+# per second
+DECAY_RATE = log(2) / (settings.TRENDING_HALF_LIFE * 3600)
+
+
+def weight(at: datetime) -> float:
+    """log of what a play at `at` is worth"""
+    return (at - LANDMARK).total_seconds() * DECAY_RATE
+
+
+class TrendingScores:
+    """
+    Exponentially decayed plays of songs or artists
+        songs = TrendingScores(SongTrend, 'song')
+
+    Usage:
+        songs.add({song_pk: plays})
+        songs.top(10) -> [(song_pk, score), ...] highest first
+
+    A score is about the number of plays in the last half life (TRENDING_HALF_LIFE hours), older plays count less
+    and less. Instead of decaying every score as time passes, new plays are worth more, a play at time t is worth
+    2^((t - LANDMARK) / half life) and the stored score is the log of the sum of what its plays are worth.
+    The order of the stored scores is then the order of the decayed scores at any time, so `top` is an index scan,
+    and adding plays is one UPDATE for every group of rows getting the same number of plays:
+        score = log(e^score + e^x) where x = log(plays) + weight(now)
+    """
+
+    def __init__(self, model, field: str):
+        self.model = model
+        self.field = field
+
+    def add(self, counts: Dict[int, int], at: datetime = None):
+        at = at if at else timezone.now()
+        by_count = defaultdict(list)
+        for pk, count in counts.items():
+            by_count[count].append(pk)
+
+        with transaction.atomic():
+            self.model.objects.bulk_create(
+                [self.model(**{f'{self.field}_id': pk}) for pk in counts],
+                ignore_conflicts=True
+            )
+
+            for count, pks in by_count.items():
+                x = Value(log(count) + weight(at), output_field=FloatField())
+                self.model.objects.filter(**{f'{self.field}__pk__in': pks}).update(score=Case(
+                    When(score__isnull=True, then=x),
+                    # log(e^a + e^b) = max(a, b) + log(1 + e^-|a - b|) so it doesn't overflow
+                    When(score__gte=x, then=F('score') + Ln(Exp(x - F('score')) + 1.0)),
+                    default=x + Ln(Exp(F('score') - x) + 1.0),
+                    output_field=FloatField()
+                ))
+
+    def top(self, k: int, at: datetime = None) -> List[Tuple[int, float]]:
+        now = weight(at if at else timezone.now())
+        return [
+            (pk, exp(score - now))
+            for pk, score in self.model.objects.filter(score__isnull=False).order_by('-score').values_list(
+                self.field, 'score'
+            )[:k]
+        ]
+
+
+song_trends = TrendingScores(SongTrend, 'song')
+artist_trends = TrendingScores(ArtistTrend, 'artist')
+
+
+def artist_counts(song_counts: Dict[int, int]) -> Dict[int, int]:
+    """Plays of each artist from plays of songs, album artists, additional artists and features all get the plays"""
+    song_pks = list(song_counts)
+    on_songs = set()
+
+    for relation in ('album__disc__song', 'additions', 'features'):
+        on_songs.update(
+            Artist.objects.filter(**{f'{relation}__pk__in': song_pks}).values_list('pk', f'{relation}__pk')
+        )
+
+    counts = Counter()
+    for artist_pk, song_pk in on_songs:
+        counts[artist_pk] += song_counts[song_pk]
+    return dict(counts)
+
+
+def add_trending_plays(song_counts: Dict[int, int]):
+    known = set(Song.objects.filter(pk__in=list(song_counts)).values_list('pk', flat=True))
+    song_counts = {pk: count for pk, count in song_counts.items() if pk in known}
+    song_trends.add(song_counts)
+    artist_trends.add(artist_counts(song_counts))
+
+
+def trending_albums(k: int) -> List[Tuple[int, float]]:
+    """Published albums of the trending songs, an album's score is that of its top song"""
+    albums = {}
+    songs = song_trends.top(k * 5)
+    song_albums = dict(Song.objects.filter(
+        pk__in=[pk for pk, _ in songs],
+        disc__album__published=True
+    ).values_list('pk', 'disc__album'))
+
+    for song_pk, score in songs:
+        if song_pk in song_albums and song_albums[song_pk] not in albums:
+            albums[song_albums[song_pk]] = score
+
+    return list(albums.items())[:k]
+
+
+def fill_trending_sections(size: int = 10) -> int:
+    """Fill the creator sections set to auto fill with the trending artists or albums, returns sections filled"""
+    sections = CreatorSection.objects.exclude(auto_fill=CreatorSection.MANUAL)
+    artist_pks = [pk for pk, _ in artist_trends.top(size)]
+    album_pks = [pk for pk, _ in trending_albums(size)]
+
+    for section in sections:
+        if section.auto_fill == CreatorSection.TRENDING_ARTISTS:
+            section.artists.set(Artist.objects.filter(pk__in=artist_pks))
+        elif section.auto_fill == CreatorSection.TRENDING_ALBUMS:
+            section.albums.set(Album.objects.filter(pk__in=album_pks))
+
+    return len(sections)
@@ -1,7 +1,9 @@
 from django.urls import path
 
 
-from .views import profile_library, albums, artists, genres, curators, search
+from .views import profile_library, library_sync, albums, artists, songs, playlists, genres, curators, \
+    curator_section, search, plays, charts, trending, recently_played, similar, recommendations, collaborators, \
+    groups, artist_path
 
 
 app_name = 'music'
@@ -11,19 +13,58 @@ urlpatterns = [
     # library/
     path('library/', profile_library, name='library'),
 
+    # library/sync/
+    path('library/sync/', library_sync, name='library-sync'),
+
     # albums/
     path('albums/', albums, name='albums'),
 
     # artists/
     path('artists/', artists, name='artists'),
 
+    # artists/1/collaborators/
+    path('artists/<int:artist_id>/collaborators/', collaborators, name='collaborators'),
+
+    # artists/1/groups/
+    path('artists/<int:artist_id>/groups/', groups, name='groups'),
+
+    # artists/1/path/2/
+    path('artists/<int:artist_id>/path/<int:other_id>/', artist_path, name='artist-path'),
+
+    # songs/
+    path('songs/', songs, name='songs'),
+
+    # playlists/
+    path('playlists/', playlists, name='playlists'),
+
     # genres/
     path('genres/', genres, name='genres'),
 
     # curators/
     path('curators/<int:curator_id>/', curators, name='curator'),
 
+    # curators/1/sections/2/
+    path('curators/<int:curator_id>/sections/<int:section_id>/', curator_section, name='curator-section'),
+
     # search/
     path('search/', search, name='search'),
 
+    # plays/
+    path('plays/', plays, name='plays'),
+
+    # charts/
+    path('charts/', charts, name='charts'),
+
+    # trending/
+    path('trending/', trending, name='trending'),
+
+    # recently-played/
+    path('recently-played/', recently_played, name='recently-played'),
+
+    # similar/
+    path('similar/', similar, name='similar'),
+
+    # recommendations/
+    path('recommendations/', recommendations, name='recommendations'),
+
 ]
@@ -1,24 +1,57 @@
 from re import findall
-from itertools import chain
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import partial
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition
 
+from tyne_utils.cursors import decode_cursor, encode_cursor
+from tyne_utils.funcs import is_string_true_or_false
+from tyne_utils.streaming import chunked, streaming_json_response
 from . import models as ms_models, serializers as ms_serializers
 from .searches import MusicSearch
+from .streams import stream_pipeline
+from .precompute import TOP_SONGS, artist_top_songs
+from .trending import artist_trends, song_trends, trending_albums
+from .history import recently_played as profile_recently_played
+from .similar import NEIGHBOURS, similar_items
+from .recommend import recommender
+from .graph import artist_graph
+from .pages import page_document
+from .directory import DIRECTORY_PAGE_SIZE, MAX_DIRECTORY_PAGE_SIZE, artist_directory_page, directory_cursor, \
+    directory_artists
+from .fast_serializers import AlbumValuesSerializer, ArtistValuesSerializer, GenreValuesSerializer
+from .objects import album_cache, artist_cache, cached_or_404, genre_cache
+from .stamps import (
+    ALBUMS, ARTISTS, GENRES, PAGES, PLAYLISTS, SONGS, catalogue_stamps, stamps_etag, stamps_last_modified
+)
+
+
+MAX_PLAYS_PER_REQUEST = 100
+MAX_TRENDING = 50
+MAX_RECENTLY_PLAYED = 50
+MAX_RECOMMENDATIONS = 100
+MAX_IDS = 100
+ALBUMS_PAGE_SIZE = 50
+MAX_ALBUMS_PAGE_SIZE = 200
+STREAM_CHUNK_SIZE = 200
+SYNC_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def request_profile(request):
+    """The profile a request is for; '?p=profile_pk' for family accounts, otherwise the user's main profile"""
+    if hasattr(request, 'music_profile'):
+        return request.music_profile
 
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def profile_library(request):
-    """
-        Retrieve the library of the logged in user.\n
-        Add parameter '?p=profile_pk' to retrieve the library of another profile from the user
-    """
     profile_pk = request.GET.get('p')
 
     if profile_pk and profile_pk.isdigit() and request.user.tier == 'F':
@@ -30,35 +63,256 @@ def profile_library(request):
     else:
         profile = request.user.main_profile
 
-    lib = ms_serializers.Library(profile)
+    # read once, conditional GETs look at it before the view
+    request.music_profile = profile
+    return profile
+
+
+def request_ids(request):
+    """
+    Ids in '?ids=1,2,3' in the order given without repeats, None when there's no '?ids='.
+    Raises Http404 when they aren't all numbers or there are more than MAX_IDS
+    """
+    ids = request.GET.get('ids')
+
+    if ids is None:
+        return None
+
+    ids = [pk.strip() for pk in ids.split(',') if pk.strip()]
+    if not all(pk.isdigit() for pk in ids) or len(ids) > MAX_IDS:
+        raise Http404
+
+    return list(dict.fromkeys(int(pk) for pk in ids))
+
+
+def request_size(request, default: int, maximum: int) -> int:
+    """The number of items asked for with '?size=', `maximum` at most; `default` when it's missing or below 1"""
+    size = request.GET.get('size', '')
+    return min(int(size), maximum) if size.isdigit() and int(size) > 0 else default
+
+
+def request_fields(request, serializer_class) -> dict:
+    """
+    Arguments for a SparseFieldsMixin serializer from '?fields=id,title' (only these fields) and
+    '?exclude=copyright,notes' (all but these), {} without either. Raises Http404 for fields the serializer doesn't have
+    """
+    sparse = {}
+
+    for param in ('fields', 'exclude'):
+        names = request.GET.get(param)
+        if names is None:
+            continue
+
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        if not names or not set(names).issubset(serializer_class.field_names()):
+            raise Http404
+        sparse[param] = names
+
+    return sparse
+
+
+def stream_list(queryset, serialize, head: dict = None, key: str = 'results'):
+    """
+    A streaming response of every row, read STREAM_CHUNK_SIZE at a time (with the queryset's prefetches) and sent as
+    each chunk is serialized; a worker holds one chunk however many rows there are
+    """
+    return streaming_json_response(
+        (serialize(chunk, many=True).data for chunk in chunked(
+            queryset.iterator(chunk_size=STREAM_CHUNK_SIZE), STREAM_CHUNK_SIZE
+        )),
+        head,
+        key
+    )
+
+
+def multi_get(queryset, ids, serialize):
+    """
+    {'results': [...], 'missing': [...]} for a '?ids=' request, the rows are read in one query (plus the queryset's
+    prefetches), or from an ObjectCache, and returned in the order asked for
+    """
+    found = queryset.in_bulk(ids)
+    return Response({
+        'results': serialize([found[pk] for pk in ids if pk in found], many=True).data,
+        'missing': [pk for pk in ids if pk not in found]
+    })
+
+
+def catalogue_condition(resources):
+    """
+    Conditional GET for a catalogue view; ETag and Last-Modified come from the version stamps of what the response
+    shows, `resources(request)` -> names from music.stamps, so If-None-Match and If-Modified-Since are answered with a
+    304 before anything is read or serialized. The ETag also depends on the query string and on the profile being a
+    minor, explicit songs are left out for minors
+    """
+    def request_stamps(request):
+        if not hasattr(request, 'catalogue_stamps'):
+            request.catalogue_stamps = catalogue_stamps(resources(request))
+        return request.catalogue_stamps
+
+    def etag(request, *args, **kwargs):
+        return stamps_etag(request_stamps(request), request.GET.urlencode(), request_profile(request).minor)
+
+    def last_modified(request, *args, **kwargs):
+        return stamps_last_modified(request_stamps(request))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def album_resources(request):
+    # a single album or several come with their songs
+    if request.GET.get('id') or request.GET.get('ids') is not None:
+        return ALBUMS, ARTISTS, GENRES, SONGS
+    return ALBUMS, ARTISTS, GENRES
+
+
+def artist_resources(request):
+    # a single artist comes with top songs, albums and playlists
+    if request.GET.get('id') and request.GET.get('ids') is None:
+        return ARTISTS, ALBUMS, GENRES, SONGS, PLAYLISTS, PAGES
+    return ARTISTS,
+
+
+def genre_resources(request):
+    # a single genre is a page, see music.pages
+    return (GENRES, PAGES) if request.GET.get('id') else (GENRES,)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def profile_library(request):
+    """
+        Retrieve the library of the logged in user.\n
+        Add parameter '?p=profile_pk' to retrieve the library of another profile from the user\n
+        The library is paged, newest items first; use '?page=2' for the next page and '?size=20' for the page size\n
+        Use '?stream=1' to get the whole library in one streamed response, without 'library_page'
+    """
+    profile = request_profile(request)
+
+    if is_string_true_or_false(request.GET.get('stream', '')):
+        library = ms_serializers.Library
+        timeline = library.timeline(profile, chunk_size=STREAM_CHUNK_SIZE)
+        return streaming_json_response(
+            (library.serialize_items(profile, window) for window in chunked(timeline, STREAM_CHUNK_SIZE)),
+            {'library_profile': library.get_library_profile(profile)},
+            'library_items'
+        )
+
+    page = request.GET.get('page', '')
+    lib = ms_serializers.Library(profile, context={
+        'page': int(page) if page.isdigit() else 1,
+        'page_size': request_size(request, ms_serializers.LIBRARY_PAGE_SIZE, ms_serializers.MAX_LIBRARY_PAGE_SIZE)
+    })
 
     return Response(lib.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def library_sync(request):
+    """
+        Sync the library of the logged in user.\n
+        Use '?since=cursor' with the cursor from the last sync to get only playlists and library albums added or
+        modified since then and the ones removed. Without a cursor (or with one that's too old) the whole library is
+        returned and 'full' is true. A cursor that isn't one from a sync is a 404.\n
+        Add parameter '?p=profile_pk' to sync the library of another profile from the user
+    """
+    profile = request_profile(request)
+    now = timezone.now()
+    since = request.GET.get('since')
+
+    # cursors are microseconds since the epoch, safe in a url as they are
+    if since is not None:
+        if not since.isdigit():
+            raise Http404
+        try:
+            since = SYNC_EPOCH + timedelta(microseconds=int(since))
+        except OverflowError:
+            raise Http404
+
+    full = since is None or since < now - timedelta(days=ms_models.LibraryTombstone.KEEP_DAYS)
+
+    playlists = profile.playlist_set.filter(modified__lte=now).prefetch_related(
+        ms_models.profile_songs('songs', profile)
+    ).order_by('modified')
+    lib_albums = profile.libraryalbum_set.filter(modified__lte=now).select_related(
+        'album', 'album__genre'
+    ).prefetch_related(
+        ms_models.profile_songs('songs', profile), 'album__artists', 'album__other_versions'
+    ).order_by('modified')
+    removed = []
+
+    if not full:
+        playlists = playlists.filter(modified__gt=since)
+        lib_albums = lib_albums.filter(modified__gt=since)
+        removed = [
+            {'item_type': item_type, 'id': item_id}
+            for item_type, item_id in profile.librarytombstone_set.filter(
+                removed__gt=since,
+                removed__lte=now
+            ).order_by('removed').values_list('item_type', 'item_id')
+        ]
+
+    return Response({
+        'cursor': str((now - SYNC_EPOCH) // timedelta(microseconds=1)),
+        'full': full,
+        'playlists': ms_serializers.PlaylistSerializer(playlists, many=True, read_only=True).data,
+        'albums': ms_serializers.LibraryAlbumSerializer(lib_albums, many=True, read_only=True).data,
+        'removed': removed
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@catalogue_condition(album_resources)
 def albums(request):
     """
     Retrieve albums -> all, by artist, by year, by genre or a specific album
     use the following parameters
-    all = /
+    all = / newest first, 50 at a time -> {'results': [albums], 'next': cursor or None}
+        next page = ?cursor=next from the last page, page size = ?size=50 (200 at most)
+        every album in one streamed response = ?stream=1 -> {'results': [albums]}, filters below apply
     specific album = ?id=album_id
+    several albums = ?ids=album_id,album_id,... (100 at most) -> {'results': [albums], 'missing': [ids not found]}
     by artist = ?a=artist_id
     by  year = ?y=YEAR
     between years = ?y=YEAR_EARLIEST-YEAR_LATEST
     by genre = ?g=genre_id
+    only some fields = ?fields=id,title,cover, all but some = ?exclude=copyright,notes (related rows of the fields
+        left out aren't read)
+    Add parameter '?p=profile_pk' to browse as another profile from the user, minors don't get explicit songs
     """
-    published_albums = ms_models.Album.objects.filter(published=True).order_by('-date_of_release')
+    profile = request_profile(request)
+    published_albums = ms_models.Album.objects.filter(published=True).order_by('-date_of_release', '-pk')
     album_pk = request.GET.get('id')
+    album_pks = request_ids(request)
+    sparse = request_fields(request, ms_serializers.AlbumSerializer)
+    load_related = partial(
+        ms_serializers.AlbumSerializer.load_related,
+        select_related=('genre',),
+        prefetch_related=('artists', 'other_versions'),
+        **sparse
+    )
+
+    # looking for several albums
+    if album_pks is not None:
+        return multi_get(
+            load_related(published_albums, prefetch_related=(
+                'artists', 'other_versions', 'disc_set', ms_models.profile_songs('disc_set__song_set', profile)
+            )),
+            album_pks,
+            partial(ms_serializers.AlbumSerializer, read_only=True, **sparse)
+        )
 
     # looking for a single album
-    if album_pk:
+    elif album_pk:
         if not album_pk.isdigit():
             raise Http404
 
         try:
-            album = published_albums.get(pk=int(album_pk))
-            response = ms_serializers.AlbumSerializer(album, read_only=True).data
+            album = load_related(published_albums, prefetch_related=(
+                'artists', 'other_versions', ms_models.profile_songs('disc_set__song_set', profile)
+            )).get(pk=int(album_pk))
+            response = ms_serializers.AlbumSerializer(album, read_only=True, **sparse).data
         except ObjectDoesNotExist:
             raise Http404
 
@@ -77,42 +331,85 @@ def albums(request):
             if filters['g'].isdigit():
                 published_albums = published_albums.filter(genre__pk=filters['g'])
 
-        # by years
+        # by years, as date ranges so the (published, date_of_release) index is used
         if 'y' in filters.keys():
             years = findall(r'\d{4}', filters['y'])
 
             if len(years) > 0:
                 years = sorted([int(year) for year in years])
 
-                # between two years
-                if len(years) == 2:
-                    start_year = years[0]
-                    last_year = years[-1]
+                # between two years or a specific year
+                if len(years) <= 2:
                     published_albums = published_albums.filter(
-                        date_of_release__year__gte=start_year
-                    ).filter(
-                        date_of_release__year__lte=last_year
+                        date_of_release__gte=date(max(years[0], 1), 1, 1),
+                        date_of_release__lte=date(max(years[-1], 1), 12, 31)
                     )
 
-                # specific year
-                elif len(years) == 1:
-                    published_albums = published_albums.filter(date_of_release__year=years[0])
+        # values() rows or albums, see settings.FAST_SERIALIZER_VIEWS
+        fast = 'albums' in settings.FAST_SERIALIZER_VIEWS
+        list_rows = AlbumValuesSerializer.values if fast else load_related
+        serialize = partial(AlbumValuesSerializer, **sparse) if fast else partial(
+            ms_serializers.AlbumSerializer, read_only=True, no_discs=True, **sparse
+        )
+
+        if is_string_true_or_false(request.GET.get('stream', '')):
+            return stream_list(list_rows(published_albums), serialize)
+
+        # keyset pagination, the page after the (date_of_release, pk) of the last album of the previous page
+        cursor = request.GET.get('cursor')
+        size = request_size(request, ALBUMS_PAGE_SIZE, MAX_ALBUMS_PAGE_SIZE)
+
+        if cursor:
+            cursor = decode_cursor(cursor, str, int)
+            if cursor is None:
+                raise Http404
+            try:
+                last_release, last_pk = date.fromisoformat(cursor[0]), cursor[1]
+            except ValueError:
+                raise Http404
 
-        response = ms_serializers.AlbumSerializer(published_albums, many=True, read_only=True, no_discs=True).data
+            published_albums = published_albums.filter(
+                Q(date_of_release__lt=last_release) | Q(date_of_release=last_release, pk__lt=last_pk)
+            )
+
+        page = list(list_rows(published_albums)[:size + 1])
+        last = page[size - 1] if len(page) > size else None
+        if last:
+            last = (last['date_of_release'], last['id']) if fast else (last.date_of_release, last.pk)
+
+        response = {
+            'results': serialize(page[:size], many=True).data,
+            'next': encode_cursor(last[0].isoformat(), last[1]) if last else None
+        }
 
     return Response(response)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@catalogue_condition(artist_resources)
 def artists(request):
     """
     Retrieve artists or a specific artist
-    1. List artists - returns an array of artists with basic info => name, covers, etc.
+    1. List artists - artists with basic info => name, covers, etc. by name, 50 at a time
+        returns {'results': [artists], 'next': cursor or None}
+        next page = ?cursor=next from the last page, page size = ?size=50 (200 at most)
+        names starting with a letter = ?letter=A
+        every artist in one streamed response = ?stream=1 -> {'results': [artists]}
     2. Specific artist - returns basic info plus, Top songs, Albums, EPs and Singles, Tyne Music Playlists of the artist
         Use '?id=artist_id' for a specific artist
+    3. Several artists - basic info of each, use '?ids=artist_id,artist_id,...' (100 at most)
+        returns {'results': [artists], 'missing': [ids not found]}
+    Lists and several artists take '?fields=id,name,avi' for only some fields or '?exclude=bio' for all but some
+    Add parameter '?p=profile_pk' to browse as another profile from the user, minors don't get explicit songs
     """
+    profile = request_profile(request)
     artist_pk = request.GET.get('id')
+    artist_pks = request_ids(request)
+
+    if artist_pks is not None:
+        sparse = request_fields(request, ms_serializers.ArtistSerializer)
+        return multi_get(artist_cache, artist_pks, partial(ms_serializers.ArtistSerializer, read_only=True, **sparse))
 
     if artist_pk:
         if not artist_pk.isdigit():
@@ -120,43 +417,39 @@ def artists(request):
 
         artist = get_object_or_404(ms_models.Artist, pk=artist_pk)
         response = ms_serializers.ArtistSerializer(artist, read_only=True).data
-        album_set = artist.album_set.filter(published=True)
-
-        # top songs
-        songs = [song for album in album_set for song in album.all_songs()]
-        additional_artist_songs = artist.additions.filter(disc__album__published=True)
-        features = artist.features.filter(disc__album__published=True)
 
+        # top songs, worked out when streams are written or albums change, cut after minors' explicit songs are out
+        top_song_pks = artist_top_songs(artist, size=None)
+        found_songs = ms_models.Song.objects.for_profile(profile).select_related('disc').prefetch_related(
+            'additional_artists'
+        ).in_bulk(top_song_pks)
+        # artists on the songs and albums are serialized once
+        context = ms_serializers.response_context()
         top_songs = ms_serializers.SongSerializer(
-            sorted(chain(songs, additional_artist_songs, features), key=lambda song: song.streams, reverse=True)[:10],
+            [found_songs[pk] for pk in top_song_pks if pk in found_songs][:TOP_SONGS],
             many=True,
             read_only=True,
-            album_info=True
+            album_info=True,
+            context=context
         )
 
-        # albums, Singles, EPs
-        artist_albums = ms_serializers.AlbumSerializer(
-            album_set.filter(is_ep=False, is_single=False),
-            many=True,
-            read_only=True,
-            no_discs=True
-        )
-        singles = ms_serializers.AlbumSerializer(
-            album_set.filter(is_single=True),
-            many=True,
-            read_only=True,
-            no_discs=True
-        )
-        eps = ms_serializers.AlbumSerializer(
-            album_set.filter(is_ep=True),
-            many=True,
-            read_only=True,
-            no_discs=True
-        )
+        # albums, Singles, EPs in one query
+        album_types = {'LP': [], 'S': [], 'EP': []}
+        album_set = artist.album_set.filter(published=True).select_related('genre').prefetch_related(
+            'artists', 'other_versions'
+        ).order_by('-date_of_release')
+
+        for album in album_set:
+            album_types[album.al_code()].append(album)
+
+        artist_albums, singles, eps = [
+            ms_serializers.AlbumSerializer(album_types[code], many=True, read_only=True, no_discs=True, context=context)
+            for code in ('LP', 'S', 'EP')
+        ]
 
         # playlists
         playlists = ms_serializers.PlaylistSerializer(
-            artist.playlists.all(),
+            artist.playlists.prefetch_related(ms_models.profile_songs('songs', profile)),
             many=True,
             read_only=True
         )
@@ -170,25 +463,102 @@ def artists(request):
         })
 
     else:
-        all_artists = ms_serializers.ArtistSerializer(
-            ms_models.Artist.objects.order_by('name'),
-            many=True,
-            read_only=True
-        )
-        response = all_artists.data
+        letter = request.GET.get('letter', '')
+        cursor = request.GET.get('cursor')
+        size = request_size(request, DIRECTORY_PAGE_SIZE, MAX_DIRECTORY_PAGE_SIZE)
+
+        if len(letter) > 1 or (letter and not letter.isalnum()):
+            raise Http404
+
+        sparse = request_fields(request, ms_serializers.ArtistSerializer)
+
+        fast = 'artists' in settings.FAST_SERIALIZER_VIEWS
+
+        if is_string_true_or_false(request.GET.get('stream', '')):
+            if fast:
+                return stream_list(
+                    ArtistValuesSerializer.values(directory_artists(letter.upper())),
+                    partial(ArtistValuesSerializer, **sparse)
+                )
+            return stream_list(
+                directory_artists(letter.upper(), sparse),
+                partial(ms_serializers.ArtistSerializer, read_only=True, **sparse)
+            )
+
+        if cursor:
+            cursor = directory_cursor(cursor)
+            if cursor is None:
+                raise Http404
+
+        response = artist_directory_page(letter.upper(), cursor, size, sparse, fast)
 
     return Response(response)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def songs(request):
+    """
+    Retrieve several songs with '?ids=song_id,song_id,...' (100 at most)
+    returns {'results': [songs with album info], 'missing': [ids not found]}
+    Use '?fields=id,title,album_art' for only some fields or '?exclude=additional_artists' for all but some
+    Add parameter '?p=profile_pk' to get them for another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    song_pks = request_ids(request)
+
+    if song_pks is None:
+        raise Http404
+
+    sparse = request_fields(request, ms_serializers.SongSerializer)
+    return multi_get(
+        ms_serializers.SongSerializer.load_related(
+            ms_models.Song.objects.for_profile(profile).filter(disc__album__published=True),
+            select_related=('disc',),
+            prefetch_related=('additional_artists',),
+            **sparse
+        ),
+        song_pks,
+        partial(ms_serializers.SongSerializer, read_only=True, album_info=True, **sparse)
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def playlists(request):
+    """
+    Retrieve several playlists with '?ids=playlist_id,playlist_id,...' (100 at most), curators' playlists or the
+    profile's own, returns {'results': [playlists], 'missing': [ids not found]}
+    Add parameter '?p=profile_pk' to get them for another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    playlist_pks = request_ids(request)
+
+    if playlist_pks is None:
+        raise Http404
+
+    return multi_get(
+        ms_models.Playlist.objects.filter(Q(profile__isnull=True) | Q(profile=profile)).prefetch_related(
+            ms_models.profile_songs('songs', profile)
+        ),
+        playlist_pks,
+        partial(ms_serializers.PlaylistSerializer, read_only=True)
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@catalogue_condition(genre_resources)
 def genres(request):
     """
     Retrieve Genres or a specific genre
     1. Returns a list of genres
     2. A specific Genre that includes related Creators/Curators
         Use parameter '?id=genre_id'
+    The list takes '?fields=id,title' for only some fields or '?exclude=description' for all but some
+    Add parameter '?p=profile_pk' to browse as another profile from the user, minors don't get explicit songs
     """
+    profile = request_profile(request)
     genre_pk = request.GET.get('id')
 
     if genre_pk:
@@ -196,22 +566,17 @@ def genres(request):
             raise Http404
 
         genre = get_object_or_404(ms_models.Genre, pk=genre_pk)
-        response = ms_serializers.GenreSerializer(genre, read_only=True).data
-        genre_curators = set(list(genre.creator_set.all()) + [genre.main_curator])
-        sections = genre.main_curator.creatorsection_set.all()
-        response.update({
-            'curators': ms_serializers.CreatorSerializer(genre_curators, many=True, read_only=True).data,
-            'sections': ms_serializers.CreatorSectionSerializer(sections, many=True, read_only=True).data,
-            'playlists': ms_serializers.PlaylistSerializer(
-                genre.main_curator.playlist_set.filter(artist__isnull=True),
-                many=True,
-                read_only=True
-            ).data
-        })
+        # built ahead of time, see music.pages
+        response = page_document(ms_models.PageDocument.GENRE, genre, clean=profile.minor)
 
     else:
         all_genres = ms_models.Genre.objects.all()
-        response = ms_serializers.GenreSerializer(all_genres, many=True, read_only=True).data
+        sparse = request_fields(request, ms_serializers.GenreSerializer)
+
+        if 'genres' in settings.FAST_SERIALIZER_VIEWS:
+            response = GenreValuesSerializer(GenreValuesSerializer.values(all_genres), **sparse).data
+        else:
+            response = ms_serializers.GenreSerializer(all_genres, many=True, read_only=True, **sparse).data
 
     return Response(response)
 
@@ -219,22 +584,39 @@ def genres(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def curators(request, curator_id):
+    profile = request_profile(request)
     curator = get_object_or_404(ms_models.Creator, pk=curator_id)
-    sections = curator.creatorsection_set.all()
-    playlists = curator.playlist_set.filter(artist__isnull=True)
-    response = ms_serializers.CreatorSerializer(curator, read_only=True).data
-
     info_only = request.GET.get('io')
 
-    if not info_only:
-        response.update({
-            'sections': ms_serializers.CreatorSectionSerializer(sections, many=True, read_only=True).data,
-            'playlists': ms_serializers.PlaylistSerializer(playlists, many=True, read_only=True).data
-        })
+    if info_only:
+        response = ms_serializers.CreatorSerializer(curator, read_only=True).data
+    else:
+        # built ahead of time, see music.pages
+        response = page_document(ms_models.PageDocument.CURATOR, curator, clean=profile.minor)
 
     return Response(response)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def curator_section(request, curator_id, section_id):
+    """
+    One section of a curator's (or genre's) page in full; its artists, albums and playlists with their songs.
+    Pages only list what's in each section, see music.pages
+    Add parameter '?p=profile_pk' to browse as another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    section = get_object_or_404(
+        ms_models.CreatorSection.objects.prefetch_related(
+            'artists__group_members', 'albums__genre', 'albums__artists', 'albums__other_versions',
+            ms_models.profile_songs('playlists__songs', profile)
+        ),
+        pk=section_id,
+        creator=curator_id
+    )
+    return Response(ms_serializers.CreatorSectionSerializer(section, read_only=True).data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search(request):
@@ -251,15 +633,323 @@ def search(request):
         'curators': [curators],
         'time': seconds of how long the search took
     }
+    Add parameter '?p=profile_pk' to search as another profile from the user, minors don't get explicit songs
     """
     term = request.GET.get('q')
     response = {}
 
     if term:
-        ms_search = MusicSearch(term)
+        ms_search = MusicSearch(term, profile=request_profile(request))
         response = ms_search.get_results(serialize=True)
         response.update({
             'time': ms_search.time_taken
         })
 
     return Response(response)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def plays(request):
+    """
+    Record plays of songs by the logged in user
+    POST {'songs': [song_id, song_id, ...]} -> one play for each id, 100 at most
+    Add parameter '?p=profile_pk' to record the plays for another profile from the user
+    Plays are counted in the background, they show up in a song's streams after a few seconds
+    """
+    profile = request_profile(request)
+    # the body may be any JSON, e.g. a list
+    song_pks = request.data.get('songs') if isinstance(request.data, dict) else None
+
+    if type(song_pks) != list or not 0 < len(song_pks) <= MAX_PLAYS_PER_REQUEST:
+        return Response({
+            'success': False,
+            'error': f'\'songs\' should be a list of 1 to {MAX_PLAYS_PER_REQUEST} song ids'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    song_pks = [int(pk) for pk in song_pks if str(pk).isdigit()]
+    known = set(ms_models.Song.objects.filter(
+        pk__in=song_pks,
+        disc__album__published=True
+    ).values_list('pk', flat=True))
+    accepted = [pk for pk in song_pks if pk in known]
+    played_at = timezone.now().timestamp()
+
+    if accepted:
+        stream_pipeline.record_many([(pk, profile.pk, played_at) for pk in accepted])
+
+    return Response({
+        'success': True,
+        'recorded': len(accepted)
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def charts(request):
+    """
+    The most streamed songs or albums, charts are updated periodically
+    use the following parameters
+    songs = ?type=songs (default)
+    albums = ?type=albums
+    window = ?window=all (default), ?window=1d for today or ?window=7d for the last 7 days
+    by genre = ?g=genre_id
+    Each entry has a 'rank', 'streams' in the window and the 'song' or 'album'
+    Add parameter '?p=profile_pk' to get them for another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    kinds = {'songs': ms_models.Chart.SONGS, 'albums': ms_models.Chart.ALBUMS}
+    kind = request.GET.get('type', 'songs')
+    window = request.GET.get('window', ms_models.Chart.ALL_TIME)
+    genre_pk = request.GET.get('g')
+
+    if kind not in kinds or window not in dict(ms_models.Chart.WINDOWS) or (genre_pk and not genre_pk.isdigit()):
+        raise Http404
+
+    if genre_pk:
+        cached_or_404(genre_cache, genre_pk)
+
+    chart = ms_models.Chart.objects.filter(kind=kinds[kind], window=window, genre__pk=genre_pk).first()
+    entries = chart.entries if chart else []
+    pks = [pk for pk, _ in entries]
+
+    if kind == 'songs':
+        found = ms_models.Song.objects.for_profile(profile).filter(disc__album__published=True).select_related(
+            'disc'
+        ).prefetch_related('additional_artists').in_bulk(pks)
+        serialize = partial(ms_serializers.SongSerializer, read_only=True, album_info=True)
+    else:
+        found = {pk: album for pk, album in album_cache.in_bulk(pks).items() if album.published}
+        serialize = partial(ms_serializers.AlbumSerializer, read_only=True, no_discs=True)
+
+    # entries deleted or unpublished since the chart was built are skipped
+    ranked = [(pk, streams) for pk, streams in entries if pk in found]
+    items = serialize([found[pk] for pk, _ in ranked], many=True).data
+
+    return Response({
+        'type': kind,
+        'window': window,
+        'genre': int(genre_pk) if genre_pk else None,
+        'built': chart.built if chart else None,
+        'entries': [
+            {
+                'rank': rank,
+                'streams': streams,
+                kind[:-1]: item
+            } for rank, ((pk, streams), item) in enumerate(zip(ranked, items), start=1)
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def trending(request):
+    """
+    What's trending now, songs, artists or albums with the most plays lately
+    use the following parameters
+    songs = ?type=songs (default)
+    artists = ?type=artists
+    albums = ?type=albums
+    number of items = ?size=10 (default), 50 at most
+    Each entry has a 'rank', a 'score' (about the number of plays in the last day) and the 'song', 'artist' or 'album'
+    Add parameter '?p=profile_pk' to get them for another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    kind = request.GET.get('type', 'songs')
+    size = request_size(request, 10, MAX_TRENDING)
+
+    # some songs and albums may have been unpublished since they were played
+    if kind == 'songs':
+        ranked = song_trends.top(size * 2)
+        found = ms_models.Song.objects.for_profile(profile).filter(disc__album__published=True).select_related(
+            'disc'
+        ).prefetch_related('additional_artists').in_bulk([pk for pk, _ in ranked])
+        serialize = partial(ms_serializers.SongSerializer, read_only=True, album_info=True)
+    elif kind == 'artists':
+        ranked = artist_trends.top(size)
+        found = artist_cache.in_bulk([pk for pk, _ in ranked])
+        serialize = partial(ms_serializers.ArtistSerializer, read_only=True)
+    elif kind == 'albums':
+        ranked = trending_albums(size)
+        found = {pk: album for pk, album in album_cache.in_bulk([pk for pk, _ in ranked]).items() if album.published}
+        serialize = partial(ms_serializers.AlbumSerializer, read_only=True, no_discs=True)
+    else:
+        raise Http404
+
+    ranked = [(pk, score) for pk, score in ranked if pk in found][:size]
+    items = serialize([found[pk] for pk, _ in ranked], many=True).data
+
+    return Response({
+        'type': kind,
+        'entries': [
+            {
+                'rank': rank,
+                'score': round(score, 2),
+                kind[:-1]: item
+            } for rank, ((pk, score), item) in enumerate(zip(ranked, items), start=1)
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recently_played(request):
+    """
+    Songs the logged in user played lately, newest first, each song once
+    Add parameter '?p=profile_pk' to get the songs of another profile from the user
+    number of songs = ?size=20 (default), 50 at most
+    Each entry has when the song was last 'played' and the 'song'
+    """
+    profile = request_profile(request)
+    size = request_size(request, 20, MAX_RECENTLY_PLAYED)
+
+    played = profile_recently_played(profile, size)
+    found = ms_models.Song.objects.for_profile(profile).select_related('disc').prefetch_related(
+        'additional_artists'
+    ).in_bulk([pk for pk, _ in played])
+    context = ms_serializers.response_context()
+    ms_serializers.warm_albums(found.values(), context)
+
+    return Response({
+        'results': [
+            {
+                'played': played_at.isoformat(),
+                'song': ms_serializers.SongSerializer(found[pk], read_only=True, album_info=True, context=context).data
+            } for pk, played_at in played if pk in found
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar(request):
+    """
+    Songs similar to a song or artists similar to an artist, from what's often played and collected together
+    use the following parameters
+    songs like a song = ?type=songs&id=song_id (default type)
+    artists like an artist = ?type=artists&id=artist_id
+    number of items = ?size=10 (default), 20 at most
+    Each entry has a 'score' (1 for items always found together) and the 'song' or 'artist'
+    Add parameter '?p=profile_pk' to get them for another profile from the user, minors don't get explicit songs
+    """
+    profile = request_profile(request)
+    kind = request.GET.get('type', 'songs')
+    item_pk = request.GET.get('id', '')
+    size = request_size(request, 10, NEIGHBOURS)
+
+    if kind not in ('songs', 'artists') or not item_pk.isdigit():
+        raise Http404
+
+    if kind == 'songs':
+        get_object_or_404(ms_models.Song, pk=item_pk, disc__album__published=True)
+        neighbours = similar_items(ms_models.SimilarItems.SONGS, int(item_pk), size)
+        found = ms_models.Song.objects.for_profile(profile).filter(disc__album__published=True).select_related(
+            'disc'
+        ).prefetch_related('additional_artists').in_bulk([pk for pk, _ in neighbours])
+        serialize = partial(ms_serializers.SongSerializer, read_only=True, album_info=True)
+    else:
+        cached_or_404(artist_cache, item_pk)
+        neighbours = similar_items(ms_models.SimilarItems.ARTISTS, int(item_pk), size)
+        found = artist_cache.in_bulk([pk for pk, _ in neighbours])
+        serialize = partial(ms_serializers.ArtistSerializer, read_only=True)
+
+    neighbours = [(pk, score) for pk, score in neighbours if pk in found]
+    items = serialize([found[pk] for pk, _ in neighbours], many=True).data
+
+    return Response({
+        'type': kind,
+        'id': int(item_pk),
+        'entries': [
+            {
+                'score': score,
+                kind[:-1]: item
+            } for (pk, score), item in zip(neighbours, items)
+        ]
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recommendations(request):
+    """
+    Songs made for the logged in user from what they and people like them play and collect, songs already in the
+    library are left out. Recommendations are retrained periodically, new profiles get none until then
+    Add parameter '?p=profile_pk' to get the songs for another profile from the user
+    number of songs = ?size=20 (default), 100 at most
+    Each entry has a 'score' (higher is better) and the 'song'
+    """
+    profile = request_profile(request)
+    size = request_size(request, 20, MAX_RECOMMENDATIONS)
+
+    # some may have been unpublished since training
+    recommended = recommender.recommend(profile, size * 2)
+    found = ms_models.Song.objects.for_profile(profile).filter(disc__album__published=True).select_related(
+        'disc'
+    ).prefetch_related('additional_artists').in_bulk([pk for pk, _ in recommended])
+    context = ms_serializers.response_context()
+    ms_serializers.warm_albums(found.values(), context)
+
+    return Response({
+        'results': [
+            {
+                'score': score,
+                'song': ms_serializers.SongSerializer(found[pk], read_only=True, album_info=True, context=context).data
+            } for pk, score in [(pk, score) for pk, score in recommended if pk in found][:size]
+        ]
+    })
+
+
+def graph_artists(artist_pks):
+    """Serialized artists in the order of artist_pks"""
+    found = artist_cache.in_bulk(artist_pks)
+    return ms_serializers.ArtistSerializer(
+        [found[pk] for pk in artist_pks if pk in found],
+        many=True,
+        read_only=True
+    ).data
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def collaborators(request, artist_id):
+    """Artists on the same songs or albums as an artist"""
+    artist = cached_or_404(artist_cache, artist_id)
+
+    return Response({
+        'artist': ms_serializers.ArtistSerializer(artist, read_only=True).data,
+        'collaborators': graph_artists(artist_graph.collaborators(artist.pk))
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def groups(request, artist_id):
+    """The groups an artist is in and, for a group, its members"""
+    artist = cached_or_404(artist_cache, artist_id)
+    linked = graph_artists(artist_graph.linked(artist.pk))
+
+    return Response({
+        'artist': ms_serializers.ArtistSerializer(artist, read_only=True).data,
+        'groups': [other for other in linked if other['is_group']],
+        'members': [other for other in linked if not other['is_group']] if artist.is_group else []
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def artist_path(request, artist_id, other_id):
+    """
+    The shortest chain of collaborations and group memberships from one artist to another, 6 hops at most
+    Returns the 'hops' and the artists on the 'path' including both ends, 404 when there's none
+    """
+    artist = cached_or_404(artist_cache, artist_id)
+    other = cached_or_404(artist_cache, other_id)
+    path = artist_graph.path(artist.pk, other.pk)
+
+    if not path:
+        raise Http404
+
+    return Response({
+        'hops': len(path) - 1,
+        'path': graph_artists(path)
+    })
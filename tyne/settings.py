@@ -71,6 +71,11 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
+    ),
+    # encodes with orjson when it's installed, `python manage.py benchmark_renderers` compares it with JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': (
+        'tyne_utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     )
 }
 
@@ -87,6 +92,22 @@ DATABASES = {
     }
 }
 
+# 'default' is each worker's own memory; 'shared' is seen by every worker, made with `python manage.py createcachetable`
+# (django.core.cache.backends.redis.RedisCache is better suited in production). The music settings naming a cache use
+# 'shared', music.checks warns when one of them is kept in each worker's memory
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'tyne_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -143,6 +164,38 @@ STATICFILES_DIRS = (
 )
 
 
+# Song streams
+# plays are counted in memory and written to the database in batches, they are spooled here until they're written
+STREAMS_SPOOL_DIR = str(BASE_DIR / 'spool/streams')
+STREAMS_FLUSH_SIZE = 500
+STREAMS_FLUSH_INTERVAL = 10
+STREAMS_SPOOL_FSYNC = False
+# a file with every song's streams mapped into memory and shared by the workers on a host, top songs are read from it.
+# e.g. str(BASE_DIR / 'spool/song_streams.bin'), None reads streams from the database
+STREAMS_COUNTERS_FILE = None
+# plays count half as much towards trending after this many hours
+TRENDING_HALF_LIFE = 24
+# plays kept in each profile's recently played history
+PLAY_HISTORY_SIZE = 200
+# profile and song factors for recommendations, written by the train_recommendations command
+RECOMMENDATIONS_DIR = str(BASE_DIR / 'spool/recommendations')
+# each worker keeps the artist collaboration graph in memory, it's read again when older than this many seconds
+ARTIST_GRAPH_MAX_AGE = 300
+# pages of the artists directory are cached in this cache from CACHES, shared by the workers, this long; they're
+# dropped sooner when an artist changes
+ARTIST_DIRECTORY_CACHE = 'shared'
+ARTIST_DIRECTORY_CACHE_SECONDS = 600
+# artists, albums and genres are cached by pk in this cache from CACHES, shared by the workers, and kept in each
+# worker's memory for OBJECT_CACHE_LOCAL_SECONDS (OBJECT_CACHE_LOCAL_SIZE rows of each model at most), see music.objects
+OBJECT_CACHE = 'shared'
+OBJECT_CACHE_SECONDS = 3600
+OBJECT_CACHE_LOCAL_SECONDS = 10
+OBJECT_CACHE_LOCAL_SIZE = 10000
+# the album, artist and genre lists of these views are built from values() rows without making model instances,
+# see music.fast_serializers; views left out use the model serializers
+FAST_SERIALIZER_VIEWS = ('albums', 'artists', 'genres')
+
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
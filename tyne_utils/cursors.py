@@ -0,0 +1,25 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from json import dumps, loads
+from typing import Optional
+
+
+def encode_cursor(*values) -> str:
+    """
+    An opaque, url safe cursor for keyset pagination holding the sort values of the last row on a page,
+    e.g. encode_cursor(name, pk); values must be JSON types
+    """
+    return urlsafe_b64encode(dumps(values, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor: str, *types) -> Optional[tuple]:
+    """The values in a cursor from encode_cursor when they're of `types`, None when the cursor isn't one of ours"""
+    try:
+        values = loads(urlsafe_b64decode(cursor.encode()))
+    except (DecodeError, ValueError, TypeError):
+        return None
+
+    if type(values) != list or len(values) != len(types):
+        return None
+
+    return tuple(values) if all(type(value) == type_ for value, type_ in zip(values, types)) else None
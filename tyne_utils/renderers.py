@@ -0,0 +1,78 @@
+from collections import UserList
+
+from django.db.models.fields.files import FieldFile
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class TyneJSONEncoder(JSONEncoder):
+    """DRF's encoder, plus files and images as their url (None without a file)"""
+
+    def default(self, obj):
+        if isinstance(obj, FieldFile):
+            return obj.url if obj else None
+        return super(TyneJSONEncoder, self).default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson when it's installed, otherwise with the standard library like DRF's JSONRenderer.
+    Set it in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] in place of rest_framework.renderers.JSONRenderer.
+
+    The output is the same as JSONRenderer's (compact, utf-8); dates and times are formatted like DRF formats them,
+    files and images become their url. Indented output (e.g. 'application/json; indent=4') is left to JSONRenderer.
+    orjson encodes subclasses of dict and list (like serializer data) from their own storage, lists keeping their items
+    elsewhere (collections.UserList, django's form ErrorList) would come out empty. Data holding those anywhere in its
+    dicts, lists and tuples, like {'errors': form.errors}, is encoded with subclasses converted to their base type,
+    which is much slower for big payloads so it isn't done for every response
+    """
+    encoder_class = TyneJSONEncoder
+    OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+    SUBCLASS_OPTIONS = (OPTIONS | orjson.OPT_PASSTHROUGH_SUBCLASS) if orjson else 0
+    SUBCLASSED = (dict, list, str, int)
+
+    def __init__(self):
+        self.encoder = self.encoder_class()
+
+    def default(self, obj):
+        if isinstance(obj, UserList):
+            return list(obj)
+        for base in self.SUBCLASSED:
+            if isinstance(obj, base):
+                return base(obj)
+        return self.encoder.default(obj)
+
+    @staticmethod
+    def holds_user_lists(data) -> bool:
+        """True when a UserList is anywhere in data, containers are walked with a stack so any depth is fine"""
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, UserList):
+                return True
+            if isinstance(item, dict):
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple)):
+                stack.extend(item)
+        return False
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+        options = self.SUBCLASS_OPTIONS if self.holds_user_lists(data) else self.OPTIONS
+        ret = orjson.dumps(data, default=self.default, option=options)
+
+        # like JSONRenderer, so the output can be embedded in javascript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
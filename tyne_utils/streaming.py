@@ -0,0 +1,42 @@
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+from django.http import StreamingHttpResponse
+
+from .renderers import FastJSONRenderer
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Lists of `size` items (the last may be shorter), e.g. chunked(queryset.iterator(chunk_size=size), size)"""
+    items = iter(items)
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+def stream_json_list(chunks: Iterable[list], head: dict = None, key: str = 'results') -> Iterator[bytes]:
+    """
+    JSON of `head` with a `key` list holding the items of every chunk, in pieces; one chunk is held at a time so
+    memory stays the same however many items there are
+    """
+    render = FastJSONRenderer().render
+    # head with an empty list last -> b'{...,"results":[]}', the items go between the brackets
+    head = dict(head or {})
+    head.pop(key, None)
+    head[key] = []
+    opening = render(head)
+    yield opening[:-2]
+
+    first = True
+    for chunk in chunks:
+        if chunk:
+            yield (b'' if first else b',') + render(chunk)[1:-1]
+            first = False
+
+    yield opening[-2:]
+
+
+def streaming_json_response(chunks: Iterable[list], head: dict = None, key: str = 'results') -> StreamingHttpResponse:
+    """A response sending `stream_json_list` as it's made, chunks should be lazy (e.g. a generator)"""
+    return StreamingHttpResponse(stream_json_list(chunks, head, key), content_type='application/json')
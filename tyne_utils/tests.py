@@ -1,8 +1,22 @@
+from collections import UserList
 from unittest import TestCase
-from datetime import datetime
+from unittest.mock import patch
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from json import loads
 from pytz import timezone
 
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField
+from django.db.models.fields.files import FieldFile
+from django.forms.utils import ErrorDict, ErrorList
+from rest_framework.renderers import JSONRenderer
+
+from .cursors import decode_cursor, encode_cursor
 from .funcs import is_string_true_or_false, turn_string_to_datetime, strip_punctuation
+from .renderers import FastJSONRenderer
+from .streaming import chunked, stream_json_list
 
 
 class UtilsTestCase(TestCase):
@@ -33,3 +47,73 @@ class UtilsTestCase(TestCase):
         self.assertEqual('DAMN', strip_punctuation('DAMN?'))
         self.assertEqual('DAMN', strip_punctuation('DAMN#'))
         self.assertEqual('DAMN', strip_punctuation('DAMN@'))
+
+
+class FastJSONRendererTestCase(TestCase):
+    def setUp(self):
+        self.data = {
+            'title': 'WAX\u2028',
+            'date': date(2021, 5, 12),
+            'built': datetime(2021, 5, 12, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'score': Decimal('2.5'),
+            'ids': (1, 2),
+            'nested': [{'id': 1, 'name': 'Quavo'}],
+            1: 'one',
+            'missing': None
+        }
+
+    def test_same_as_json_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+        # indented output is left to JSONRenderer
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, 'application/json; indent=2'),
+            JSONRenderer().render(self.data, 'application/json; indent=2')
+        )
+
+    def test_files(self):
+        file = FieldFile(None, FileField(storage=FileSystemStorage(base_url='/media/')), 'defaults/album.png')
+        self.assertEqual(loads(FastJSONRenderer().render({'cover': file})), {'cover': '/media/defaults/album.png'})
+        empty = FieldFile(None, FileField(), None)
+        self.assertEqual(loads(FastJSONRenderer().render({'cover': empty})), {'cover': None})
+
+    def test_form_errors(self):
+        errors = {'errors': ErrorDict(username=ErrorList(['Taken.']), __all__=ErrorList([ValidationError('Bad.')]))}
+        self.assertEqual(FastJSONRenderer().render(errors), JSONRenderer().render(errors))
+        self.assertEqual(loads(FastJSONRenderer().render(errors))['errors']['username'], ['Taken.'])
+        self.assertEqual(FastJSONRenderer().render(UserList([1, 2])), b'[1,2]')
+
+        # however deep and in lists too, like DRF's errors of a many=True serializer
+        nested = {'results': [{'errors': [(ErrorDict(title=ErrorList(['Required.'])),)]}]}
+        self.assertEqual(FastJSONRenderer().render(nested), JSONRenderer().render(nested))
+        self.assertFalse(FastJSONRenderer.holds_user_lists({'results': [{'ids': (1, 2)}], 'next': None}))
+
+    def test_fallback(self):
+        with patch('tyne_utils.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+
+class StreamingTestCase(TestCase):
+    def test_chunked(self):
+        self.assertListEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertListEqual(list(chunked([], 2)), [])
+
+    def test_stream_json_list(self):
+        chunks = [[{'id': 1}, {'id': 2}], [], [{'id': 3}]]
+        streamed = b''.join(stream_json_list(chunks, {'next': None, 'results': 'dropped'}))
+        self.assertEqual(streamed, JSONRenderer().render({'next': None, 'results': [{'id': 1}, {'id': 2}, {'id': 3}]}))
+        self.assertEqual(loads(b''.join(stream_json_list([], key='items'))), {'items': []})
+
+
+class CursorsTestCase(TestCase):
+    def test_cursors(self):
+        cursor = encode_cursor('Migos & Friends', 4)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+        self.assertEqual(decode_cursor(cursor, str, int), ('Migos & Friends', 4))
+
+        # not one of ours
+        self.assertIsNone(decode_cursor(cursor, str, str))
+        self.assertIsNone(decode_cursor(cursor, str))
+        self.assertIsNone(decode_cursor('abc', str, int))
+        self.assertIsNone(decode_cursor(encode_cursor('2021-05-12'), str, int))